@@ -1,3 +1,5 @@
+import json
+
 from rest_framework import renderers
 
 
@@ -15,19 +17,20 @@ class RnaFastaRenderer(renderers.BaseRenderer):
         """
         if "results" in data:  # list of entries
             try:
-                text = "# %i total entries, next page: %s, previous page: %s\n" % (
+                header = "# %i total entries, next page: %s, previous page: %s\n" % (
                     data["count"],
                     data["next"],
                     data["previous"],
                 )
             except KeyError:
-                text = "# next page: %s, previous page: %s\n" % (
+                header = "# next page: %s, previous page: %s\n" % (
                     data["next"],
                     data["previous"],
                 )
+            text = [header]
             for entry in data["results"]:
-                text += entry["fasta"]
-            return text
+                text.append(entry["fasta"])
+            return "".join(text)
         elif isinstance(data, list):
             text = []
             for entry in data:
@@ -35,3 +38,18 @@ class RnaFastaRenderer(renderers.BaseRenderer):
             return "".join(text)
         else:  # single entry
             return data["fasta"]
+
+
+class NdjsonRenderer(renderers.BaseRenderer):
+    """
+    Render a list of entries as newline-delimited JSON, one entry per line.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = None
+
+    def render(self, data, media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = data.get("results", [data])
+        return "".join(json.dumps(entry) + "\n" for entry in data).encode("utf-8")
@@ -13,11 +13,10 @@ limitations under the License.
 
 import json
 import re
+from collections import OrderedDict
 
-import requests
 from django.core.paginator import Paginator
-from django.db.models import Max, Min
-from django.urls import reverse
+from django.db.models import Manager
 from portal.models import (
     Accession,
     ChemicalComponent,
@@ -39,9 +38,67 @@ from portal.models import (
     SequenceFeature,
     Xref,
 )
+from portal.utils.external_ids import InteractionsResolver
+from portal.utils.quickgo import get_hits as get_quickgo_hits
+from portal.utils.sequence_urls import get_base_url, get_sequence_path
 from rest_framework import serializers
 
 
+def get_requested_fields(request):
+    """
+    Parse the comma-separated `fields` and `exclude` query parameters.
+
+    :return: (set of fields or None if all fields are requested, set of excluded fields)
+    """
+    only = request.query_params.get("fields")
+    exclude = request.query_params.get("exclude")
+    return (
+        {field.strip() for field in only.split(",")} if only else None,
+        {field.strip() for field in exclude.split(",")} if exclude else set(),
+    )
+
+
+def is_field_requested(request, name):
+    only, exclude = get_requested_fields(request)
+    return (only is None or name in only) and name not in exclude
+
+
+def is_optional_field_requested(request, name):
+    """Optional fields are only returned if they are listed in `fields`."""
+    only, exclude = get_requested_fields(request)
+    return only is not None and name in only and name not in exclude
+
+
+class SparseFieldsMixin(object):
+    """
+    Return only the fields listed in the `fields` query parameter, if any,
+    and not listed in the `exclude` query parameter, e.g.
+    ?fields=rnacentral_id,md5,sequence or ?exclude=quickgo_hits.
+    Only applies to the serializer of the view, not to nested serializers,
+    except for the fields in Meta.optional_fields, which are left out
+    unless they are listed in `fields`.
+    """
+
+    def get_fields(self):
+        fields = super(SparseFieldsMixin, self).get_fields()
+        request = self.context.get("request")
+        for name in getattr(self.Meta, "optional_fields", ()):
+            if request is None or not is_optional_field_requested(request, name):
+                del fields[name]
+        view = self.context.get("view")
+        if (
+            request is None
+            or not hasattr(view, "get_serializer_class")
+            or not isinstance(self, view.get_serializer_class())
+        ):
+            return fields
+        return OrderedDict(
+            (name, field)
+            for name, field in fields.items()
+            if is_field_requested(request, name)
+        )
+
+
 class RawPublicationSerializer(serializers.ModelSerializer):
     """Serializer class for literature citations. Used in conjunction with raw querysets."""
 
@@ -176,7 +233,30 @@ class ModificationSerializer(serializers.ModelSerializer):
         fields = ("position", "author_assigned_position", "chem_comp")
 
 
-class XrefSerializer(serializers.HyperlinkedModelSerializer):
+def get_urs_taxid(xref):
+    return "%s_%s" % (xref.upi_id, xref.taxid)
+
+
+class XrefListSerializer(serializers.ListSerializer):
+    """Get the QuickGO hits of all PSICQUIC xrefs on the page at once."""
+
+    def to_representation(self, data):
+        data = list(data.all() if isinstance(data, Manager) else data)
+        if "quickgo_hits" in self.child.fields:
+            # the child reads the context of this serializer, which can be
+            # shared with a parent serializer, so it gets a copy
+            self._context = dict(
+                self.context,
+                quickgo_hits=get_quickgo_hits(
+                    get_urs_taxid(xref)
+                    for xref in data
+                    if xref.accession.database == "PSICQUIC"
+                ),
+            )
+        return super(XrefListSerializer, self).to_representation(data)
+
+
+class XrefSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     """Serializer class for all cross-references associated with an RNAcentral id."""
 
     upi = serializers.ReadOnlyField(source="upi.upi")
@@ -207,11 +287,13 @@ class XrefSerializer(serializers.HyperlinkedModelSerializer):
     gencode_ensembl_url = serializers.CharField(
         source="get_gencode_ensembl_url", read_only=True
     )
+    genomic_coordinates = serializers.SerializerMethodField()
     ensembl_url = serializers.SerializerMethodField("get_ensembl_url")
     quickgo_hits = serializers.SerializerMethodField("get_quickgo_hits")
 
     class Meta:
         model = Xref
+        list_serializer_class = XrefListSerializer
         fields = (
             "upi",
             "database",
@@ -234,9 +316,12 @@ class XrefSerializer(serializers.HyperlinkedModelSerializer):
             # 'tmrna_type',
             "gencode_transcript_id",
             "gencode_ensembl_url",
+            "genomic_coordinates",
             "ensembl_url",
             "quickgo_hits",
         )
+        # one more subquery per page, only returned with ?fields=
+        optional_fields = ("genomic_coordinates",)
 
     def upis_to_urls(self, upis):
         """
@@ -246,20 +331,13 @@ class XrefSerializer(serializers.HyperlinkedModelSerializer):
         :param upis: list of upis or a single upi
         :return: list of urls or a single url
         """
-        protocol = "https://" if self.context["request"].is_secure() else "http://"
-        hostport = self.context["request"].get_host()
+        if "base_url" not in self.context:  # shared by all xrefs on the page
+            self.context["base_url"] = get_base_url(self.context["request"])
+        base_url = self.context["base_url"]
         if isinstance(upis, list):
-            url = (
-                "unique-rna-sequence"
-                if "_" in "\t".join(upis)
-                else "generic-rna-sequence"
-            )
-            return [
-                protocol + hostport + reverse(url, kwargs={"upi": upi}) for upi in upis
-            ]
+            return [base_url + get_sequence_path(upi) for upi in upis]
         else:  # upis is just a single item
-            url = "unique-rna-sequence" if "_" in upis else "generic-rna-sequence"
-            return protocol + hostport + reverse(url, kwargs={"upi": upis})
+            return base_url + get_sequence_path(upis)
 
     def get_mirbase_mature_products(self, obj):
         return (
@@ -311,41 +389,28 @@ class XrefSerializer(serializers.HyperlinkedModelSerializer):
         )
 
     def get_genomic_coordinates(self, obj):
-        # In Django1.9+ we could try removing obj.accession.coordinates.exists() check and
-        # replace obj.accession.coordinates.all()[0] with obj.accession.coordinates.first(),
-        # but currently this prevents re-use of related queryset and created N+1 requests:
-        #
-        #  first_coordinate = obj.accession.coordinates.all().first()
-        #  if first_coordinate:
-        #      data = {
-        #          'chromosome': first_coordinate.chromosome,
-        #          'strand': first_coordinate.strand
-        #      }
-        #      return data
-
-        # TODO: bring back all() -> filter(chromosome__isnull=False), when postgres is fully populated
+        """
+        Use the genomic_coordinates annotation added by
+        Xref.objects.with_genomic_coordinates(), so that the coordinates of
+        all xrefs on a page are fetched with the page itself.
+        """
+        if not hasattr(obj, "genomic_coordinates"):  # not annotated
+            obj.genomic_coordinates = (
+                Xref.objects.filter(pk=obj.pk)
+                .with_genomic_coordinates()
+                .values_list("genomic_coordinates", flat=True)
+                .first()
+            )
+        if not obj.genomic_coordinates or not obj.genomic_coordinates["chromosome"]:
+            return None
 
-        if (
-            obj.accession.coordinates.exists()
-            and obj.accession.coordinates.all()[0].chromosome
-        ):
-            data = {
-                "chromosome": obj.accession.coordinates.all()[0].chromosome,
-                "strand": obj.accession.coordinates.all()[0].strand,
-                "start": obj.accession.coordinates.all().aggregate(
-                    Min("primary_start")
-                )["primary_start__min"],
-                "end": obj.accession.coordinates.all().aggregate(Max("primary_end"))[
-                    "primary_end__max"
-                ],
-            }
-
-            exceptions = ["X", "Y"]
-            if re.match(r"\d+", data["chromosome"]) or data["chromosome"] in exceptions:
-                data["ucsc_chromosome"] = "chr" + data["chromosome"]
-            else:
-                data["ucsc_chromosome"] = data["chromosome"]
-            return data
+        data = dict(obj.genomic_coordinates)
+        exceptions = ["X", "Y"]
+        if re.match(r"\d+", data["chromosome"]) or data["chromosome"] in exceptions:
+            data["ucsc_chromosome"] = "chr" + data["chromosome"]
+        else:
+            data["ucsc_chromosome"] = data["chromosome"]
+        return data
 
     def get_ensembl_url(self, obj):
         """Return the correct ensembl domain"""
@@ -362,22 +427,36 @@ class XrefSerializer(serializers.HyperlinkedModelSerializer):
 
     def get_quickgo_hits(self, obj):
         """Return the number of annotations in QuickGO"""
-        if obj.accession.database == "PSICQUIC":
-            urs_taxid = obj.upi.upi + "_" + str(obj.taxid)
-            try:
-                response = requests.get(
-                    f"https://www.ebi.ac.uk/QuickGO/services/annotation/stats?geneProductId={urs_taxid}"
-                )
-                data = json.loads(response.text)
-                hits = data["results"][0]["totalHits"]
-            except Exception:
-                hits = None
-        else:
-            hits = None
-        return hits
+        if obj.accession.database != "PSICQUIC":
+            return None
+        urs_taxid = get_urs_taxid(obj)
+        quickgo_hits = self.context.get("quickgo_hits")
+        if quickgo_hits is None:  # serializing a single object
+            quickgo_hits = get_quickgo_hits([urs_taxid])
+        return quickgo_hits.get(urs_taxid)
+
 
+# fields of RnaNestedSerializer that use Rna.load_summaries
+SUMMARY_FIELDS = {
+    "is_active",
+    "description",
+    "rna_type",
+    "count_distinct_organisms",
+    "distinct_databases",
+}
 
-class RnaNestedSerializer(serializers.HyperlinkedModelSerializer):
+
+class RnaListSerializer(serializers.ListSerializer):
+    """Load the summaries of all sequences on the page at once."""
+
+    def to_representation(self, data):
+        data = list(data.all() if isinstance(data, Manager) else data)
+        if SUMMARY_FIELDS.intersection(self.child.fields):
+            Rna.load_summaries(data)
+        return super(RnaListSerializer, self).to_representation(data)
+
+
+class RnaNestedSerializer(SparseFieldsMixin, serializers.HyperlinkedModelSerializer):
     """Serializer class for a unique RNAcentral sequence."""
 
     sequence = serializers.CharField(source="get_sequence", read_only=True)
@@ -392,6 +471,7 @@ class RnaNestedSerializer(serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = Rna
+        list_serializer_class = RnaListSerializer
         fields = (
             "url",
             "rnacentral_id",
@@ -463,8 +543,15 @@ class RnaFlatSerializer(RnaNestedSerializer):
     xrefs = serializers.SerializerMethodField("paginated_xrefs")
 
     def paginated_xrefs(self, obj):
-        """Include paginated xrefs."""
+        """Include paginated xrefs, prefetched by RnaSequences.list if possible."""
         queryset = obj.xrefs.all()
+        request = self.context.get("request")
+        if (
+            "xrefs" not in getattr(obj, "_prefetched_objects_cache", {})
+            and request is not None
+            and is_optional_field_requested(request, "genomic_coordinates")
+        ):
+            queryset = queryset.with_genomic_coordinates()
         page = self.context.get("page", 1)
         page_size = self.context.get("page_size", 100)
         paginator = Paginator(queryset, page_size)
@@ -476,6 +563,7 @@ class RnaFlatSerializer(RnaNestedSerializer):
 
     class Meta:
         model = Rna
+        list_serializer_class = RnaListSerializer
         fields = (
             "url",
             "rnacentral_id",
@@ -634,6 +722,9 @@ class SequenceFeatureSerializer(serializers.ModelSerializer):
 
 
 class EnsemblAssemblySerializer(serializers.ModelSerializer):
+    """Used with assemblies from portal.utils.ensembl_assemblies."""
+
+    common_name = serializers.CharField(source="taxonomy_name")
     human_readable_ensembl_url = serializers.SerializerMethodField()
     example_chromosome = serializers.SerializerMethodField()
     example_start = serializers.SerializerMethodField()
@@ -706,6 +797,15 @@ class QcStatusSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class InteractionsListSerializer(serializers.ListSerializer):
+    """Resolve the external ids of all interactions on the page at once."""
+
+    def to_representation(self, data):
+        data = list(data.all() if isinstance(data, Manager) else data)
+        self._context = dict(self.context, resolver=InteractionsResolver(data))
+        return super(InteractionsListSerializer, self).to_representation(data)
+
+
 class InteractionsSerializer(serializers.Serializer):
     """Serializer class for interactions"""
 
@@ -717,6 +817,15 @@ class InteractionsSerializer(serializers.Serializer):
     hgnc = serializers.SerializerMethodField(method_name="get_hgnc")
     source = serializers.SerializerMethodField(method_name="get_source")
 
+    class Meta:
+        list_serializer_class = InteractionsListSerializer
+
+    def get_resolver(self, obj):
+        resolver = self.context.get("resolver")
+        if resolver is None:  # serializing a single object
+            resolver = InteractionsResolver([obj])
+        return resolver
+
     def get_interacting_id(self, obj):
         if "intact:" in obj.interacting_id:
             match_urs = [item for item in obj.names if item.lower().startswith("urs")]
@@ -773,14 +882,10 @@ class InteractionsSerializer(serializers.Serializer):
             if match_ensembl:
                 interacting_id = match_ensembl[0]
                 ens_type = "Gene" if "ENSG" in interacting_id else "Transcript"
-                try:
-                    response = requests.get(
-                        f"https://rest.ensembl.org/lookup/id/{interacting_id.split('.')[0]}?expand=1;content-type=application/json"
-                    )
-                    data = json.loads(response.text)
-                    species = data["species"]
+                species = self.get_resolver(obj).get_ensembl_species(interacting_id)
+                if species:
                     url = f"https://ensembl.org/{species}/{ens_type}/Summary?db=core;t={interacting_id}"
-                except Exception:
+                else:
                     url = ""
             elif match_urs:
                 url = f"/rna/{match_urs[0]}"
@@ -802,14 +907,10 @@ class InteractionsSerializer(serializers.Serializer):
         elif "ensembl" in obj.interacting_id:
             ensembl_id = obj.interacting_id.replace("ensembl:", "")
             ens_type = "Gene" if "ENSG" in ensembl_id else "Transcript"
-            try:
-                response = requests.get(
-                    f"https://rest.ensembl.org/lookup/id/{ensembl_id.split('.')[0]}?expand=1;content-type=application/json"
-                )
-                data = json.loads(response.text)
-                species = data["species"]
+            species = self.get_resolver(obj).get_ensembl_species(ensembl_id)
+            if species:
                 url = f"https://ensembl.org/{species}/{ens_type}/Summary?db=core;t={ensembl_id}"
-            except Exception:
+            else:
                 url = ""
         elif "flybase:" in obj.interacting_id:
             flybase_id = obj.interacting_id.replace("flybase:", "")
@@ -841,60 +942,11 @@ class InteractionsSerializer(serializers.Serializer):
         return url
 
     def get_hgnc(self, obj):
-        e_transcript = [item for item in obj.names if item.lower().startswith("ens")]
-
-        if (
-            "uniprotkb:" in obj.interacting_id
-            or "protein ontology:" in obj.interacting_id
-        ):
-            if "uniprotkb:" in obj.interacting_id:
-                uniprot_id = obj.interacting_id.replace("uniprotkb:", "")
-            else:
-                uniprot_id = obj.interacting_id.replace("protein ontology:", "")
-            try:
-                response = requests.get(
-                    f"https://rest.uniprot.org/uniprotkb/{uniprot_id}?fields=accession%2Cgene_names"
-                )
-                data = json.loads(response.text)
-                hgnc = data["genes"][0]["geneName"]["value"]
-            except Exception:
-                hgnc = ""
-        elif e_transcript:
-            e_transcript = e_transcript[0].split(".")[0]
-            try:
-                response = requests.get(
-                    f"https://rest.ensembl.org/lookup/id/{e_transcript}?content-type=application/json"
-                )
-                data = json.loads(response.text)
-                if "Parent" in data:
-                    parent = data["Parent"]
-                    parent_response = requests.get(
-                        f"https://rest.ensembl.org/lookup/id/{parent}?content-type=application/json"
-                    )
-                    parent_data = json.loads(parent_response.text)
-                    hgnc = parent_data["display_name"]
-                else:
-                    hgnc = data["display_name"]
-            except Exception:
-                hgnc = ""
-        else:
-            hgnc = ""
-
-        if hgnc:
-            try:
-                response = requests.get(
-                    f"https://rest.genenames.org/fetch/symbol/{hgnc}",
-                    headers={"Accept": "application/json"},
-                )
-                data = json.loads(response.text)
-                num_found = data["response"]["numFound"]
-                if num_found > 0:
-                    hgnc_id = data["response"]["docs"][0]["hgnc_id"]
-                    hgnc_url = f"https://www.genenames.org/data/gene-symbol-report/#!/hgnc_id/{hgnc_id}"
-                else:
-                    hgnc_url = ""
-            except Exception:
-                hgnc_url = ""
+        resolver = self.get_resolver(obj)
+        hgnc = resolver.get_gene_name(obj)
+        hgnc_id = resolver.get_hgnc_id(hgnc)
+        if hgnc_id:
+            hgnc_url = f"https://www.genenames.org/data/gene-symbol-report/#!/hgnc_id/{hgnc_id}"
         else:
             hgnc_url = ""
 
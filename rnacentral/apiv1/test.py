@@ -12,10 +12,14 @@ limitations under the License.
 """
 from __future__ import print_function
 
+import json
 import time
 
 import six
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from portal.models.interactions import Interactions
 from rest_framework.reverse import reverse
 from rest_framework.test import APIClient, APITestCase
@@ -112,6 +116,31 @@ class RnaEndpointsTestCase(ApiV1BaseClass):
         response = self._test_url(url, data={"page": page, "page_size": page_size})
         self.assertEqual(len(response.data["results"]), page_size)
 
+    def test_rna_list_cursor_pagination(self):
+        """Follow cursor links, pages must not overlap."""
+        url = reverse("rna-sequences")
+        first = self._test_url(url, data={"cursor": "", "page_size": 5})
+        second = self._test_url(first.data["next"])
+        upis = [
+            rna["rnacentral_id"]
+            for rna in first.data["results"] + second.data["results"]
+        ]
+        self.assertEqual(len(upis), 10)
+        self.assertEqual(upis, sorted(upis, reverse=True))
+
+    def test_rna_list_invalid_cursor(self):
+        url = reverse("rna-sequences")
+        response = self.client.get(url, data={"cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_xref_cursor_pagination(self):
+        url = reverse("rna-xrefs", kwargs={"pk": self.upi})
+        first = self._test_url(url, data={"cursor": "", "page_size": 1})
+        self.assertEqual(len(first.data["results"]), 1)
+        if first.data["next"]:
+            second = self._test_url(first.data["next"])
+            self.assertNotEqual(first.data["results"], second.data["results"])
+
     def test_rna_sequence(self):
         """Test RNA entry (hyperlinked response)."""
         url = reverse("rna-detail", kwargs={"pk": self.upi})
@@ -130,6 +159,19 @@ class RnaEndpointsTestCase(ApiV1BaseClass):
         response = self._test_url(url)
         self.assertGreaterEqual(len(response.data["results"]), 1)
 
+    def test_rna_publications_pagination(self):
+        """Publications are deduplicated and paginated in the database."""
+        upi = "URS000075A546"  # rRNA with many papers
+        url = reverse("rna-publications", kwargs={"pk": upi})
+        cache.clear()  # the response and the count are cached
+        with CaptureQueriesContext(connection) as queries:
+            response = self._test_url(url, data={"page_size": 5})
+        self.assertLessEqual(len(response.data["results"]), 5)
+        titles = [item["title"].lower() for item in response.data["results"]]
+        self.assertEqual(len(titles), len(set(titles)))
+        publications = [q["sql"] for q in queries if "rnc_reference_map" in q["sql"]]
+        self.assertEqual(len(publications), 2)  # count and page
+
     def test_xref_pagination(self):
         """Ensure that xrefs can be paginated."""
         upi = "URS000075A546"  # >150 xrefs
@@ -231,7 +273,9 @@ class RnaEndpointsTestCase(ApiV1BaseClass):
         url = reverse(
             "rna-ensembl-compara", kwargs={"pk": "URS00006457C1", "taxid": "10090"}
         )
-        self._test_url(url)
+        response = self._test_url(url)
+        self.assertIn("ensembl_compara_status", response.data)
+        self.assertIn("ensembl_compara_url", response.data)
 
     def test_interactions(self):
         """Test interactions endpoint."""
@@ -260,6 +304,54 @@ class NestedXrefsTestCase(ApiV1BaseClass):
         response = self._test_url(url, data={"flat": True})
         self.assertNotEqual(len(response.data["xrefs"]), 0)
 
+    def test_flat_list(self):
+        """Flat list keeps the page order and includes the xrefs."""
+        url = reverse("rna-sequences")
+        response = self._test_url(url, data={"page_size": 20})
+        flat = self._test_url(url, data={"page_size": 20, "flat": True})
+        self.assertEqual(
+            [rna["rnacentral_id"] for rna in flat.data["results"]],
+            [rna["rnacentral_id"] for rna in response.data["results"]],
+        )
+        for rna in flat.data["results"]:
+            self.assertIsInstance(rna["xrefs"], list)
+
+    def test_list_summaries_query_count(self):
+        """Summaries of all sequences on the page come from two queries."""
+        url = reverse("rna-sequences")
+        with CaptureQueriesContext(connection) as queries:
+            response = self._test_url(url, data={"page_size": 50})
+        self.assertEqual(len(response.data["results"]), 50)
+        precomputed = [
+            query
+            for query in queries.captured_queries
+            if "rnc_rna_precomputed" in query["sql"]
+        ]
+        xrefs = [
+            query for query in queries.captured_queries if 'FROM "xref"' in query["sql"]
+        ]
+        self.assertEqual(len(precomputed), 1)
+        self.assertEqual(len(xrefs), 1)
+
+    def test_flat_list_query_count(self):
+        """Xrefs of a flat page are prefetched with their coordinates."""
+        url = reverse("rna-sequences")
+
+        def count_xref_queries(page_size):
+            with CaptureQueriesContext(connection) as queries:
+                response = self._test_url(
+                    url,
+                    data={
+                        "flat": "true",
+                        "page_size": page_size,
+                        "fields": "xrefs,genomic_coordinates",
+                    },
+                )
+            self.assertEqual(len(response.data["results"]), page_size)
+            return len([q for q in queries.captured_queries if "xref" in q["sql"]])
+
+        self.assertEqual(count_xref_queries(3), count_xref_queries(10))
+
     # TODO: tmrna_mates take too long to complete
     def test_large_nested_rna(self):
         """
@@ -289,7 +381,7 @@ class DatabaseSpecificXrefsTestCase(ApiV1BaseClass):
 
     timeout = 15
 
-    def _test_time_and_existence(self, upi, timeout, field):
+    def _test_time_and_existence(self, upi, timeout, field, data=None):
         """
         Shortcut to check that response time is tolerable and expected field
         is not empty.
@@ -299,12 +391,13 @@ class DatabaseSpecificXrefsTestCase(ApiV1BaseClass):
           this timeout expires (in seconds, e.g. 5)
         :param field: name of the field that we want to be non-empty at least
           for some Xrefs (e.g. "modifications")
+        :param data: optional query parameters
         :return:
         """
         url = reverse("rna-xrefs", kwargs={"pk": upi})
         with Timer() as timer:
             c = APIClient()
-            response = c.get(url)
+            response = c.get(url, data)
         # self.assertTrue(timer.timeout < timeout)
         self.assertEqual(response.status_code, 200)
 
@@ -347,6 +440,35 @@ class DatabaseSpecificXrefsTestCase(ApiV1BaseClass):
             "URS000075E815", self.timeout, "refseq_splice_variants"
         )
 
+    def test_genomic_coordinates(self):
+        self._test_time_and_existence(
+            self.upi_with_genomic_coordinates,
+            self.timeout,
+            "genomic_coordinates",
+            data={"fields": "genomic_coordinates"},
+        )
+
+    def test_genomic_coordinates_query_count(self):
+        """
+        Coordinates of all xrefs on the page come from one query,
+        which only runs if the field is requested.
+        """
+        url = reverse("rna-xrefs", kwargs={"pk": self.upi_with_genomic_coordinates})
+        for fields, expected in [("upi,genomic_coordinates", 1), ("upi", 0)]:
+            cache.clear()  # responses are cached
+            with CaptureQueriesContext(connection) as queries:
+                response = APIClient().get(url, {"page_size": 100, "fields": fields})
+            self.assertEqual(response.status_code, 200)
+            results = response.json()["results"]
+            self.assertGreater(len(results), 1)
+            self.assertEqual("genomic_coordinates" in results[0], bool(expected))
+            coordinates_queries = [
+                query
+                for query in queries.captured_queries
+                if "rnc_sequence_regions" in query["sql"]
+            ]
+            self.assertEqual(len(coordinates_queries), expected)
+
 
 class OutputFormatsTestCase(ApiV1BaseClass):
     """Test output formats."""
@@ -396,6 +518,31 @@ class OutputFormatsTestCase(ApiV1BaseClass):
 
         self._output_format_tester(formats, urls)
 
+    def test_export_fasta(self):
+        """Test streaming FASTA export."""
+        url = reverse("rna-export")
+        response = self.client.get(url, data={"md5": self.md5, "format": "fasta"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        text = b"".join(response.streaming_content).decode()
+        self.assertTrue(text.startswith(">%s " % self.upi))
+
+    def test_export_ndjson(self):
+        """Test streaming newline-delimited JSON export."""
+        url = reverse("rna-export")
+        response = self.client.get(url, data={"md5": self.md5, "format": "ndjson"})
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["rnacentral_id"], self.upi)
+
+    def test_export_requires_a_filter(self):
+        """Test that the whole table cannot be exported at once."""
+        url = reverse("rna-export")
+        for data in [{"format": "fasta"}, {"md5": "", "format": "ndjson"}]:
+            response = self.client.get(url, data=data)
+            self.assertEqual(response.status_code, 400)
+
     def test_genome_annotations(self):
         """
         Test the Ensembl-like endpoint for retrieving data
@@ -416,6 +563,7 @@ class OutputFormatsTestCase(ApiV1BaseClass):
         for annotation in response.data:
             if annotation["feature_type"] == "transcript":
                 self.assertIn("URS", annotation["external_name"])
+                self.assertIsInstance(annotation["databases"], list)
             elif annotation["feature_type"] == "exon":
                 self.assertIn("URS", annotation["Parent"])
             else:
@@ -518,6 +666,67 @@ class SpeciesSpecificIdsTestCase(ApiV1BaseClass):
         response = c.get(url)
         self.assertEqual(response.data["is_active"], False)
 
+    def test_batch(self):
+        """Entries are returned in the order of the request."""
+        ids = ["%s_%i" % (self.upi, self.taxid), "%s_0" % self.upi]
+        response = APIClient().post(reverse("rna-batch"), ids, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [entry["rnacentral_id"] for entry in response.data["results"]], ids
+        )
+        self.assertTrue(response.data["results"][0]["found"])
+        self.assertTrue(response.data["results"][0]["is_active"])
+        self.assertFalse(response.data["results"][1]["found"])
+
+    def test_batch_ndjson(self):
+        ids = ["%s_%i" % (self.upi, self.taxid)]
+        response = APIClient().post(
+            reverse("rna-batch") + "?format=ndjson", {"ids": ids}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        lines = response.content.decode().splitlines()
+        self.assertEqual(json.loads(lines[0])["rnacentral_id"], ids[0])
+
+    def test_batch_invalid_ids(self):
+        response = APIClient().post(
+            reverse("rna-batch"), ["URS000047C79B"], format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class Md5LookupTestCase(ApiV1BaseClass):
+    """Tests for the md5 batch and streaming endpoints."""
+
+    missing = "0" * 32
+
+    def test_batch(self):
+        response = APIClient().post(
+            reverse("md5-batch"), [self.missing, self.md5.upper()], format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["missing"], [self.missing])
+        self.assertEqual(len(response.data["found"]), 1)
+        self.assertEqual(response.data["found"][0]["md5"], self.md5)
+        self.assertEqual(response.data["found"][0]["rnacentral_id"], self.upi)
+
+    def test_batch_invalid_input(self):
+        response = APIClient().post(
+            reverse("md5-batch"), {"md5": self.md5}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream(self):
+        response = self.client.post(
+            reverse("md5-stream"),
+            "%s\n\n%s\n" % (self.md5, self.missing),
+            content_type="text/plain",
+        )
+        self.assertEqual(response.status_code, 200)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        entries = [json.loads(line) for line in lines]
+        self.assertEqual([entry["md5"] for entry in entries], [self.md5, self.missing])
+        self.assertEqual([entry["found"] for entry in entries], [True, False])
+
 
 class GenomesTestCase(ApiV1BaseClass):
     """Tests for ensembl assemblies and other endpoints used by IGV."""
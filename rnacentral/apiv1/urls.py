@@ -25,25 +25,37 @@ urlpatterns = [
     # list of all RNAcentral entries
     url(
         r"^rna/?$",
-        cache_page(CACHE_TIMEOUT)(views.RnaSequences.as_view()),
+        views.normalize_fields_params(
+            cache_page(CACHE_TIMEOUT)(views.RnaSequences.as_view())
+        ),
         name="rna-sequences",
     ),
+    # stream all RNAcentral entries matching the filters, not cached
+    url(r"^rna/export/?$", views.RnaExport.as_view(), name="rna-export"),
+    # species-specific details about many entries, POST only, not cached
+    url(r"^rna/batch/?$", views.RnaBatchView.as_view(), name="rna-batch"),
     # single RNAcentral sequence
     url(
         r"^rna/(?P<pk>URS[0-9A-Fa-f]{10})/?$",
-        cache_page(CACHE_TIMEOUT)(views.RnaDetail.as_view()),
+        views.normalize_fields_params(
+            cache_page(CACHE_TIMEOUT)(views.RnaDetail.as_view())
+        ),
         name="rna-detail",
     ),
     # view for all cross-references associated with an RNAcentral id
     url(
         r"^rna/(?P<pk>URS[0-9A-Fa-f]{10})/xrefs/?$",
-        cache_page(CACHE_TIMEOUT)(views.XrefList.as_view()),
+        views.normalize_fields_params(
+            cache_page(CACHE_TIMEOUT)(views.XrefList.as_view())
+        ),
         name="rna-xrefs",
     ),
     # view for all cross-references, filtered down to a specific taxon
     url(
         r"^rna/(?P<pk>URS[0-9A-Fa-f]{10})/xrefs/(?P<taxid>\d+)/?$",
-        cache_page(CACHE_TIMEOUT)(views.XrefsSpeciesSpecificList.as_view()),
+        views.normalize_fields_params(
+            cache_page(CACHE_TIMEOUT)(views.XrefsSpeciesSpecificList.as_view())
+        ),
         name="rna-xrefs-species-specific",
     ),
     # secondary structure for a species-specific entry
@@ -196,6 +208,9 @@ urlpatterns = [
         {},
         name="litsumm-specific-id",
     ),
+    # find many sequences using md5, POST only, not cached
+    url(r"^md5/batch/?$", views.Md5BatchView.as_view(), name="md5-batch"),
+    url(r"^md5/stream/?$", views.Md5StreamView.as_view(), name="md5-stream"),
     # fetch sequence using md5
     url(
         r"md5/(?P<md5>.*?)/?$",
@@ -205,5 +220,5 @@ urlpatterns = [
 ]
 
 urlpatterns = format_suffix_patterns(
-    urlpatterns, allowed=["json", "yaml", "fasta", "api"]
+    urlpatterns, allowed=["json", "yaml", "fasta", "ndjson", "api"]
 )
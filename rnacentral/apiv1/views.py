@@ -12,14 +12,14 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License.
 """
+import gzip
 import json
 import re
-import zlib
+from collections import defaultdict
+from functools import wraps
 from itertools import chain
 
-import boto3
-import requests
-from apiv1.renderers import RnaFastaRenderer
+from apiv1.renderers import NdjsonRenderer, RnaFastaRenderer
 from apiv1.serializers import (
     AccessionSerializer,
     CitationSerializer,
@@ -42,20 +42,30 @@ from apiv1.serializers import (
     RnaSpeciesSpecificSerializer,
     SequenceFeatureSerializer,
     XrefSerializer,
+    is_field_requested,
+    is_optional_field_requested,
 )
-from colorhash import ColorHash
-from django.conf import settings
-from django.http import Http404, HttpResponse
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import (
+    Count,
+    OuterRef,
+    Prefetch,
+    QuerySet,
+    Subquery,
+    prefetch_related_objects,
+)
+from django.http import Http404, HttpResponse, QueryDict, StreamingHttpResponse
+from django.middleware.gzip import re_accepts_gzip
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_vary_headers
 from django_filters import rest_framework as filters
-from portal.config.expert_databases import expert_dbs
 from portal.models import (
     Accession,
     AccessionSequenceRegion,
     Database,
     DatabaseStats,
     EnsemblAssembly,
-    EnsemblCompara,
     GoAnnotation,
     Interactions,
     LitSumm,
@@ -69,8 +79,22 @@ from portal.models import (
     SequenceRegion,
     SequenceRegionActive,
     Taxonomy,
+    Xref,
+)
+from portal.models.release import get_release_version
+from portal.models.xref import RELATED_SEQUENCES_KINDS
+from portal.utils import expert_databases
+from portal.utils.bins import has_bin_column, overlapping_bins_sql
+from portal.utils.ensembl_assemblies import (
+    get_assemblies,
+    get_assembly_by_ensembl_url,
+    get_assembly_by_taxid,
 )
+from portal.utils.ensembl_compara import get_homology_group
+from portal.utils.layouts import get_layout_svg
+from portal.utils.thumbnails import generate_thumbnail, get_thumbnail_store
 from rest_framework import generics, renderers, status
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.mixins import ListModelMixin, RetrieveModelMixin
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
@@ -80,7 +104,13 @@ from rest_framework.viewsets import GenericViewSet, ReadOnlyModelViewSet
 from rest_framework_jsonp.renderers import JSONPRenderer
 from rest_framework_yaml.renderers import YAMLRenderer
 
-from rnacentral.utils.pagination import LargeTablePagination, Pagination
+from rnacentral.utils import ebi_search
+from rnacentral.utils.http import run_concurrently
+from rnacentral.utils.pagination import (
+    LargeTablePagination,
+    PaginatedRawQuerySet,
+    Pagination,
+)
 
 """
 Docstrings of the classes exposed in urlpatterns support markdown.
@@ -89,22 +119,44 @@ Docstrings of the classes exposed in urlpatterns support markdown.
 # maximum number of xrefs to use with prefetch_related
 MAX_XREFS_TO_PREFETCH = 1000
 
+# seconds, the key is versioned by release
+DATABASE_DISPLAY_NAMES_TIMEOUT = 60 * 60 * 24
 
-def get_database(region):
-    # get databases from rnc_accession_sequence_region table
-    databases = []
-    for item in AccessionSequenceRegion.objects.filter(
-        region_id=region.id
-    ).select_related("accession"):
-        databases.append(item.accession.database)
 
-    # use display_name from rnc_database
-    providing_databases = []
-    for item in databases:
-        try:
-            providing_databases.append(Database.objects.get(descr=item).display_name)
-        except Database.DoesNotExist:
-            pass
+def get_database_display_names():
+    """
+    Map rnc_database.descr to rnc_database.display_name.
+    The table only changes between releases, so it is cached per release.
+    """
+    key = "database-display-names:%s" % get_release_version()
+    display_names = cache.get(key)
+    if display_names is None:
+        display_names = dict(Database.objects.values_list("descr", "display_name"))
+        cache.set(key, display_names, DATABASE_DISPLAY_NAMES_TIMEOUT)
+    return display_names
+
+
+def get_databases(regions):
+    """
+    Get providing databases for all regions with a single query on the
+    rnc_accession_sequence_region table.
+
+    :param regions: iterable of SequenceRegion objects
+    :return: dict {region id: [display_name, ...]}
+    """
+    display_names = get_database_display_names()
+    accessions = (
+        AccessionSequenceRegion.objects.filter(
+            region_id__in=[region.id for region in regions]
+        )
+        .order_by("region_id", "accession")
+        .values_list("region_id", "accession__database")
+    )
+
+    providing_databases = defaultdict(list)
+    for region_id, database in accessions:
+        if database in display_names:
+            providing_databases[region_id].append(display_names[database])
 
     return providing_databases
 
@@ -120,31 +172,101 @@ class GenomeAnnotations(APIView):
 
     permission_classes = (AllowAny,)
 
+    # Genoverse requests a slightly different window on every pan, so features
+    # are cached in fixed-size tiles and trimmed to the requested window
+    tile_size = 100000
+    tile_timeout = 60 * 60 * 24 * 7  # seconds, keys are versioned by release
+
     def get(self, request, species, chromosome, start, end, format=None):
-        start = start.replace(",", "")
-        end = end.replace(",", "")
+        start = int(start.replace(",", ""))
+        end = int(end.replace(",", ""))
 
-        try:
-            assembly = EnsemblAssembly.objects.filter(ensembl_url=species).first()
-        except EnsemblAssembly.DoesNotExist:
+        assembly = get_assembly_by_ensembl_url(species)
+        if assembly is None:
             return Response([])
 
+        features = []
+        seen = set()
+        for transcript in self.get_transcripts(assembly, chromosome, start, end):
+            feature = transcript[0]
+            if feature["ID"] in seen:
+                continue  # transcripts spanning several tiles
+            if feature["start"] <= end and feature["end"] >= start:
+                seen.add(feature["ID"])
+                features.extend(transcript)
+
+        return Response(features)
+
+    def get_transcripts(self, assembly, chromosome, start, end):
+        """
+        Get transcripts from all tiles overlapping the window, fetching the
+        missing tiles from the database with a single query.
+        """
+        first_tile = (max(start, 1) - 1) // self.tile_size
+        last_tile = (max(end, 1) - 1) // self.tile_size
+        tiles = range(first_tile, last_tile + 1)
+        keys = {
+            tile: "genome-annotations:{release}:{assembly}:{chromosome}:{tile}".format(
+                release=get_release_version(),
+                assembly=assembly.assembly_id,
+                chromosome=chromosome,
+                tile=tile,
+            )
+            for tile in tiles
+        }
+        cached = cache.get_many(keys.values())
+
+        missing = [tile for tile in tiles if keys[tile] not in cached]
+        if missing:
+            fetched = {tile: [] for tile in missing}
+            for transcript in self.get_features(
+                assembly,
+                chromosome,
+                missing[0] * self.tile_size + 1,
+                (missing[-1] + 1) * self.tile_size,
+            ):
+                feature = transcript[0]
+                for tile in range(
+                    (feature["start"] - 1) // self.tile_size,
+                    (feature["end"] - 1) // self.tile_size + 1,
+                ):
+                    if tile in fetched:
+                        fetched[tile].append(transcript)
+            cache.set_many(
+                {keys[tile]: fetched[tile] for tile in missing}, self.tile_timeout
+            )
+            cached.update({keys[tile]: fetched[tile] for tile in missing})
+
+        return chain.from_iterable(cached[keys[tile]] for tile in tiles)
+
+    def get_features(self, assembly, chromosome, start, end):
+        """
+        Get all transcripts overlapping the window.
+
+        :return: list of lists [transcript feature, exon feature, ...]
+        """
         regions = (
             SequenceRegion.objects.select_related("urs_taxid")
             .prefetch_related("exons")
             .filter(
                 assembly=assembly,
                 chromosome=chromosome,
-                region_start__gte=start,
-                region_stop__lte=end,
+                region_start__lte=end,
+                region_stop__gte=start,
                 urs_taxid__is_active=True,
             )
         )
+        # restrict the overlap query to a few bins if they have been computed
+        if has_bin_column(SequenceRegion._meta.db_table):
+            where, params = overlapping_bins_sql(
+                SequenceRegion._meta.db_table, start, end
+            )
+            regions = regions.extra(where=[where], params=params)
+        providing_databases = get_databases(regions)
 
-        features = []
+        transcripts = []
         for transcript in regions:
-            providing_databases = get_database(transcript)
-            features.append(
+            features = [
                 {
                     "ID": transcript.region_name,
                     "external_name": transcript.urs_taxid.id.split("_")[0],
@@ -157,9 +279,9 @@ class GenomeAnnotations(APIView):
                     "strand": transcript.strand,
                     "start": transcript.region_start,
                     "end": transcript.region_stop,
-                    "databases": providing_databases,
+                    "databases": providing_databases[transcript.id],
                 }
-            )
+            ]
 
             # exons
             for exon in transcript.exons.all():
@@ -178,8 +300,9 @@ class GenomeAnnotations(APIView):
                         "end": exon.exon_stop,
                     }
                 )
+            transcripts.append(features)
 
-        return Response(features)
+        return transcripts
 
 
 class APIRoot(APIView):
@@ -228,6 +351,17 @@ class RnaMixin(object):
         return RnaNestedSerializer
 
 
+def get_xref_counts(rnas):
+    """Count xrefs of several Rna objects in one query, return {upi: count}."""
+    return dict(
+        Xref.default_objects.filter(upi__in=[rna.upi for rna in rnas])
+        .order_by()
+        .values("upi")
+        .annotate(total=Count("id"))
+        .values_list("upi", "total")
+    )
+
+
 class RnaSequences(RnaMixin, generics.ListAPIView):
     """
     Unique RNAcentral Sequences
@@ -246,6 +380,7 @@ class RnaSequences(RnaMixin, generics.ListAPIView):
         RnaFastaRenderer,
     )
     pagination_class = LargeTablePagination
+    keyset_ordering = ("-upi",)  # used with ?cursor=
 
     def list(self, request, *args, **kwargs):
         """
@@ -254,7 +389,7 @@ class RnaSequences(RnaMixin, generics.ListAPIView):
         Here the view is overridden in order to avoid
         performance bottlenecks.
 
-        * estimate the number of xrefs for each Rna
+        * count xrefs for all Rnas on the page with a single query
         * prefetch_related only for Rnas with a small number of xrefs
         * do not attempt to optimise entries with a large number of xrefs
           letting Django hit the database one time for each xref
@@ -268,26 +403,19 @@ class RnaSequences(RnaMixin, generics.ListAPIView):
 
         # begin RNAcentral override: use prefetch_related where possible
         flat = self.request.query_params.get("flat", None)
-        if flat:
-            to_prefetch = []
-            no_prefetch = []
-            for rna in page:
-                if rna.xrefs.count() <= MAX_XREFS_TO_PREFETCH:
-                    to_prefetch.append(rna.upi)
-                else:
-                    no_prefetch.append(rna.upi)
-
-            prefetched = self.filter_queryset(
-                Rna.objects.filter(upi__in=to_prefetch)
-                .prefetch_related("xrefs__accession")
-                .all()
-            )
-            not_prefetched = self.filter_queryset(
-                Rna.objects.filter(upi__in=no_prefetch).all()
-            )
-
-            result_list = list(chain(prefetched, not_prefetched))
-            page = result_list  # .object_list is no longer set on the instance
+        if flat and page and is_field_requested(request, "xrefs"):
+            xref_counts = get_xref_counts(page)
+            to_prefetch = [
+                rna
+                for rna in page
+                if xref_counts.get(rna.upi, 0) <= MAX_XREFS_TO_PREFETCH
+            ]
+            xrefs = Xref.objects.select_related("accession")
+            if is_optional_field_requested(request, "genomic_coordinates"):
+                # annotate the coordinates in the prefetch query, so that
+                # RnaFlatSerializer does not need a query per xref
+                xrefs = xrefs.with_genomic_coordinates()
+            prefetch_related_objects(to_prefetch, Prefetch("xrefs", queryset=xrefs))
         # end RNAcentral override
 
         # begin DRF base code
@@ -309,6 +437,86 @@ class RnaSequences(RnaMixin, generics.ListAPIView):
         return queryset.all()
 
 
+class RnaExport(generics.GenericAPIView):
+    """
+    Stream all RNAcentral sequences matching the filters
+    in FASTA or newline-delimited JSON format.
+
+    [API documentation](/api)
+    """
+
+    # the above docstring appears on the API website
+    permission_classes = (AllowAny,)
+    filterset_class = RnaFilter
+    renderer_classes = (RnaFastaRenderer, NdjsonRenderer)
+    chunk_size = 2000  # rows fetched from the server-side cursor at a time
+    fasta_line_length = 80
+
+    def get_queryset(self):
+        description = RnaPrecomputed.objects.filter(
+            upi=OuterRef("upi"), taxid__isnull=True
+        ).values("description")[:1]
+        return Rna.objects.annotate(description=Subquery(description))
+
+    def handle_exception(self, exc):
+        """The export renderers cannot render error details, use JSON."""
+        self.request.accepted_renderer = renderers.JSONRenderer()
+        self.request.accepted_media_type = renderers.JSONRenderer.media_type
+        return super(RnaExport, self).handle_exception(exc)
+
+    def get(self, request, format=None):
+        # an unfiltered export would stream the whole rna table
+        if not any(request.query_params.get(name) for name in RnaFilter.base_filters):
+            raise ValidationError(
+                "Specify at least one filter: %s" % ", ".join(RnaFilter.base_filters)
+            )
+        queryset = self.filter_queryset(self.get_queryset()).values_list(
+            "upi", "md5", "length", "description", "seq_short", "seq_long"
+        )
+        rows = self.iter_rows(queryset)
+
+        if request.accepted_renderer.format == "ndjson":
+            lines = (self.format_json(*row) for row in rows)
+        else:
+            lines = (self.format_fasta(*row) for row in rows)
+        return StreamingHttpResponse(
+            lines, content_type=request.accepted_renderer.media_type
+        )
+
+    def iter_rows(self, queryset):
+        """
+        Read the rows from a server-side cursor, skipping entries without
+        a sequence. CachingQuerySet.iterator() loads all rows in memory,
+        and outside a transaction the cursor is declared WITH HOLD, which
+        makes Postgres compute the whole result before the first row.
+        """
+        with transaction.atomic(using=queryset.db):
+            for row in QuerySet.iterator(queryset, chunk_size=self.chunk_size):
+                if row[4] or row[5]:
+                    yield row
+
+    def format_json(self, upi, md5, length, description, seq_short, seq_long):
+        return (
+            json.dumps(
+                {
+                    "rnacentral_id": upi,
+                    "md5": md5,
+                    "length": length,
+                    "description": description,
+                    "sequence": (seq_short or seq_long).replace("T", "U").upper(),
+                }
+            )
+            + "\n"
+        )
+
+    def format_fasta(self, upi, md5, length, description, seq_short, seq_long):
+        sequence = (seq_short or seq_long).replace("T", "U").upper()
+        lines = [">%s %s" % (upi, description)]
+        for i in range(0, len(sequence), self.fasta_line_length):
+            lines.append(sequence[i : i + self.fasta_line_length])
+        return "\n".join(lines) + "\n"
+
+
 class RnaDetail(RnaMixin, generics.RetrieveAPIView):
     """
     Unique RNAcentral Sequence
@@ -361,6 +569,7 @@ class RnaSpeciesSpecificView(APIView):
     Contact person: Tony Sawford.
     """
     queryset = RnaPrecomputed.objects.all()
+    search_cache_timeout = 60 * 15  # seconds
 
     def get_object(self, pk):
         try:
@@ -372,52 +581,29 @@ class RnaSpeciesSpecificView(APIView):
         urs = pk + "_" + taxid
         rna = self.get_object(urs)
 
-        # queries on the xref table make the API very slow.
-        # get gene from Search Index
-        search_index = settings.EBI_SEARCH_ENDPOINT
-        try:
-            response = requests.get(
-                f"{search_index}/entry/{urs}?format=json&fields=gene"
+        # queries on the xref table make the API very slow,
+        # so the gene and the LitScan articles come from the search index
+        cache_key = "rna-species-specific-search:%s" % urs
+        search = cache.get(cache_key)
+        if search is None:
+            gene, pub_count = run_concurrently(
+                (ebi_search.get_gene, urs),
+                (ebi_search.get_litscan_pub_count, urs),
             )
-            data = json.loads(response.text)
-            gene = data["entries"][0]["fields"]["gene"]
-        except Exception:
-            gene = ""
+            search = {"gene": gene, "pub_count": pub_count}
+            if gene is not None and pub_count is not None:
+                cache.set(cache_key, search, self.search_cache_timeout)
 
         try:
             species = Taxonomy.objects.get(id=taxid).name
         except Taxonomy.DoesNotExist:
             species = ""
 
-        # LitScan data - get related IDs
-        pub_list = [urs]
-        query_jobs = (
-            f'?query=entry_type:metadata%20AND%20primary_id:"{urs}"%20AND%20database:rnacentral&'
-            f"fields=job_id&format=json"
-        )
-        try:
-            response = requests.get(search_index + "-litscan" + query_jobs).json()
-            entries = response["entries"]
-            for entry in entries:
-                pub_list.append(entry["fields"]["job_id"][0])
-        except (IndexError, KeyError):
-            pass
-
-        # get number of articles identified by LitScan
-        query_ids = ['job_id:"' + item + '"' for item in pub_list]
-        query_ids = "%20OR%20".join(query_ids)
-        query = f"?query=entry_type:Publication%20AND%20({query_ids})&format=json"
-        try:
-            response = requests.get(search_index + "-litscan" + query).json()
-            pub_count = response["hitCount"]
-        except KeyError:
-            pub_count = None
-
         serializer = RnaSpeciesSpecificSerializer(
             rna,
             context={
-                "gene": gene,
-                "pub_count": pub_count,
+                "gene": search["gene"] or "",
+                "pub_count": search["pub_count"],
                 "request": request,
                 "species": species,
                 "taxid": taxid,
@@ -426,6 +612,122 @@ class RnaSpeciesSpecificView(APIView):
         return Response(serializer.data)
 
 
+class RnaBatchView(APIView):
+    """
+    Species-specific details about several RNAcentral ids at once.
+
+    POST a JSON list of up to 1000 URS_taxid ids, or {"ids": [...]},
+    to get the entries in the same order, as JSON or NDJSON.
+
+    [API documentation](/api)
+    """
+
+    # the above docstring appears on the API website
+    permission_classes = (AllowAny,)
+    renderer_classes = (renderers.JSONRenderer, NdjsonRenderer)
+    max_ids = 1000
+    id_pattern = re.compile(r"^URS[0-9A-F]{10}_\d+$")
+    query = """
+        SELECT pre.id, pre.taxid, pre.description, pre.short_description,
+            pre.rna_type, pre.is_active, pre.databases, rna.len,
+            rna.seq_short, rna.seq_long, rnc_taxonomy.name
+        FROM rnc_rna_precomputed pre
+        JOIN rna
+        ON rna.upi = pre.upi
+        LEFT JOIN rnc_taxonomy
+        ON rnc_taxonomy.id = pre.taxid
+        WHERE pre.id = ANY(%s)
+    """
+
+    def get_ids(self, data):
+        ids = data.get("ids") if isinstance(data, dict) else data
+        if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+            raise ValidationError('Expected a list of ids or {"ids": [...]}')
+        if len(ids) > self.max_ids:
+            raise ValidationError("At most %i ids per request" % self.max_ids)
+        invalid = [i for i in ids if not self.id_pattern.match(i)]
+        if invalid:
+            raise ValidationError({"invalid_ids": invalid[:10]})
+        return ids
+
+    def get_entries(self, ids):
+        """:return: {URS_taxid: entry} for the ids that exist"""
+        with connection.cursor() as cursor:
+            cursor.execute(self.query, [list(set(ids))])
+            rows = cursor.fetchall()
+        entries = {}
+        for (
+            urs_taxid,
+            taxid,
+            description,
+            short_description,
+            rna_type,
+            is_active,
+            databases,
+            length,
+            seq_short,
+            seq_long,
+            species,
+        ) in rows:
+            entries[urs_taxid] = {
+                "rnacentral_id": urs_taxid,
+                "found": True,
+                # a few entries have no sequence
+                "sequence": (seq_short or seq_long or "").replace("T", "U").upper(),
+                "length": length,
+                "description": description,
+                "short_description": short_description,
+                "species": species or "",
+                "taxid": taxid,
+                "rna_type": rna_type,
+                "is_active": is_active,
+                "distinct_databases": databases,
+            }
+        return entries
+
+    def post(self, request, format=None):
+        ids = self.get_ids(request.data)
+        entries = self.get_entries(ids) if ids else {}
+        results = [
+            entries.get(urs_taxid, {"rnacentral_id": urs_taxid, "found": False})
+            for urs_taxid in ids
+        ]
+        return Response({"count": len(results), "results": results})
+
+
+def normalize_fields_params(view):
+    """
+    Sort the `fields` and `exclude` query parameters of sparse fieldsets,
+    so that the per-view cache keeps one copy of every field set,
+    whatever the order of the fields in the url.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        params = request.GET.copy()
+        for name in ("fields", "exclude"):
+            if name in params:
+                fields = {field.strip() for field in params[name].split(",")}
+                params[name] = ",".join(sorted(fields - {""}))
+        if "fields" in params or "exclude" in params:
+            request.META["QUERY_STRING"] = params.urlencode(safe=",")
+            request.GET = QueryDict(request.META["QUERY_STRING"])
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def select_xref_fields(xrefs, request):
+    """Skip the queries behind the xref fields that are not requested."""
+    if is_optional_field_requested(request, "genomic_coordinates"):
+        xrefs = xrefs.with_genomic_coordinates()
+    if not any(is_field_requested(request, name) for name in RELATED_SEQUENCES_KINDS):
+        xrefs = xrefs.without_related_sequences()
+    if not is_field_requested(request, "modifications"):
+        xrefs = xrefs.prefetch_related(None)
+    return xrefs
+
+
 class XrefList(generics.ListAPIView):
     """
     List of cross-references for a particular RNA sequence.
@@ -435,10 +737,11 @@ class XrefList(generics.ListAPIView):
 
     serializer_class = XrefSerializer
     pagination_class = Pagination
+    keyset_ordering = ("-db_id", "-id")  # used with ?cursor=
 
     def get_queryset(self):
         upi = self.kwargs["pk"]
-        return Rna.objects.get(upi=upi).get_xrefs()
+        return select_xref_fields(Rna.objects.get(upi=upi).get_xrefs(), self.request)
 
 
 class XrefsSpeciesSpecificList(generics.ListAPIView):
@@ -450,11 +753,14 @@ class XrefsSpeciesSpecificList(generics.ListAPIView):
 
     serializer_class = XrefSerializer
     pagination_class = Pagination
+    keyset_ordering = ("-db_id", "-id")  # used with ?cursor=
 
     def get_queryset(self):
         upi = self.kwargs["pk"]
         taxid = self.kwargs["taxid"]
-        return Rna.objects.get(upi=upi).get_xrefs(taxid=taxid)
+        return select_xref_fields(
+            Rna.objects.get(upi=upi).get_xrefs(taxid=taxid), self.request
+        )
 
 
 class SecondaryStructureSpeciesSpecificList(generics.ListAPIView):
@@ -481,73 +787,28 @@ class SecondaryStructureSVGImage(generics.ListAPIView):
     permission_classes = (AllowAny,)
 
     def get(self, request, pk=None, format=None):
-        s3 = boto3.resource(
-            "s3",
-            aws_access_key_id=settings.S3_SERVER["KEY"],
-            aws_secret_access_key=settings.S3_SERVER["SECRET"],
-            endpoint_url=settings.S3_SERVER["HOST"],
-        )
-
-        upi = list(self.kwargs["pk"])
-        upi_path = (
-            "".join(upi[0:3])
-            + "/"
-            + "".join(upi[3:5])
-            + "/"
-            + "".join(upi[5:7])
-            + "/"
-            + "".join(upi[7:9])
-            + "/"
-            + "".join(upi[9:11])
-            + "/"
-        )
-
-        s3_file = "prod/" + upi_path + self.kwargs["pk"] + ".svg.gz"
-        s3_obj = s3.Object(settings.S3_SERVER["BUCKET"], s3_file)
-        try:
-            s3_svg = zlib.decompress(s3_obj.get()["Body"].read(), zlib.MAX_WBITS | 32)
-        except s3.meta.client.exceptions.NoSuchKey:
-            return Response(status=status.HTTP_404_NOT_FOUND)
-
-        return HttpResponse(
-            self.generate_thumbnail(s3_svg.decode("utf-8"), "".join(upi)),
-            content_type="image/svg+xml",
-        )
-
-    def generate_thumbnail(self, image, upi):
-        move_to_start_position = None
-        color = ColorHash(upi).hex
-        points = []
-        width = []
-        height = []
-        for i, line in enumerate(image.split("\n")):
-            if not width:
-                width = re.findall(r'width="(\d+(\.\d+)?)"', line)
-            if not height:
-                height = re.findall(r'height="(\d+(\.\d+)?)"', line)
-            for nt in re.finditer(
-                '<text x="(\d+)(\.\d+)?" y="(\d+)(\.\d+)?".*?</text>', line
-            ):
-                if "numbering-label" in nt.group(0):
-                    continue
-                if not move_to_start_position:
-                    move_to_start_position = "M{} {} ".format(nt.group(1), nt.group(3))
-                points.append("L{} {}".format(nt.group(1), nt.group(3)))
-        if len(points) < 200:
-            stroke_width = "3"
-        elif len(points) < 500:
-            stroke_width = "4"
-        elif len(points) < 3000:
-            stroke_width = "4"
+        upi = self.kwargs["pk"]
+        store = get_thumbnail_store()
+        thumbnail = store.get(upi)
+        if thumbnail is None:
+            # not precomputed yet, generate it and add it to the store
+            s3_svg = get_layout_svg(upi)
+            if s3_svg is None:
+                return Response(status=status.HTTP_404_NOT_FOUND)
+            thumbnail = store.put(upi, generate_thumbnail(s3_svg.decode("utf-8"), upi))
+
+        # send the stored gzip unchanged, GZipMiddleware skips encoded responses
+        accept_encoding = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if re_accepts_gzip.search(accept_encoding):
+            response = HttpResponse(thumbnail, content_type="image/svg+xml")
+            response["Content-Encoding"] = "gzip"
         else:
-            stroke_width = "2"
-        thumbnail = '<svg xmlns="http://www.w3.org/2000/svg" width="{}" height="{}"><path style="stroke:{};stroke-width:{}px;fill:none;" d="'.format(
-            width[0][0], height[0][0], color, stroke_width
-        )
-        thumbnail += move_to_start_position
-        thumbnail += " ".join(points)
-        thumbnail += '"/></svg>'
-        return thumbnail
+            response = HttpResponse(
+                gzip.decompress(thumbnail), content_type="image/svg+xml"
+            )
+        # the per-view cache must keep both versions
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
 
 
 class RnaGenomeLocations(generics.ListAPIView):
@@ -594,16 +855,17 @@ class RnaGenomeLocations(generics.ListAPIView):
             ON {ensembl_assembly}.assembly_id = {sequence_region_active}.assembly_id
             LEFT JOIN {taxonomy}
             ON {taxonomy}.id = {ensembl_assembly}.taxid
-            WHERE {sequence_region_active}.urs_taxid = '{rna_precomputed}'
-            ORDER BY {ensembl_assembly}.assembly_id
+            WHERE {sequence_region_active}.urs_taxid = %s
+            ORDER BY {ensembl_assembly}.assembly_id, {sequence_region_active}.id
         """.format(
             sequence_region_active=SequenceRegionActive._meta.db_table,
             ensembl_assembly=EnsemblAssembly._meta.db_table,
             taxonomy=Taxonomy._meta.db_table,
-            rna_precomputed=rna_precomputed,
         )
 
-        return SequenceRegionActive.objects.raw(sequence_region_active_query)
+        return PaginatedRawQuerySet(
+            sequence_region_active_query, SequenceRegionActive, [rna_precomputed.id]
+        )
 
 
 class AccessionView(generics.RetrieveAPIView):
@@ -649,9 +911,7 @@ class RnaPublicationsView(generics.ListAPIView):
     def get_queryset(self):
         upi = self.kwargs["pk"]
         taxid = self.kwargs["taxid"] if "taxid" in self.kwargs else None
-        return Rna.objects.get(upi=upi).get_publications(
-            taxid
-        )  # this is actually a list
+        return Rna.objects.get(upi=upi).get_publications(taxid)  # paginated in SQL
 
 
 class ExpertDatabasesAPIView(APIView):
@@ -666,25 +926,16 @@ class ExpertDatabasesAPIView(APIView):
 
     def get(self, request, format=None):
         """The data from configuration JSON and database are combined here."""
-
-        def _normalize_expert_db_label(expert_db_label):
-            """Capitalizes db label (and accounts for special cases)"""
-            if re.match("tmrna-website", expert_db_label, flags=re.IGNORECASE):
-                expert_db_label = "TMRNA_WEB"
-            else:
-                expert_db_label = expert_db_label.upper()
-            return expert_db_label
-
-        # e.g. { "TMRNA_WEB": {'name': 'tmRNA Website', 'label': 'tmrna-website', ...}}
+        # e.g. { "TMRNA_WEB": {'descr': 'TMRNA_WEB', 'num_sequences': ...}}
         databases = {db["descr"]: db for db in Database.objects.values()}
 
-        # update config.expert_databases json with Database table objects
-        for db in expert_dbs:
-            normalized_label = _normalize_expert_db_label(db["label"])
-            if normalized_label in databases:
-                db.update(databases[normalized_label])
-
-        return Response(expert_dbs)
+        # copies of the read-only config entries, updated with Database fields
+        return Response(
+            [
+                dict(db, **databases.get(expert_databases.get_descr(db), {}))
+                for db in expert_databases.EXPERT_DBS
+            ]
+        )
 
     # def get_queryset(self):
     #     expert_db_name = self.kwargs['expert_db_name']
@@ -720,31 +971,7 @@ class GenomesAPIViewSet(ListModelMixin, GenericViewSet):
     lookup_field = "ensembl_url"
 
     def get_queryset(self):
-        ensembl_assembly_query = """
-            SELECT
-                {ensembl_assembly}.assembly_id,
-                {ensembl_assembly}.assembly_full_name,
-                {ensembl_assembly}.gca_accession,
-                {ensembl_assembly}.assembly_ucsc,
-                {ensembl_assembly}.taxid,
-                {ensembl_assembly}.ensembl_url,
-                {ensembl_assembly}.division,
-                {ensembl_assembly}.subdomain,
-                {ensembl_assembly}.example_chromosome,
-                {ensembl_assembly}.example_start,
-                {ensembl_assembly}.example_end,
-                {taxonomy}.name as common_name
-            FROM {ensembl_assembly}
-            LEFT JOIN {taxonomy}
-            ON {taxonomy}.id = {ensembl_assembly}.taxid
-            ORDER BY {taxonomy}.name
-        """.format(
-            ensembl_assembly=EnsemblAssembly._meta.db_table,
-            taxonomy=Taxonomy._meta.db_table,
-        )
-
-        queryset = EnsemblAssembly.objects.raw(ensembl_assembly_query)
-        return queryset
+        return list(get_assemblies())  # ordered by species name
 
 
 class RfamHitsAPIViewSet(generics.ListAPIView):
@@ -861,19 +1088,16 @@ class ProteinTargetsView(generics.ListAPIView):
             LEFT JOIN {protein_info}
             ON {protein_info}.protein_accession = {related_sequence}.target_accession
             WHERE {related_sequence}.relationship_type = 'target_protein'
-              AND {related_sequence}.source_urs_taxid = '{pk}_{taxid}'
+              AND {related_sequence}.source_urs_taxid = %s
+            ORDER BY {related_sequence}.target_accession, {related_sequence}.id
         """.format(
-            rna=Rna._meta.db_table,
-            rna_precomputed=RnaPrecomputed._meta.db_table,
             related_sequence=RelatedSequence._meta.db_table,
             protein_info=ProteinInfo._meta.db_table,
-            pk=pk,
-            taxid=taxid,
         )
 
-        # queryset = PaginatedRawQuerySet(protein_info_query, model=ProteinInfo)  # was: ProteinInfo.objects.raw(protein_info_query)
-        queryset = ProteinInfo.objects.raw(protein_info_query)
-        return queryset
+        return PaginatedRawQuerySet(
+            protein_info_query, ProteinInfo, ["%s_%s" % (pk, taxid)]
+        )
 
 
 class LncrnaTargetsView(generics.ListAPIView):
@@ -905,21 +1129,20 @@ class LncrnaTargetsView(generics.ListAPIView):
             FROM {related_sequence}
             LEFT JOIN {rna_precomputed}
             ON target_urs_taxid = {rna_precomputed}.id
-            LEFT JOIN protein_info
+            LEFT JOIN {protein_info}
             ON {protein_info}.protein_accession = {related_sequence}.target_accession
             WHERE {related_sequence}.relationship_type = 'target_rna'
-              AND {related_sequence}.source_urs_taxid = '{pk}_{taxid}'
-            ORDER BY target_urs_taxid
+              AND {related_sequence}.source_urs_taxid = %s
+            ORDER BY target_urs_taxid, {related_sequence}.id
         """.format(
             rna_precomputed=RnaPrecomputed._meta.db_table,
             related_sequence=RelatedSequence._meta.db_table,
             protein_info=ProteinInfo._meta.db_table,
-            pk=pk,
-            taxid=taxid,
         )
-        # queryset = PaginatedRawQuerySet(protein_info_query, model=ProteinInfo)
-        queryset = ProteinInfo.objects.raw(protein_info_query)
-        return queryset
+
+        return PaginatedRawQuerySet(
+            protein_info_query, ProteinInfo, ["%s_%s" % (pk, taxid)]
+        )
 
 
 class QcStatusView(APIView):
@@ -936,9 +1159,14 @@ class QcStatusView(APIView):
 
 
 class LargerPagination(Pagination):
+    """
+    Adds the Ensembl Compara link and status of the sequence to the response.
+    They are set on the paginator instance of each request by the view.
+    """
+
     page_size = 50
     ensembl_compara_url = None
-    compara_status = None
+    ensembl_compara_status = None
 
     def get_paginated_response(self, data):
         return Response(
@@ -961,29 +1189,26 @@ class EnsemblComparaAPIViewSet(generics.ListAPIView):
     permission_classes = (AllowAny,)
     serializer_class = EnsemblComparaSerializer
     pagination_class = LargerPagination
-    ensembl_transcript_id = ""
+
+    def get_urs_taxid(self):
+        return self.kwargs["pk"] + "_" + self.kwargs["taxid"]
 
     def get_queryset(self):
-        upi = self.kwargs["pk"]
-        taxid = self.kwargs["taxid"]
-        self_urs_taxid = upi + "_" + taxid
-        urs_taxid = EnsemblCompara.objects.filter(urs_taxid__id=self_urs_taxid).first()
-        if urs_taxid:
-            self.ensembl_transcript_id = urs_taxid.ensembl_transcript_id
-            return (
-                EnsemblCompara.objects.filter(homology_id=urs_taxid.homology_id)
-                .exclude(urs_taxid=self_urs_taxid)
-                .order_by("urs_taxid__description")
-                .all()
-            )
-        else:
-            return []
+        urs_taxid = self.get_urs_taxid()
+        self.group = get_homology_group(urs_taxid)
+        # the first transcript of the sequence, see get_homology_group
+        self.own_entry = min(
+            (entry for entry in self.group if entry.urs_taxid_id == urs_taxid),
+            key=lambda entry: entry.ensembl_transcript_id,
+            default=None,
+        )
+        return [entry for entry in self.group if entry.urs_taxid_id != urs_taxid]
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
 
-        self.pagination_class.ensembl_compara_url = self.get_ensembl_compara_url()
-        self.pagination_class.ensembl_compara_status = self.get_ensembl_compara_status()
+        self.paginator.ensembl_compara_url = self.get_ensembl_compara_url()
+        self.paginator.ensembl_compara_status = self.get_ensembl_compara_status()
         page = self.paginate_queryset(queryset)
 
         if page is not None:
@@ -995,35 +1220,33 @@ class EnsemblComparaAPIViewSet(generics.ListAPIView):
         return Response({"data": serializer.data})
 
     def get_ensembl_compara_url(self):
-        urs_taxid = self.kwargs["pk"] + "_" + self.kwargs["taxid"]
-        genome_region = SequenceRegion.objects.filter(urs_taxid__id=urs_taxid).first()
-        if genome_region and self.ensembl_transcript_id:
+        assembly = get_assembly_by_taxid(self.kwargs["taxid"])
+        if assembly and assembly.ensembl_url and self.own_entry:
             return (
                 "http://www.ensembl.org/"
-                + genome_region.assembly.ensembl_url
+                + assembly.ensembl_url
                 + "/Gene/Compara_Tree?t="
-                + self.ensembl_transcript_id
+                + self.own_entry.ensembl_transcript_id
             )
         else:
             return None
 
     def get_ensembl_compara_status(self):
-        urs_taxid = self.kwargs["pk"] + "_" + self.kwargs["taxid"]
-
-        rna_precomputed = RnaPrecomputed.objects.get(id=urs_taxid)
-        if rna_precomputed.databases and "Ensembl" not in rna_precomputed.databases:
+        if self.own_entry:
+            databases = self.own_entry.urs_taxid.databases
+        else:
+            databases = (
+                RnaPrecomputed.objects.filter(id=self.get_urs_taxid())
+                .values_list("databases", flat=True)
+                .first()
+            )
+        if databases and "Ensembl" not in databases:
             return "analysis not available"
 
-        compara = EnsemblCompara.objects.filter(urs_taxid=urs_taxid).first()
-        if compara:
-            compara_count = EnsemblCompara.objects.filter(
-                homology_id=compara.homology_id
-            ).count()
-
-        if not compara or compara_count == 0:
+        if not self.own_entry:
             return "RNA type not supported"
 
-        if compara_count == 1:
+        if len(self.group) == 1:
             return "not found"
 
         return "found"
@@ -1049,7 +1272,7 @@ class GenomeBrowserAPIViewSet(APIView):
     permission_classes = (AllowAny,)
 
     def get(self, request, species, format=None):
-        assembly = EnsemblAssembly.objects.filter(ensembl_url=species).first()
+        assembly = get_assembly_by_ensembl_url(species)
         if assembly is None:
             return Response([])
 
@@ -1124,3 +1347,140 @@ class Md5SequenceView(APIView):
 
         serializer = Md5Serializer(precomputed)
         return Response(serializer.data)
+
+
+MD5_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+MD5_QUERY = """
+    SELECT rna.md5, rna.upi, rna.len, pre.description
+    FROM rna
+    LEFT JOIN rnc_rna_precomputed pre
+    ON pre.id = rna.upi
+    WHERE rna.md5 = ANY(%s)
+"""
+
+
+def resolve_md5s(md5s):
+    """
+    Find the sequences with the given md5s using the unique md5 index.
+
+    :return: {md5: entry} for the md5s that exist
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(MD5_QUERY, [list(set(md5s))])
+        return {
+            md5: {
+                "md5": md5,
+                "found": True,
+                "rnacentral_id": upi,
+                "length": length,
+                "description": description,
+            }
+            for md5, upi, length, description in cursor.fetchall()
+        }
+
+
+def missing_md5(md5):
+    return {"md5": md5, "found": False}
+
+
+class LengthRequired(APIException):
+    status_code = status.HTTP_411_LENGTH_REQUIRED
+    default_detail = "A Content-Length header is required."
+
+
+class Md5BatchView(APIView):
+    """
+    Find the RNAcentral ids of up to 10000 sequences by md5.
+
+    POST a JSON list of md5s, or {"md5": [...]}, to get the found entries
+    and the missing md5s in the order of the request.
+    For longer lists use the streaming endpoint.
+
+    [API documentation](/api)
+    """
+
+    # the above docstring appears on the API website
+    permission_classes = (AllowAny,)
+    renderer_classes = (renderers.JSONRenderer,)
+    max_md5s = 10000
+    chunk_size = 1000
+
+    def get_md5s(self, data):
+        md5s = data.get("md5") if isinstance(data, dict) else data
+        if not isinstance(md5s, list) or not all(isinstance(i, str) for i in md5s):
+            raise ValidationError('Expected a list of md5s or {"md5": [...]}')
+        if len(md5s) > self.max_md5s:
+            raise ValidationError("At most %i md5s per request" % self.max_md5s)
+        return [md5.strip().lower() for md5 in md5s]
+
+    def post(self, request, format=None):
+        md5s = self.get_md5s(request.data)
+        valid = [md5 for md5 in md5s if MD5_PATTERN.match(md5)]
+        entries = {}
+        for i in range(0, len(valid), self.chunk_size):
+            entries.update(resolve_md5s(valid[i : i + self.chunk_size]))
+        return Response(
+            {
+                "found": [entries[md5] for md5 in md5s if md5 in entries],
+                "missing": [md5 for md5 in md5s if md5 not in entries],
+            }
+        )
+
+
+class Md5StreamView(APIView):
+    """
+    Find the RNAcentral ids of any number of sequences by md5.
+
+    POST newline-delimited md5s to get one JSON entry per md5, in the same
+    order, as newline-delimited JSON. Entries are streamed as the md5s are
+    resolved in chunks.
+
+    [API documentation](/api)
+    """
+
+    # the above docstring appears on the API website
+    permission_classes = (AllowAny,)
+    renderer_classes = (NdjsonRenderer, renderers.JSONRenderer)
+    chunk_size = 1000
+
+    def read_md5s(self, stream):
+        for line in iter(stream.readline, b""):
+            md5 = line.decode("utf-8", "replace").strip().lower()
+            if md5:
+                yield md5
+
+    def resolve_chunk(self, md5s):
+        entries = resolve_md5s([md5 for md5 in md5s if MD5_PATTERN.match(md5)])
+        return "".join(
+            json.dumps(entries.get(md5) or missing_md5(md5)) + "\n" for md5 in md5s
+        )
+
+    def lines(self, stream):
+        chunk = []
+        for md5 in self.read_md5s(stream):
+            chunk.append(md5)
+            if len(chunk) == self.chunk_size:
+                yield self.resolve_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield self.resolve_chunk(chunk)
+
+    def get_stream(self, request):
+        """
+        Get the request body as a file, or None if it is empty.
+        Django only reads Content-Length bytes, so chunked uploads are read
+        from wsgi.input, which gunicorn ends at the end of the body.
+        """
+        if request.META.get("CONTENT_LENGTH"):
+            return request.stream
+        if request.META.get("wsgi.input_terminated"):
+            return request.META["wsgi.input"]
+        raise LengthRequired()
+
+    def post(self, request, format=None):
+        stream = self.get_stream(request)
+        if stream is None:  # empty request body
+            return StreamingHttpResponse([], content_type=NdjsonRenderer.media_type)
+        return StreamingHttpResponse(
+            self.lines(stream), content_type=NdjsonRenderer.media_type
+        )
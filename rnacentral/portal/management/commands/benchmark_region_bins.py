@@ -0,0 +1,117 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from portal.models import EnsemblAssembly, SequenceRegion
+from portal.utils.bins import has_bin_column, overlapping_bins_sql
+
+
+def range_scan(assembly, chromosome, start, end):
+    """Features fully contained in the window, the original query."""
+    return SequenceRegion.objects.filter(
+        assembly=assembly,
+        chromosome=chromosome,
+        region_start__gte=start,
+        region_stop__lte=end,
+    )
+
+
+def overlap_scan(assembly, chromosome, start, end):
+    """Features overlapping the window, without using bins."""
+    return SequenceRegion.objects.filter(
+        assembly=assembly,
+        chromosome=chromosome,
+        region_start__lte=end,
+        region_stop__gte=start,
+    )
+
+
+def binned_overlap(assembly, chromosome, start, end):
+    """Features overlapping the window, restricted to the overlapping bins."""
+    where, params = overlapping_bins_sql(SequenceRegion._meta.db_table, start, end)
+    return overlap_scan(assembly, chromosome, start, end).extra(
+        where=[where], params=params
+    )
+
+
+def benchmark(query, windows, assembly, chromosome):
+    """Run the query for all windows, return total time and number of rows."""
+    rows = 0
+    began = time.perf_counter()
+    for start, end in windows:
+        rows += len(list(query(assembly, chromosome, start, end).values_list("id")))
+    return time.perf_counter() - began, rows
+
+
+class Command(BaseCommand):
+    """
+    Usage:
+    python manage.py benchmark_region_bins
+    python manage.py benchmark_region_bins --species mus_musculus --chromosome 2
+    """
+
+    help = "Compare range scan and binned overlap queries on genome regions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--species", default="homo_sapiens")
+        parser.add_argument("--chromosome", default="1")
+        parser.add_argument(
+            "--length",
+            type=int,
+            default=248956422,
+            help="Chromosome length (default: GRCh38 chr1)",
+        )
+        parser.add_argument(
+            "--window",
+            dest="windows",
+            type=int,
+            action="append",
+            help="Window size, can be repeated (default: 10 kb, 100 kb, 1 Mb, 10 Mb)",
+        )
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        """Main function, called by django."""
+        if not has_bin_column(SequenceRegion._meta.db_table):
+            raise CommandError("Run `python manage.py create_region_bins` first")
+
+        assembly = EnsemblAssembly.objects.filter(
+            ensembl_url=options["species"]
+        ).first()
+        if assembly is None:
+            raise CommandError("Unknown species %s" % options["species"])
+
+        random.seed(0)
+        for size in options["windows"] or [10**4, 10**5, 10**6, 10**7]:
+            windows = []
+            for _ in range(options["repeat"]):
+                start = random.randint(1, max(options["length"] - size, 1))
+                windows.append((start, start + size))
+
+            self.stdout.write("Window %i bp, %i queries" % (size, len(windows)))
+            for name, query in [
+                ("range scan", range_scan),
+                ("overlap", overlap_scan),
+                ("bins", binned_overlap),
+            ]:
+                seconds, rows = benchmark(
+                    query, windows, assembly, options["chromosome"]
+                )
+                self.stdout.write(
+                    "\t{:<12}{:>10.1f} ms/query{:>10} rows".format(
+                        name, 1000 * seconds / len(windows), rows
+                    )
+                )
@@ -0,0 +1,89 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from portal.models import SequenceRegion, SequenceRegionActive
+from portal.utils.bins import BIN_COLUMN, bin_sql
+
+TABLES = [
+    SequenceRegion._meta.db_table,
+    SequenceRegionActive._meta.db_table,
+]
+
+
+def create_region_bins(table, rebuild=False):
+    """
+    Add the bin column to a genome regions table, populate it and
+    index it together with assembly and chromosome. A trigger keeps
+    the column up to date for rows inserted or updated later.
+    """
+    queries = [
+        "ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} integer",
+        "CREATE OR REPLACE FUNCTION {table}_{column}() RETURNS trigger AS $$ "
+        "BEGIN NEW.{column} := {new_bin_sql}; RETURN NEW; END "
+        "$$ LANGUAGE plpgsql",
+        "DROP TRIGGER IF EXISTS {table}_{column}_trigger ON {table}",
+        "CREATE TRIGGER {table}_{column}_trigger "
+        "BEFORE INSERT OR UPDATE OF region_start, region_stop ON {table} "
+        "FOR EACH ROW EXECUTE PROCEDURE {table}_{column}()",
+        "UPDATE {table} SET {column} = {bin_sql}"
+        + ("" if rebuild else " WHERE {column} IS NULL"),
+        "CREATE INDEX IF NOT EXISTS {table}_{column}_idx "
+        "ON {table} (assembly_id, chromosome, {column})",
+        "ANALYZE {table}",
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for query in queries:
+            cursor.execute(
+                query.format(
+                    table=table,
+                    column=BIN_COLUMN,
+                    bin_sql=bin_sql("region_start", "region_stop"),
+                    new_bin_sql=bin_sql("NEW.region_start", "NEW.region_stop"),
+                )
+            )
+
+
+class Command(BaseCommand):
+    """
+    Usage:
+    python manage.py create_region_bins
+    python manage.py create_region_bins --table rnc_sequence_regions --rebuild
+
+    Run once to create the column, the trigger that fills it for new rows
+    and the index. Use --rebuild if the binning scheme changes.
+    """
+
+    help = "Create the binned interval index used by genome coordinate lookups"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--table",
+            dest="tables",
+            action="append",
+            choices=TABLES,
+            help="Table to index (default: all genome regions tables)",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            default=False,
+            help="Recompute bins for all rows, not only the new ones",
+        )
+
+    def handle(self, *args, **options):
+        """Main function, called by django."""
+        for table in options["tables"] or TABLES:
+            self.stdout.write("Indexing %s" % table)
+            create_region_bins(table, rebuild=options["rebuild"])
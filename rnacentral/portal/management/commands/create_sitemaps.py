@@ -27,6 +27,7 @@ from django.db.models import Q
 from django.http import HttpRequest
 from django.urls import reverse
 from portal.models import Database, RnaPrecomputed
+from portal.utils.sequence_urls import get_sequence_path
 
 # Queryset for Rna sections; include only Human and Mouse rnas for now.
 rna_queryset = (
@@ -148,10 +149,7 @@ class Command(BaseCommand):
                     return self.rna_paginator.page(self.page_number)
 
                 def location(self, item):
-                    return reverse(
-                        "unique-rna-sequence",
-                        kwargs={"upi": item.upi_id, "taxid": item.taxid},
-                    )
+                    return get_sequence_path(item.upi_id, item.taxid)
 
             self._sitemaps = OrderedDict(
                 [
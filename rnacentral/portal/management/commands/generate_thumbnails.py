@@ -0,0 +1,111 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import zlib
+from collections import Counter
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from portal.models import SecondaryStructureWithLayout
+from portal.models.release import get_release_version
+from portal.utils.layouts import download_layout, get_s3_client
+from portal.utils.thumbnails import generate_thumbnail, get_thumbnail_store
+
+BATCH_SIZE = 10000
+
+
+def init_worker():
+    """Do not share S3 connections with the parent process."""
+    get_s3_client.cache_clear()
+
+
+def store_thumbnail(args):
+    """Generate the thumbnail of one sequence, run in a worker process."""
+    upi, release, overwrite = args
+    store = get_thumbnail_store(release)
+    if not overwrite and upi in store:
+        return "skipped"
+    layout = download_layout(upi)
+    if layout is None:
+        return "missing"
+    svg = zlib.decompress(layout, zlib.MAX_WBITS | 32).decode("utf-8")
+    store.put(upi, generate_thumbnail(svg, upi))
+    return "generated"
+
+
+def get_batches(limit=None):
+    """Get URS with a layout in batches of BATCH_SIZE."""
+    upis = SecondaryStructureWithLayout.objects.order_by("urs").values_list(
+        "urs", flat=True
+    )
+    if limit:
+        upis = upis[:limit]
+    batch = []
+    for upi in upis.iterator(chunk_size=BATCH_SIZE):
+        batch.append(upi)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    """
+    Usage:
+    python manage.py generate_thumbnails
+    python manage.py generate_thumbnails --processes 8 --overwrite
+
+    Run after every release, once the R2DT layouts are in S3.
+    """
+
+    help = "Precompute secondary structure thumbnails for all sequences with layouts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=os.cpu_count(),
+            help="Number of worker processes (default: number of CPUs)",
+        )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            default=False,
+            help="Regenerate thumbnails that are already in the store",
+        )
+        parser.add_argument(
+            "--limit", type=int, help="Only process the first LIMIT sequences"
+        )
+
+    def handle(self, *args, **options):
+        """Main function, called by django."""
+        release = get_release_version()
+        counts = Counter()
+        # forked workers must not reuse the database connection
+        connections.close_all()
+        with Pool(options["processes"], initializer=init_worker) as pool:
+            for batch in get_batches(options["limit"]):
+                tasks = [(upi, release, options["overwrite"]) for upi in batch]
+                counts.update(pool.imap_unordered(store_thumbnail, tasks, 100))
+                self.stdout.write(
+                    "Release %s: %i generated, %i skipped, %i missing layouts"
+                    % (
+                        release,
+                        counts["generated"],
+                        counts["skipped"],
+                        counts["missing"],
+                    )
+                )
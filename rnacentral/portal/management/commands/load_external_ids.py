@@ -0,0 +1,196 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import csv
+import gzip
+import json
+import os
+import re
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from portal.utils.external_ids import (
+    ENSEMBL,
+    HGNC,
+    LOOKUP_KINDS_KEY,
+    LOOKUP_TABLE,
+    UNIPROT,
+    normalize,
+)
+from psycopg2.extras import execute_values
+
+BATCH_SIZE = 10000
+GTF_ATTRIBUTE = re.compile(r'(\w+) "([^"]*)"')
+
+
+def open_file(filename):
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rt")
+    return open(filename)
+
+
+def parse_hgnc(filename):
+    """
+    Parse hgnc_complete_set.txt from
+    https://www.genenames.org/download/archive/
+
+    :return: (symbol, HGNC id) tuples
+    """
+    with open_file(filename) as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            yield row["symbol"], row["hgnc_id"]
+
+
+def parse_uniprot(filename):
+    """
+    Parse an idmapping.dat file from
+    https://ftp.uniprot.org/pub/databases/uniprot/current_release/knowledgebase/idmapping/
+
+    :return: (accession, gene name) tuples, the first gene name of every accession
+    """
+    seen = set()
+    with open_file(filename) as f:
+        for line in f:
+            accession, id_type, value = line.rstrip("\n").split("\t")
+            if id_type == "Gene_Name" and accession not in seen:
+                seen.add(accession)
+                yield accession, value
+
+
+def parse_gtf(filename, species=None):
+    """
+    Parse an Ensembl GTF file, e.g. Homo_sapiens.GRCh38.110.gtf.gz.
+    The species is taken from the file name unless specified.
+
+    :return: (stable id, {"species": ..., "display_name": ..., "parent": ...})
+    tuples, in the format of the Ensembl REST lookup endpoint
+    """
+    if species is None:
+        species = os.path.basename(filename).split(".")[0].lower()
+    with open_file(filename) as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            if fields[2] not in ("gene", "transcript"):
+                continue
+            attributes = dict(GTF_ATTRIBUTE.findall(fields[8]))
+            if fields[2] == "gene":
+                yield attributes["gene_id"], {
+                    "species": species,
+                    "display_name": attributes.get("gene_name", ""),
+                    "parent": "",
+                }
+            else:
+                yield attributes["transcript_id"], {
+                    "species": species,
+                    "display_name": attributes.get("transcript_name", ""),
+                    "parent": attributes["gene_id"],
+                }
+
+
+def create_table():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS {table} ("
+            "kind text NOT NULL, "
+            "identifier text NOT NULL, "
+            "value text NOT NULL, "
+            "PRIMARY KEY (kind, identifier))".format(table=LOOKUP_TABLE)
+        )
+
+
+def load(kind, entries):
+    """Insert or update (identifier, value) tuples, return the number of rows."""
+    query = (
+        "INSERT INTO {table} (kind, identifier, value) VALUES %s "
+        "ON CONFLICT (kind, identifier) DO UPDATE SET value = EXCLUDED.value"
+    ).format(table=LOOKUP_TABLE)
+    total = 0
+    batch = []
+    with connection.cursor() as cursor:
+        for identifier, value in entries:
+            batch.append((kind, normalize(kind, identifier), json.dumps(value)))
+            if len(batch) == BATCH_SIZE:
+                execute_values(cursor.cursor, query, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            execute_values(cursor.cursor, query, batch)
+            total += len(batch)
+    return total
+
+
+class Command(BaseCommand):
+    """
+    Usage:
+    python manage.py load_external_ids --hgnc hgnc_complete_set.txt
+    python manage.py load_external_ids --uniprot HUMAN_9606_idmapping.dat.gz
+    python manage.py load_external_ids --ensembl Homo_sapiens.GRCh38.110.gtf.gz
+
+    Once a kind has rows in the table, its ids are resolved without network
+    calls, so load all the files of a kind at once. Other kinds are still
+    requested from the REST APIs.
+    """
+
+    help = "Load the offline Ensembl, UniProt and HGNC lookup table from flat files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hgnc", action="append", default=[])
+        parser.add_argument("--uniprot", action="append", default=[])
+        parser.add_argument(
+            "--ensembl", action="append", default=[], help="Ensembl GTF file"
+        )
+        parser.add_argument(
+            "--species",
+            help="Species of the Ensembl GTF files (default: from the file names)",
+        )
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            default=False,
+            help="Remove existing entries of the loaded kinds first",
+        )
+
+    def handle(self, *args, **options):
+        """Main function, called by django."""
+        files = [(HGNC, filename, parse_hgnc(filename)) for filename in options["hgnc"]]
+        files += [
+            (UNIPROT, filename, parse_uniprot(filename))
+            for filename in options["uniprot"]
+        ]
+        files += [
+            (ENSEMBL, filename, parse_gtf(filename, options["species"]))
+            for filename in options["ensembl"]
+        ]
+        if not files:
+            raise CommandError("Specify at least one file to load")
+
+        with transaction.atomic():
+            create_table()
+            if options["replace"]:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "DELETE FROM {table} WHERE kind = ANY(%s)".format(
+                            table=LOOKUP_TABLE
+                        ),
+                        [list({kind for kind, _, _ in files})],
+                    )
+            for kind, filename, entries in files:
+                self.stdout.write(
+                    "Loaded %i %s ids from %s" % (load(kind, entries), kind, filename)
+                )
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE {table}".format(table=LOOKUP_TABLE))
+        caches["default"].delete(LOOKUP_KINDS_KEY)
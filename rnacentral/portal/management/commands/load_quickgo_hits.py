@@ -0,0 +1,55 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.core.management.base import BaseCommand
+from portal.models.release import get_release_version
+from portal.utils.quickgo import parse_hits_file, set_hits
+
+CHUNK_SIZE = 5000
+
+
+class Command(BaseCommand):
+    """
+    Usage:
+    python manage.py load_quickgo_hits quickgo_hits.tsv
+
+    The file has one tab-separated urs_taxid and number of QuickGO annotations
+    per line. Run after every release, the cached counts are release-specific.
+    """
+
+    help = "Load precomputed QuickGO annotation counts into the cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("filename")
+        parser.add_argument(
+            "--release",
+            type=int,
+            help="Release id of the counts (default: the most recent release)",
+        )
+
+    def handle(self, *args, **options):
+        """Main function, called by django."""
+        release = options["release"] or get_release_version()
+        total = 0
+        chunk = {}
+        with open(options["filename"]) as f:
+            for urs_taxid, value in parse_hits_file(f):
+                chunk[urs_taxid] = value
+                if len(chunk) == CHUNK_SIZE:
+                    set_hits(chunk, release, timeout=None)
+                    total += len(chunk)
+                    chunk = {}
+        if chunk:
+            set_hits(chunk, release, timeout=None)
+            total += len(chunk)
+        self.stdout.write("Loaded QuickGO hits of %i sequences" % total)
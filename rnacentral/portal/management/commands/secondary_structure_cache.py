@@ -0,0 +1,58 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.core.management.base import BaseCommand
+from portal.utils.layouts import get_cache_stats, get_layout_cache, reset_cache_stats
+
+
+class Command(BaseCommand):
+    """
+    Usage:
+    python manage.py secondary_structure_cache
+    python manage.py secondary_structure_cache --clear
+    python manage.py secondary_structure_cache --cull
+    """
+
+    help = "Show hit/miss counters of the secondary structure layout cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            default=False,
+            help="Remove all cached layouts and reset the counters",
+        )
+        parser.add_argument(
+            "--cull",
+            action="store_true",
+            default=False,
+            help="Remove the least recently used layouts if the cache is full",
+        )
+
+    def handle(self, *args, **options):
+        """Main function, called by django."""
+        if options["clear"]:
+            get_layout_cache().clear()
+            reset_cache_stats()
+        elif options["cull"]:
+            get_layout_cache().cull()
+
+        stats = get_cache_stats()
+        self.stdout.write("Hits: %i" % stats["hits"])
+        self.stdout.write("Misses: %i" % stats["misses"])
+        if stats["hit_ratio"] is not None:
+            self.stdout.write("Hit ratio: %.1f%%" % (100 * stats["hit_ratio"]))
+        self.stdout.write(
+            "Cached layouts: %i (%.1f MB)"
+            % (stats["entries"], stats["size"] / 1024**2)
+        )
@@ -0,0 +1,52 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.core.management.base import BaseCommand
+from portal.models import Interactions
+from portal.utils.external_ids import InteractionsResolver
+
+
+class Command(BaseCommand):
+    """
+    Usage:
+    python manage.py warm_interactions_cache
+    python manage.py warm_interactions_cache --chunk-size 5000
+
+    Run after every release, once rnc_interactions is loaded.
+    """
+
+    help = "Resolve Ensembl, UniProt and HGNC ids of all interactions in advance"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        """Main function, called by django."""
+        interactions = (
+            Interactions.objects.exclude(interacting_id__contains="mgi")
+            .only("interacting_id", "names")
+            .order_by("id")
+        )
+        chunk = []
+        total = 0
+        for interaction in interactions.iterator(chunk_size=options["chunk_size"]):
+            chunk.append(interaction)
+            if len(chunk) == options["chunk_size"]:
+                InteractionsResolver(chunk)
+                total += len(chunk)
+                chunk = []
+                self.stdout.write("Resolved ids of %i interactions" % total)
+        if chunk:
+            InteractionsResolver(chunk)
+            total += len(chunk)
+        self.stdout.write("Resolved ids of %i interactions" % total)
@@ -157,7 +157,8 @@ class Accession(models.Model):
 
     def get_ensembl_species_url(self):
         """Get species name in a format that can be used in Ensembl urls."""
-        from .ensembl_assembly import EnsemblAssembly
+        from portal.utils.ensembl_assemblies import get_assembly_by_taxid
+
         from .xref import Xref
 
         if "ENSEMBL" not in self.database:
@@ -177,17 +178,13 @@ class Accession(models.Model):
                 xref = Xref.objects.filter(
                     accession__accession=self.accession, deleted="N"
                 ).get()
-                ensembl_genome = EnsemblAssembly.objects.filter(
-                    taxid=xref.taxid
-                ).first()
+                ensembl_genome = get_assembly_by_taxid(xref.taxid)
                 if ensembl_genome:
                     return ensembl_genome.ensembl_url
                 else:
                     species = self.species
             except Xref.DoesNotExist:
                 return None
-            except EnsemblAssembly.DoesNotExist:
-                return None
             except Exception:
                 return None
         else:
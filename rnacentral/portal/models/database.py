@@ -15,7 +15,7 @@ from caching.base import CachingManager, CachingMixin
 from django.db import models
 from django.urls import reverse
 from django.utils.functional import cached_property
-from portal.config.expert_databases import expert_dbs as rnacentral_expert_dbs
+from portal.utils.expert_databases import get_expert_db
 
 
 class Database(CachingMixin, models.Model):
@@ -119,15 +119,9 @@ class Database(CachingMixin, models.Model):
         return self.__get_database_attribute(self.display_name, "version")
 
     def __get_database_attribute(self, db_name, attribute):
-        """An accessor method for retrieving attributes from a list."""
-        try:
-            return [
-                x[attribute]
-                for x in rnacentral_expert_dbs
-                if x["name"].lower() == db_name.lower()
-            ].pop()
-        except IndexError:
-            return None
+        """Get an attribute of the expert database with the given name."""
+        expert_db = get_expert_db(db_name)
+        return expert_db[attribute] if expert_db else None
 
     def get_absolute_url(self):
         """Get a URL for a Database object. Used for generating sitemaps."""
@@ -12,9 +12,12 @@ limitations under the License.
 """
 
 from caching.base import CachingManager, CachingMixin
+from django.core.cache import cache
 from django.db import models
 from portal.models.database import Database
 
+RELEASE_VERSION_TIMEOUT = 60 * 60  # seconds
+
 
 class Release(CachingMixin, models.Model):
     db = models.ForeignKey(
@@ -39,3 +42,15 @@ class Release(CachingMixin, models.Model):
 
     def __str__(self):
         return str(self.release_date)
+
+
+def get_release_version():
+    """
+    Get the id of the most recent rnc_release entry. It changes every time
+    new data are imported, so it is used to version cache keys.
+    """
+    version = cache.get("release-version")
+    if version is None:
+        version = Release.objects.order_by("-id").values_list("id", flat=True).first()
+        cache.set("release-version", version, RELEASE_VERSION_TIMEOUT)
+    return version
@@ -14,22 +14,23 @@ limitations under the License.
 import itertools as it
 import operator as op
 import re
-import zlib
 from collections import Counter, defaultdict
 
-import boto3
 import requests
 import six
 from caching.base import CachingManager, CachingMixin
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import connection, models
-from django.db.models import Max, Min, Prefetch, Q
-from django.urls import reverse
+from django.db.models import Count, Max, Min, Prefetch, Q
 from django.utils.functional import cached_property
-from portal.config.expert_databases import expert_dbs
 from portal.rfam_matches import check_issues
 from portal.utils import descriptions as desc
+from portal.utils import expert_databases
+from portal.utils.layouts import get_layout_svg
+from portal.utils.sequence_urls import get_sequence_path
+
+from rnacentral.utils.pagination import PaginatedRawQuerySet
 
 from .accession import Accession
 from .modification import Modification
@@ -46,6 +47,37 @@ def dictfetchall(cursor):
     return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
 
+# tier 0: papers of active xrefs, 1: INSDC submissions of active xrefs,
+# 2: papers of deleted xrefs; only the best available tier is shown
+PUBLICATIONS_SQL = """
+WITH refs AS (
+    SELECT t2.reference_id AS id, bool_or(t1.deleted = 'N') AS active
+    FROM xref t1
+    JOIN rnc_reference_map t2 ON t2.accession = t1.ac
+    WHERE t1.upi = %(upi)s
+    AND (%(taxid)s::int IS NULL OR t1.taxid = %(taxid)s::int)
+    GROUP BY t2.reference_id
+), ranked AS (
+    SELECT
+        b.id, b.location, COALESCE(b.title, '') AS title, b.pmid, b.doi, b.authors,
+        CASE
+            WHEN NOT refs.active THEN 2
+            WHEN COALESCE(b.title, '') = '' AND b.location LIKE 'Submitted%%' THEN 1
+            ELSE 0
+        END AS tier
+    FROM refs
+    JOIN rnc_references b ON b.id = refs.id
+), publications AS (
+    SELECT DISTINCT ON (lower(title))
+        id, location, title, pmid, doi, authors,
+        COALESCE(pmid = ANY(%(expert_pmids)s), false) AS expert_db
+    FROM ranked
+    WHERE tier = (SELECT MIN(tier) FROM ranked)
+    ORDER BY lower(title), title, id
+)
+"""
+
+
 class Rna(CachingMixin, models.Model):
     id = models.IntegerField(db_column="id")
     upi = models.CharField(max_length=13, db_index=True, primary_key=True)
@@ -68,121 +100,72 @@ class Rna(CachingMixin, models.Model):
 
     def get_absolute_url(self):
         """Get a URL for an RNA object. Used for generating sitemaps."""
-        return reverse("unique-rna-sequence", kwargs={"upi": self.upi})
+        return get_sequence_path(self.upi)
 
-    def get_publications(self, taxid=None):
+    @staticmethod
+    def load_summaries(rnas):
         """
-        Get all publications associated with a Unique RNA Sequence.
-        Use raw SQL query for better performance.
-
-        Normally, querysets are lazily evaluated, which (among other benefits)
-        allows code that receives queryset to paginate it later on (this is
-        used by Django and DRF views).
-
-        Here we want to do 2 things that require immediate evaluation of
-        queryset:
-         - filter out INSDC submissions only if there are no other papers
-         - order publications, so that expert database releases go last
-
-        Hopefully, the number of publications per RNA is not huge, so
-        this shouldn't make our server too slow.
-        """
-        query = """
-        SELECT b.id, b.location, b.title, b.pmid as pubmed, b.doi, b.authors
-        FROM
-            (SELECT DISTINCT t3.id
-            FROM xref t1, rnc_reference_map t2, RNC_REFERENCES t3
-            WHERE t1.ac = t2.accession AND
-                  t1.upi = %s AND
-                  {taxid_clause}
-                  {deleted_clause}
-                  t2.reference_id = t3.id) a
-        JOIN
-            rnc_references b
-        ON a.id = b.id
-        {where_clause}
-        ORDER BY b.title
+        Attach the non-species-specific RnaPrecomputed entry, activity and
+        number of organisms to several Rna objects with two queries, so that
+        get_description(), get_rna_type(), get_distinct_database_names(),
+        is_active() and count_distinct_organisms do not query the database.
         """
-
-        where_clause = "WHERE NOT ((b.title is NULL OR b.title = '') AND b.location LIKE 'Submitted%%')"
-        taxid_clause = "t1.taxid = %s AND" % taxid
-        deleted_clause = "t1.deleted = 'N' AND"
-
-        # filter-out INSDC submissions with where_clause, deleted with deleted_clause; filter by taxid, if it's given
-        if taxid:
-            formatted_query = query.format(
-                taxid_clause=taxid_clause,
-                where_clause=where_clause,
-                deleted_clause=deleted_clause,
+        rnas = list(rnas)
+        upis = [rna.upi for rna in rnas]
+        precomputed = {
+            entry.upi_id: entry
+            for entry in RnaPrecomputed.objects.filter(
+                upi__in=upis, taxid__isnull=True
+            ).only("upi", "description", "rna_type", "databases")
+        }
+        xrefs = {
+            entry["upi"]: entry
+            for entry in Xref.default_objects.filter(upi__in=upis)
+            .order_by()
+            .values("upi")
+            .annotate(
+                active=Count("id", filter=Q(deleted="N")),
+                active_taxids=Count("taxid", distinct=True, filter=Q(deleted="N")),
+                taxids=Count("taxid", distinct=True),
             )
-        else:
-            formatted_query = query.format(
-                taxid_clause="",
-                where_clause=where_clause,
-                deleted_clause=deleted_clause,
+        }
+        for rna in rnas:
+            rna._precomputed = precomputed.get(rna.upi)
+            entry = xrefs.get(rna.upi, {"active": 0, "active_taxids": 0, "taxids": 0})
+            rna._is_active = entry["active"] > 0
+            rna.__dict__["count_distinct_organisms"] = (
+                entry["active_taxids"] or entry["taxids"]
             )
 
-        queryset = list(Reference.objects.raw(formatted_query, [self.upi]))
-
-        # if queryset is empty, try finding at least INSDC submissions
-        if len(queryset) == 0:
-            if taxid:
-                formatted_query = query.format(
-                    taxid_clause=taxid_clause,
-                    where_clause="",
-                    deleted_clause=deleted_clause,
-                )
-            else:
-                formatted_query = query.format(
-                    taxid_clause="", where_clause="", deleted_clause=deleted_clause
-                )
-
-            queryset = list(Reference.objects.raw(formatted_query, [self.upi]))
+    def get_publications(self, taxid=None):
+        """
+        Get all publications associated with a Unique RNA Sequence.
 
-        # if queryset is still empty, try displaying deleted papers
-        if len(queryset) == 0:
-            if taxid:
-                formatted_query = query.format(
-                    taxid_clause=taxid_clause, where_clause="", deleted_clause=""
-                )
-            else:
-                formatted_query = query.format(
-                    taxid_clause="", where_clause="", deleted_clause=""
-                )
+        INSDC submissions are only shown if there are no other papers,
+        and papers of deleted cross-references only if there are no papers
+        of active ones. Publications are ordered so that expert database
+        releases go last.
 
-            queryset = list(Reference.objects.raw(formatted_query, [self.upi]))
-
-        # find expert dbs and move them to the end of the list, apply filtration
-        references = {}
-        for expert_db in expert_dbs:
-            for reference in expert_db["references"]:
-                pubmed_id = reference["pubmed_id"]
-                references[pubmed_id] = expert_db
-
-        expert_db_publications = []
-        non_expert_db_publications = []
-
-        titles = []
-        for publication in queryset:
-            if not publication.title:
-                publication.title = ""
-            if (
-                publication.pubmed in references
-                and publication.title.lower() not in titles
-            ):
-                expert_db_publications.append(publication)
-                titles.append(publication.title.lower())
-                publication.expert_db = True  # flags that it's an expert_db, UI should display a special label
-            elif publication.title.lower() not in titles:
-                non_expert_db_publications.append(publication)
-                titles.append(publication.title.lower())
-                publication.expert_db = False
-
-        return non_expert_db_publications + expert_db_publications
+        The result is evaluated lazily, so that DRF views only fetch
+        the requested page.
+        """
+        params = {
+            "upi": self.upi,
+            "taxid": int(taxid) if taxid else None,
+            "expert_pmids": list(expert_databases.PUBMED_IDS),
+        }
+        return PaginatedRawQuerySet(
+            PUBLICATIONS_SQL
+            + "SELECT * FROM publications ORDER BY expert_db, title, id",
+            Reference,
+            params,
+            count_query=PUBLICATIONS_SQL + "SELECT COUNT(*) FROM publications",
+        )
 
     def is_active(self):
         """A sequence is considered active if it has at least one active cross_reference."""
-        values_list = self.xrefs.values_list("deleted", flat=True)
+        if hasattr(self, "_is_active"):  # see load_summaries
+            return self._is_active
         return (
             "N" in self.xrefs.values_list("deleted", flat=True).distinct()
         )  # deleted xrefs are marked with N
@@ -263,10 +246,15 @@ class Rna(CachingMixin, models.Model):
 
     def get_distinct_database_names(self, taxid=None):
         """Get a non-redundant list of databases referencing the sequence."""
-        try:
-            dbs = RnaPrecomputed.objects.filter(upi=self.upi, taxid=taxid).get()
-        except RnaPrecomputed.DoesNotExist:
-            return ""
+        if taxid is None and hasattr(self, "_precomputed"):  # see load_summaries
+            dbs = self._precomputed
+            if dbs is None:
+                return ""
+        else:
+            try:
+                dbs = RnaPrecomputed.objects.filter(upi=self.upi, taxid=taxid).get()
+            except RnaPrecomputed.DoesNotExist:
+                return ""
         return sorted(
             dbs.databases.split(","), key=lambda s: s.lower()
         )  # case-insensitive
@@ -316,7 +304,11 @@ class Rna(CachingMixin, models.Model):
             The rna type computed for this sequence and possibly taxon id.
         """
 
-        if not recompute:
+        if not recompute and taxid is None and hasattr(self, "_precomputed"):
+            if self._precomputed is not None:  # see load_summaries
+                if self._precomputed.rna_type is not None:
+                    return self._precomputed.rna_type
+        elif not recompute:
             queryset = RnaPrecomputed.objects.filter(taxid=taxid)
             try:
                 rna_type = queryset.get(upi=self.upi).rna_type
@@ -370,7 +362,10 @@ class Rna(CachingMixin, models.Model):
         description : str
             The description of this sequence.
         """
-        if not recompute:
+        if not recompute and not taxid and hasattr(self, "_precomputed"):
+            if self._precomputed is not None:  # see load_summaries
+                return self._precomputed.description
+        elif not recompute:
             if taxid:
                 queryset = RnaPrecomputed.objects.filter(taxid=taxid)
             else:
@@ -585,34 +580,9 @@ class Rna(CachingMixin, models.Model):
             return {}
 
         # Layout comes from S3
-        s3 = boto3.resource(
-            "s3",
-            aws_access_key_id=settings.S3_SERVER["KEY"],
-            aws_secret_access_key=settings.S3_SERVER["SECRET"],
-            endpoint_url=settings.S3_SERVER["HOST"],
-        )
-
-        upi = list(self.pk)
-        upi_path = (
-            "".join(upi[0:3])
-            + "/"
-            + "".join(upi[3:5])
-            + "/"
-            + "".join(upi[5:7])
-            + "/"
-            + "".join(upi[7:9])
-            + "/"
-            + "".join(upi[9:11])
-            + "/"
-        )
-
-        s3_file = "prod/" + upi_path + self.pk + ".svg.gz"
-        s3_obj = s3.Object(settings.S3_SERVER["BUCKET"], s3_file)
-        try:
-            svg = zlib.decompress(s3_obj.get()["Body"].read(), zlib.MAX_WBITS | 32)
+        svg = get_layout_svg(self.pk)
+        if svg is not None:
             svg = svg.replace(b"rgb(255, 0, 0)", b"rgb(255,0,255)")
-        except s3.meta.client.exceptions.NoSuchKey:
-            svg = None
 
         # model_name = layout.template.model_name
         # if model_name.count('.') >= 2:
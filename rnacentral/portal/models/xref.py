@@ -14,11 +14,123 @@ limitations under the License.
 import re
 
 from caching.base import CachingManager, CachingMixin
-from django.db import models
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+from portal.utils.ensembl_assemblies import get_assembly_by_taxid
 from rest_framework.renderers import JSONRenderer
 
 from .accession import Accession
-from .ensembl_assembly import EnsemblAssembly
+
+# chromosome and strand of the first region, start and end of all regions
+GENOMIC_COORDINATES_SQL = """
+    SELECT json_build_object(
+        'chromosome', (array_agg(regions.chromosome ORDER BY regions.id))[1],
+        'strand', (array_agg(regions.strand ORDER BY regions.id))[1],
+        'start', min(regions.region_start),
+        'end', max(regions.region_stop)
+    )
+    FROM rnc_accession_sequence_region accession_regions
+    JOIN rnc_sequence_regions regions
+    ON regions.id = accession_regions.region_id
+    WHERE accession_regions.accession = xref.ac
+"""
+
+
+RELATED_SEQUENCES_DATABASES = ("MIRBASE", "REFSEQ")
+RELATED_SEQUENCES_DBIDS = (4, 9)  # MIRBASE, REFSEQ
+PRECURSOR_KINDS = ("mirbase_precursor", "refseq_mirna_precursor")
+RELATED_SEQUENCES_KINDS = (
+    "mirbase_mature_products",
+    "mirbase_precursor",
+    "refseq_mirna_mature_products",
+    "refseq_mirna_precursor",
+    "refseq_splice_variants",
+)
+
+# Self-joins of the page xrefs, impossible in Django ORM, tagged by the name of
+# the xref attribute. The query text does not depend on the page, so that
+# Postgres can reuse its plan.
+RELATED_SEQUENCES_SQL = """
+    WITH page AS (
+        SELECT xref.id, xref.ac, xref.dbid, rnc_accessions.database,
+            rnc_accessions.feature_name, rnc_accessions.external_id,
+            rnc_accessions.parent_ac, rnc_accessions.optional_id,
+            rnc_accessions.ncrna_class
+        FROM xref
+        JOIN rnc_accessions
+        ON xref.ac = rnc_accessions.accession
+        WHERE xref.id = ANY(%(ids)s)
+    )
+    SELECT 'mirbase_mature_products', page.id, related.upi
+    FROM page
+    JOIN rnc_accessions
+    ON rnc_accessions.external_id = page.external_id
+    JOIN xref related
+    ON related.ac = rnc_accessions.accession
+    WHERE page.database = 'MIRBASE'
+      AND page.feature_name = 'precursor_RNA'
+      AND rnc_accessions.database = 'MIRBASE'
+      AND rnc_accessions.feature_name = 'ncRNA'
+      AND (%(taxid)s::int IS NULL OR related.taxid = %(taxid)s)
+    UNION ALL
+    SELECT 'mirbase_precursor', page.id, related.upi
+    FROM page
+    JOIN rnc_accessions
+    ON rnc_accessions.external_id = page.external_id
+    JOIN xref related
+    ON related.ac = rnc_accessions.accession
+    WHERE page.database = 'MIRBASE'
+      AND page.feature_name = 'ncRNA'
+      AND rnc_accessions.database = 'MIRBASE'
+      AND rnc_accessions.feature_name = 'precursor_RNA'
+      AND (%(taxid)s::int IS NULL OR related.taxid = %(taxid)s)
+    UNION ALL
+    SELECT 'refseq_mirna_mature_products', page.id, related.upi
+    FROM page
+    JOIN rnc_accessions
+    ON rnc_accessions.parent_ac = page.parent_ac
+    JOIN xref related
+    ON related.ac = rnc_accessions.accession
+    WHERE page.database = 'REFSEQ'
+      AND page.feature_name = 'precursor_RNA'
+      AND rnc_accessions.database = 'REFSEQ'
+      AND rnc_accessions.feature_name = 'ncRNA'
+      AND (%(taxid)s::int IS NULL OR related.taxid = %(taxid)s)
+    UNION ALL
+    SELECT 'refseq_mirna_precursor', page.id, related.upi
+    FROM page
+    JOIN rnc_accessions
+    ON rnc_accessions.parent_ac = page.parent_ac
+    JOIN xref related
+    ON related.ac = rnc_accessions.accession
+    WHERE page.dbid = 9
+      AND page.feature_name = 'ncRNA'
+      AND related.dbid = 9
+      AND rnc_accessions.feature_name = 'precursor_RNA'
+      AND (%(taxid)s::int IS NULL OR related.taxid = %(taxid)s)
+    UNION ALL
+    SELECT 'refseq_splice_variants', page.id, related.upi
+    FROM page
+    JOIN rnc_accessions
+    ON rnc_accessions.optional_id = page.optional_id
+    JOIN xref related
+    ON related.ac = rnc_accessions.accession
+    WHERE page.dbid = 9
+      AND page.optional_id != ''
+      AND (page.ncrna_class != 'miRNA' OR page.feature_name = 'precursor_RNA')
+      AND related.dbid = 9
+      AND related.deleted = 'N'
+      AND rnc_accessions.accession != page.ac
+      AND (rnc_accessions.ncrna_class != 'miRNA' OR rnc_accessions.feature_name = 'precursor_RNA')
+      AND (%(taxid)s::int IS NULL OR related.taxid = %(taxid)s)
+"""
+
+
+def may_have_related_sequences(xref):
+    """Only miRBase and RefSeq xrefs have mature products, precursors or splice variants."""
+    if Xref.accession.is_cached(xref):
+        return xref.accession.database in RELATED_SEQUENCES_DATABASES
+    return xref.db_id in RELATED_SEQUENCES_DBIDS
 
 
 class RawSqlQueryset(models.QuerySet):
@@ -30,6 +142,19 @@ class RawSqlQueryset(models.QuerySet):
     add some extra fields, obtained by raw SQL queries.
     """
 
+    fetch_related_sequences = True
+
+    def _clone(self):
+        clone = super(RawSqlQueryset, self)._clone()
+        clone.fetch_related_sequences = self.fetch_related_sequences
+        return clone
+
+    def without_related_sequences(self):
+        """Do not fetch the RELATED_SEQUENCES_KINDS attributes, if they are not needed."""
+        clone = self._chain()
+        clone.fetch_related_sequences = False
+        return clone
+
     def _get_taxid(self):
         """
         This is a dirty-dirty hack that checks, if taxid filter is applied
@@ -59,6 +184,14 @@ class RawSqlQueryset(models.QuerySet):
                 taxid = child.rhs
         return taxid
 
+    def with_genomic_coordinates(self):
+        """
+        Annotate each xref with the genomic_coordinates dict of its accession
+        (chromosome, strand, start, end), computed by a grouped subquery
+        in the same query as the xrefs.
+        """
+        return self.annotate(genomic_coordinates=RawSQL(GENOMIC_COORDINATES_SQL, []))
+
     def _fetch_all(self):
         """
         This method performs the actual database lookup, when queryset is evaluated.
@@ -66,7 +199,7 @@ class RawSqlQueryset(models.QuerySet):
         """
         super(RawSqlQueryset, self)._fetch_all()
 
-        # check this flag to avoid infinite recursion loop with _fetch_all() called by get_mirbase_mature_products()
+        # check this flag to avoid infinite recursion loop with _fetch_all() called by get_related_sequences()
         if not hasattr(self, "fetch_all_already_called"):
 
             # set this flag to avoid infinite recursion loop
@@ -74,55 +207,42 @@ class RawSqlQueryset(models.QuerySet):
 
             # add database-specific fields only if this queryset contains model objects
             # (this is not the case for values() or values_list() methods)
-            if len(self) and type(self[0]) == Xref:
+            if self.fetch_related_sequences and len(self) and type(self[0]) == Xref:
+                related = self.get_related_sequences(self._get_taxid())
 
-                taxid = self._get_taxid()
+                # "annotate" xrefs queryset with additional attributes, retrieved by raw SQL queries
+                for xref in self:
+                    for kind, upis in related.get(xref.id, {}).items():
+                        if kind in PRECURSOR_KINDS:
+                            upis = upis[0]  # note, there's just 1 precursor
+                        setattr(xref, kind, upis)
 
-                # Raw SQL queries to fetch database-specific data with self-joins, impossible in Django ORM
-                mirbase_mature_products = self.get_mirbase_mature_products(taxid)
-                mirbase_precursors = self.get_mirbase_precursor(taxid)
-                refseq_mirna_mature_products = self.get_refseq_mirna_mature_products(
-                    taxid
-                )
-                refseq_mirna_precursors = self.get_refseq_mirna_precursor(taxid)
-                refseq_splice_variants = self.get_refseq_splice_variants(taxid)
+                # not in use:
                 # ensembl_splice_variants = self.get_ensembl_splice_variants(taxid)
                 # tmrna_mates = self.get_tmrna_mate(taxid)
 
-                # "annotate" xrefs queryset with additional attributes, retrieved by raw SQL queries
-                for xref in self:
-                    if xref.id in mirbase_mature_products:
-                        xref.mirbase_mature_products = [
-                            mature_product.upi.upi
-                            for mature_product in mirbase_mature_products[xref.id]
-                        ]
-                    if xref.id in mirbase_precursors:
-                        xref.mirbase_precursor = mirbase_precursors[xref.id][
-                            0
-                        ].upi.upi  # note, there's just 1 precursor
-                    if xref.id in refseq_mirna_mature_products:
-                        xref.refseq_mirna_mature_products = [
-                            mature_product.upi.upi
-                            for mature_product in refseq_mirna_mature_products[xref.id]
-                        ]
-                    if xref.id in refseq_mirna_precursors:
-                        xref.refseq_mirna_precursor = refseq_mirna_precursors[xref.id][
-                            0
-                        ].upi.upi  # note, there's just 1 precursor
-                    if xref.id in refseq_splice_variants:
-                        xref.refseq_splice_variants = [
-                            splice_variant.upi.upi
-                            for splice_variant in refseq_splice_variants[xref.id]
-                        ]
-                    # if xref.id in ensembl_splice_variants:
-                    #     xref.ensembl_splice_variants = [
-                    #         splice_variant.upi.upi
-                    #         for splice_variant in ensembl_splice_variants[xref.id]
-                    #     ]
-                    # if xref.id in tmrna_mates:
-                    #     xref.tmrna_mates = [
-                    #         tmrna_mate.upi.upi for tmrna_mate in tmrna_mates[xref.id]
-                    #     ]
+    def get_related_sequences(self, taxid=None):
+        """
+        Find the mature products, precursors and splice variants of the miRBase
+        and RefSeq xrefs of this queryset with a single query, skipped if
+        there are no such xrefs.
+
+        :return: {xref id: {kind: [upi, ...]}}, where kind is the name of
+        the xref attribute, e.g. "mirbase_mature_products"
+        """
+        ids = [xref.pk for xref in self if may_have_related_sequences(xref)]
+        if not ids:
+            return {}
+
+        related = {}
+        with connection.cursor() as cursor:
+            cursor.execute(
+                RELATED_SEQUENCES_SQL,
+                {"ids": ids, "taxid": int(taxid) if taxid else None},
+            )
+            for kind, xid, upi in cursor.fetchall():
+                related.setdefault(xid, {}).setdefault(kind, []).append(upi)
+        return related
 
     def _xrefs_raw_queryset_to_dict(self, raw_queryset):
         """
@@ -138,207 +258,6 @@ class RawSqlQueryset(models.QuerySet):
                 output_dict[xref.xid].append(xref)
         return output_dict
 
-    def get_mirbase_mature_products(self, taxid=None):
-        if hasattr(self, "accession"):
-            if self.accession.database != "mirbase".upper():
-                return None
-        taxid_filter = "AND xref.taxid = %s" % taxid if taxid else ""
-
-        # _fetch_all() has already been called by now
-        pks = ",".join(
-            ["'%s'" % xref.pk for xref in self]
-        )  # e.g. "'250381225', '250381243', '295244525'"
-
-        queryset = """
-            SELECT xref.*, rnc_accessions.external_id
-            FROM xref, rnc_accessions
-            WHERE xref.ac = rnc_accessions.accession
-              AND xref.id IN ({pks})
-              AND rnc_accessions.database = 'MIRBASE'
-              AND rnc_accessions.feature_name = 'precursor_RNA'
-              {taxid_filter}
-        """.format(
-            pks=pks, taxid_filter=taxid_filter
-        )
-
-        annotated_queryset = """
-            SELECT xref.*, x.id as xid
-            FROM xref
-            JOIN rnc_accessions
-            ON xref.ac = rnc_accessions.accession
-            JOIN (
-              {queryset}
-            ) x
-            ON rnc_accessions.external_id = x.external_id
-            WHERE rnc_accessions.database = 'MIRBASE'
-              AND rnc_accessions.feature_name = 'ncRNA'
-              {taxid_filter}
-        """.format(
-            queryset=queryset, taxid_filter=taxid_filter
-        )
-
-        raw_queryset = Xref.objects.raw(annotated_queryset)
-
-        return self._xrefs_raw_queryset_to_dict(raw_queryset)
-
-    def get_mirbase_precursor(self, taxid=None):
-        if hasattr(self, "accession"):
-            if self.accession.database != "mirbase".upper():
-                return None
-        taxid_filter = "AND xref.taxid = %s" % taxid if taxid else ""
-
-        # _fetch_all() has already been called by now
-        pks = ",".join(["'%s'" % xref.pk for xref in self])
-
-        queryset = """
-            SELECT xref.*, rnc_accessions.external_id
-            FROM xref, rnc_accessions
-            WHERE xref.ac = rnc_accessions.accession
-              AND xref.id IN ({pks})
-              AND rnc_accessions.database = 'MIRBASE'
-              AND rnc_accessions.feature_name = 'ncRNA'
-              {taxid_filter}
-        """.format(
-            pks=pks, taxid_filter=taxid_filter
-        )
-
-        annotated_queryset = """
-            SELECT xref.*, x.id as xid
-            FROM xref
-            JOIN rnc_accessions
-            ON xref.ac = rnc_accessions.accession
-            JOIN (
-              {queryset}
-            ) x
-            ON rnc_accessions.external_id = x.external_id
-            WHERE rnc_accessions.database = 'MIRBASE'
-              AND rnc_accessions.feature_name = 'precursor_RNA'
-              {taxid_filter}
-        """.format(
-            queryset=queryset, taxid_filter=taxid_filter
-        )
-
-        raw_queryset = Xref.objects.raw(annotated_queryset)
-
-        return self._xrefs_raw_queryset_to_dict(raw_queryset)
-
-    def get_refseq_mirna_mature_products(self, taxid=None):
-        taxid_filter = "AND xref.taxid = %s" % taxid if taxid else ""
-
-        # _fetch_all() has already been called by now
-        pks = ",".join(["'%s'" % xref.pk for xref in self])
-
-        queryset = """
-            SELECT xref.*, rnc_accessions.parent_ac
-            FROM xref, rnc_accessions
-            WHERE xref.ac = rnc_accessions.accession
-              AND xref.id IN ({pks})
-              AND rnc_accessions.database = 'REFSEQ'
-              AND rnc_accessions.feature_name = 'precursor_RNA'
-              {taxid_filter}
-        """.format(
-            pks=pks, taxid_filter=taxid_filter
-        )
-
-        annotated_queryset = """
-            SELECT xref.*, x.id as xid
-            FROM xref
-            JOIN rnc_accessions
-            ON xref.ac = rnc_accessions.accession
-            JOIN (
-              {queryset}
-            ) x
-            ON rnc_accessions.parent_ac = x.parent_ac
-            WHERE rnc_accessions.database = 'REFSEQ'
-              AND rnc_accessions.feature_name = 'ncRNA'
-              {taxid_filter}
-        """.format(
-            queryset=queryset, taxid_filter=taxid_filter
-        )
-
-        raw_queryset = Xref.objects.raw(annotated_queryset)
-
-        return self._xrefs_raw_queryset_to_dict(raw_queryset)
-
-    def get_refseq_mirna_precursor(self, taxid=None):
-        taxid_filter = "AND xref.taxid = %s" % taxid if taxid else ""
-
-        # _fetch_all() has already been called by now
-        pks = ",".join(["'%s'" % xref.pk for xref in self])
-
-        queryset = """
-            SELECT xref.*, rnc_accessions.parent_ac
-            FROM xref, rnc_accessions
-            WHERE xref.ac = rnc_accessions.accession
-              AND xref.id IN ({pks})
-              AND xref.dbid = 9
-              AND rnc_accessions.feature_name = 'ncRNA'
-              {taxid_filter}
-        """.format(
-            pks=pks, taxid_filter=taxid_filter
-        )
-
-        annotated_queryset = """
-            SELECT xref.*, x.id as xid
-            FROM xref
-            JOIN rnc_accessions
-            ON xref.ac = rnc_accessions.accession
-            JOIN (
-              {queryset}
-            ) x
-            ON rnc_accessions.parent_ac = x.parent_ac
-            WHERE xref.dbid = 9
-              AND rnc_accessions.feature_name = 'precursor_RNA'
-              {taxid_filter}
-        """.format(
-            queryset=queryset, taxid_filter=taxid_filter
-        )
-
-        raw_queryset = Xref.objects.raw(annotated_queryset)
-
-        return self._xrefs_raw_queryset_to_dict(raw_queryset)
-
-    def get_refseq_splice_variants(self, taxid=None):
-        taxid_filter = "AND xref.taxid = %s" % taxid if taxid else ""
-
-        # _fetch_all() has already been called by now
-        pks = ",".join(["'%s'" % xref.pk for xref in self])
-
-        queryset = """
-            SELECT xref.*, rnc_accessions.ncrna_class, rnc_accessions.optional_id
-            FROM xref, rnc_accessions
-            WHERE xref.ac = rnc_accessions.accession
-              AND xref.id IN ({pks})
-              AND xref.dbid = 9
-              AND rnc_accessions.optional_id != ''
-              AND (rnc_accessions.ncrna_class != 'miRNA' OR rnc_accessions.feature_name = 'precursor_RNA')
-              {taxid_filter}
-        """.format(
-            pks=pks, taxid_filter=taxid_filter
-        )
-
-        annotated_queryset = """
-            SELECT xref.*, x.id as xid
-            FROM xref
-            JOIN rnc_accessions
-            ON xref.ac = rnc_accessions.accession
-            JOIN (
-              {queryset}
-            ) x
-            ON rnc_accessions.optional_id = x.optional_id
-            WHERE xref.dbid = 9
-              AND xref.deleted = 'N'
-              AND rnc_accessions.accession != x.ac
-              AND (rnc_accessions.ncrna_class != 'miRNA' OR rnc_accessions.feature_name = 'precursor_RNA')
-              {taxid_filter}
-        """.format(
-            queryset=queryset, taxid_filter=taxid_filter
-        )
-
-        raw_queryset = Xref.objects.raw(annotated_queryset)
-
-        return self._xrefs_raw_queryset_to_dict(raw_queryset)
-
     def get_ensembl_splice_variants(self, taxid=None):
         taxid_filter = "AND xref.taxid = %s" % taxid if taxid else ""
 
@@ -718,16 +637,12 @@ class Xref(CachingMixin, models.Model):
 
     def get_ensembl_division(self):
         """Get Ensembl or Ensembl Genomes division for the cross-reference."""
-        try:
-            assembly = EnsemblAssembly.objects.get(taxid=self.taxid)
-            return {"name": assembly.division, "url": "http://" + assembly.subdomain}
-        except EnsemblAssembly.DoesNotExist:
+        assembly = get_assembly_by_taxid(self.taxid)
+        if assembly is None:
             return None
+        return {"name": assembly.division, "url": "http://" + assembly.subdomain}
 
     def get_ucsc_db_id(self):
         """Get UCSC id for the genome assembly. http://genome.ucsc.edu/FAQ/FAQreleases.html"""
-        try:
-            genome = EnsemblAssembly.objects.get(taxid=self.taxid)
-            return genome.assembly_ucsc
-        except EnsemblAssembly.DoesNotExist:
-            return None
+        assembly = get_assembly_by_taxid(self.taxid)
+        return assembly.assembly_ucsc if assembly else None
@@ -14,31 +14,31 @@ limitations under the License.
 from django import template
 from django.conf import settings
 from django.template.defaultfilters import stringfilter
-from portal.config.expert_databases import expert_dbs
+from portal.utils.expert_databases import IMPORTED
+from portal.utils.sequence_urls import get_sequence_path
 
 register = template.Library()
 
+EXPERT_DATABASES_COLUMNS = (
+    IMPORTED[:15],
+    IMPORTED[15:30],
+    IMPORTED[30:45],
+    IMPORTED[45:],
+)
+
 
 @register.simple_tag
 def get_expert_databases_columns():
     """
     Return expert databases grouped and order for the website footer.
     """
-    imported_dbs = [x for x in expert_dbs if x["imported"] and x["name"] != "CRS"]
-    imported_dbs = sorted(imported_dbs, key=lambda x: x["name"].lower())
-    return [
-        imported_dbs[:15],
-        imported_dbs[15:30],
-        imported_dbs[30:45],
-        imported_dbs[45:],
-    ]
+    return EXPERT_DATABASES_COLUMNS
 
 
 @register.simple_tag
 def get_expert_databases_list():
     """Get an alphabetically sorted list of imported expert databases."""
-    imported_dbs = [x for x in expert_dbs if x["imported"] and x["name"] != "CRS"]
-    return sorted(imported_dbs, key=lambda x: x["name"].lower())
+    return IMPORTED
 
 
 @register.simple_tag
@@ -50,6 +50,15 @@ def get_ebi_search_endpoint():
     return settings.EBI_SEARCH_ENDPOINT
 
 
+@register.simple_tag
+def sequence_url(upi, taxid=None):
+    """
+    Link to a sequence page, faster than the url tag.
+    Usage: {% sequence_url upi taxid %} or {% sequence_url urs_taxid %}
+    """
+    return get_sequence_path(upi, taxid)
+
+
 @register.filter
 @stringfilter
 def template_exists(value):
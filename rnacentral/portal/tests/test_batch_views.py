@@ -0,0 +1,125 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import io
+import json
+from unittest import mock
+
+from apiv1.views import Md5StreamView, RnaBatchView, RnaExport
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+
+
+def make_row(urs_taxid, seq_short, seq_long=None):
+    taxid = int(urs_taxid.split("_")[1])
+    return (
+        urs_taxid,
+        taxid,
+        "description",
+        "short description",
+        "rRNA",
+        True,
+        "ENA",
+        len(seq_short or seq_long or ""),
+        seq_short,
+        seq_long,
+        "Homo sapiens",
+    )
+
+
+class RnaBatchViewTest(SimpleTestCase):
+    def post(self, ids, rows):
+        request = APIRequestFactory().post("/api/v1/rna/batch", ids, format="json")
+        with mock.patch("apiv1.views.connection") as connection:
+            cursor = connection.cursor.return_value.__enter__.return_value
+            cursor.fetchall.return_value = rows
+            response = RnaBatchView.as_view()(request)
+        return response.data
+
+    def test_entries_are_returned_in_order(self):
+        data = self.post(
+            ["URS0000000002_9606", "URS0000000001_9606", "URS0000000003_9606"],
+            [
+                make_row("URS0000000001_9606", "ACGT"),
+                make_row("URS0000000002_9606", "GG"),
+            ],
+        )
+        self.assertEqual(data["count"], 3)
+        first, second, missing = data["results"]
+        self.assertEqual(first["sequence"], "GG")
+        self.assertEqual(second["sequence"], "ACGU")
+        self.assertEqual(
+            missing, {"rnacentral_id": "URS0000000003_9606", "found": False}
+        )
+
+    def test_entry_without_sequence(self):
+        data = self.post(
+            ["URS0000000001_9606", "URS0000000002_9606"],
+            [
+                make_row("URS0000000001_9606", None),
+                make_row("URS0000000002_9606", None, "TTT"),
+            ],
+        )
+        without_sequence, long_sequence = data["results"]
+        self.assertTrue(without_sequence["found"])
+        self.assertEqual(without_sequence["sequence"], "")
+        self.assertEqual(long_sequence["sequence"], "UUU")
+
+
+class RnaExportTest(SimpleTestCase):
+    @mock.patch("apiv1.views.QuerySet.iterator")
+    @mock.patch("apiv1.views.transaction.atomic")
+    def test_rows_are_read_in_a_transaction(self, atomic, iterator):
+        def rows(queryset, chunk_size):
+            # a cursor declared outside a transaction is materialised at once
+            atomic.return_value.__enter__.assert_called_once_with()
+            yield ("URS0000000001", "md5", 4, "description", "ACGT", None)
+            yield ("URS0000000002", "md5", 0, "no sequence", None, None)
+            yield ("URS0000000003", "md5", 3, "description", None, "GGT")
+
+        iterator.side_effect = rows
+        queryset = mock.Mock(db="default")
+        upis = [row[0] for row in RnaExport().iter_rows(queryset)]
+        self.assertEqual(upis, ["URS0000000001", "URS0000000003"])
+        atomic.assert_called_once_with(using="default")
+        atomic.return_value.__exit__.assert_called_once()
+
+
+@mock.patch("apiv1.views.resolve_md5s", return_value={})
+class Md5StreamViewTest(SimpleTestCase):
+    md5s = ["0" * 32, "1" * 32]
+
+    def post(self, **extra):
+        body = "".join(md5 + "\n" for md5 in self.md5s).encode()
+        request = APIRequestFactory().generic(
+            "POST", "/api/v1/md5/stream", body, content_type="text/plain", **extra
+        )
+        return Md5StreamView.as_view()(request)
+
+    def read(self, response):
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        return [json.loads(line)["md5"] for line in lines]
+
+    def test_stream(self, resolve_md5s):
+        self.assertEqual(self.read(self.post()), self.md5s)
+
+    def test_chunked_upload(self, resolve_md5s):
+        body = io.BytesIO("".join(md5 + "\n" for md5 in self.md5s).encode())
+        response = self.post(
+            CONTENT_LENGTH="", **{"wsgi.input": body, "wsgi.input_terminated": True}
+        )
+        self.assertEqual(self.read(response), self.md5s)
+
+    def test_length_required(self, resolve_md5s):
+        response = self.post(CONTENT_LENGTH="")
+        self.assertEqual(response.status_code, 411)
@@ -0,0 +1,78 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import random
+import sqlite3
+
+from django.test import SimpleTestCase
+from portal.utils.bins import (
+    bin_sql,
+    get_bin,
+    get_overlapping_bins,
+    overlapping_bins_sql,
+)
+
+
+class BinsTest(SimpleTestCase):
+    def test_small_feature_uses_smallest_bin(self):
+        self.assertEqual(get_bin(1, 100), 4681)
+        self.assertEqual(get_bin(2**17 + 1, 2**17 + 100), 4682)
+
+    def test_feature_crossing_bin_boundary_moves_up(self):
+        self.assertEqual(get_bin(2**17 - 10, 2**17 + 10), 585)
+
+    def test_large_chromosomes(self):
+        self.assertEqual(get_bin(800000000, 800000100), 4681 + (799999999 >> 17))
+
+    def test_overlapping_features_are_found(self):
+        random.seed(0)
+        for _ in range(1000):
+            start = random.randint(1, 3 * 10**8)
+            stop = start + random.randint(0, 10**6)
+            window_start = random.randint(max(start - 10**6, 1), stop)
+            window_stop = max(window_start + random.randint(0, 10**7), start)
+            feature_bin = get_bin(start, stop)
+            self.assertTrue(
+                any(
+                    first <= feature_bin <= last
+                    for first, last in get_overlapping_bins(window_start, window_stop)
+                )
+            )
+
+    def test_feature_crossing_largest_bin_boundary(self):
+        start, stop = 2**29 - 10, 2**29 + 10
+        self.assertEqual(get_bin(start, stop), 0)
+        self.assertIn((0, 0), get_overlapping_bins(2**29 + 1, 2**29 + 1))
+
+    def test_sql_matches_python(self):
+        intervals = [
+            (1, 100),
+            (2**17 - 10, 2**17 + 10),
+            (2**29 - 10, 2**29 + 10),
+            (800000000, 800000100),
+            (2**32 - 10, 2**32 + 10),
+        ]
+        connection = sqlite3.connect(":memory:")
+        for start, stop in intervals:
+            (value,) = connection.execute(
+                "SELECT %s FROM (SELECT ? AS region_start, ? AS region_stop)"
+                % bin_sql("region_start", "region_stop"),
+                [start, stop],
+            ).fetchone()
+            expected = get_bin(start, stop) if stop < 2**32 else 0
+            self.assertEqual(value, expected)
+
+    def test_rows_without_bin_are_included(self):
+        where, params = overlapping_bins_sql("regions", 1, 100)
+        self.assertIn("regions.bin IS NULL OR", where)
+        self.assertEqual(len(params), 12)
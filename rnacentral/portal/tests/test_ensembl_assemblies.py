@@ -0,0 +1,75 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from unittest import mock
+
+from django.test import SimpleTestCase
+from portal.models.ensembl_assembly import EnsemblAssembly
+from portal.utils import ensembl_assemblies
+
+ASSEMBLIES = [
+    EnsemblAssembly(
+        assembly_id="GRCh38",
+        assembly_full_name="GRCh38.p13",
+        taxid=9606,
+        ensembl_url="homo_sapiens",
+    ),
+    EnsemblAssembly(
+        assembly_id="GRCm39",
+        assembly_full_name="GRCm39",
+        taxid=10090,
+        ensembl_url="mus_musculus",
+    ),
+]
+
+
+class AssemblyRegistryTest(SimpleTestCase):
+    def setUp(self):
+        self.registry = ensembl_assemblies.AssemblyRegistry()
+        self.fetch = mock.patch.object(
+            self.registry, "fetch", return_value=ASSEMBLIES
+        ).start()
+        self.release = mock.patch.object(
+            ensembl_assemblies, "get_release_version", return_value=1
+        ).start()
+        mock.patch.object(ensembl_assemblies, "registry", self.registry).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_lookups(self):
+        self.assertEqual(ensembl_assemblies.get_assemblies(), tuple(ASSEMBLIES))
+        self.assertIs(ensembl_assemblies.get_assembly("GRCm39"), ASSEMBLIES[1])
+        self.assertIs(
+            ensembl_assemblies.get_assembly_by_ensembl_url("homo_sapiens"),
+            ASSEMBLIES[0],
+        )
+        self.assertIs(ensembl_assemblies.get_assembly_by_taxid("9606"), ASSEMBLIES[0])
+        self.assertIsNone(ensembl_assemblies.get_assembly_by_taxid(None))
+        self.assertIsNone(ensembl_assemblies.get_assembly_by_ensembl_url("foo_bar"))
+        self.fetch.assert_called_once_with()
+
+    def test_reload_on_new_release(self):
+        ensembl_assemblies.get_assemblies()
+        self.release.return_value = 2
+        ensembl_assemblies.get_assemblies()
+        self.assertEqual(self.fetch.call_count, 1)  # release is checked once a minute
+
+        self.registry.checked -= ensembl_assemblies.RELEASE_CHECK_INTERVAL
+        ensembl_assemblies.get_assemblies()
+        self.assertEqual(self.fetch.call_count, 2)
+        self.assertEqual(self.registry.release, 2)
+
+    def test_same_release(self):
+        ensembl_assemblies.get_assemblies()
+        self.registry.checked -= ensembl_assemblies.RELEASE_CHECK_INTERVAL
+        ensembl_assemblies.get_assemblies()
+        self.assertEqual(self.fetch.call_count, 1)
@@ -0,0 +1,71 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+from portal.models.ensembl_compara import EnsemblCompara
+from portal.utils import ensembl_compara
+
+
+def make_entry(urs_taxid, homology_id, own_homology_id=None):
+    entry = EnsemblCompara(
+        id=hash(urs_taxid) % 1000,
+        ensembl_transcript_id="ENST" + urs_taxid,
+        urs_taxid_id=urs_taxid,
+        homology_id=homology_id,
+    )
+    entry.own_homology_id = own_homology_id or homology_id
+    return entry
+
+
+GROUP = [
+    make_entry("URS0000000001_9606", 1),
+    make_entry("URS0000000002_10090", 1),
+    make_entry("URS0000000003_10116", 1, own_homology_id=2),
+]
+
+
+class HomologyGroupTest(SimpleTestCase):
+    def setUp(self):
+        cache = LocMemCache("ensembl-compara-test", {})
+        cache.clear()
+        mock.patch.object(ensembl_compara, "cache", cache).start()
+        mock.patch.object(
+            ensembl_compara, "get_release_version", return_value=20
+        ).start()
+        self.fetch = mock.patch.object(
+            ensembl_compara, "fetch_homology_group", return_value=GROUP
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_group_is_shared_by_members(self):
+        group = ensembl_compara.get_homology_group("URS0000000001_9606")
+        self.assertEqual(
+            [entry.urs_taxid_id for entry in group],
+            [entry.urs_taxid_id for entry in GROUP],
+        )
+        ensembl_compara.get_homology_group("URS0000000002_10090")
+        self.fetch.assert_called_once_with("URS0000000001_9606")
+
+    def test_member_of_several_groups(self):
+        ensembl_compara.get_homology_group("URS0000000001_9606")
+        ensembl_compara.get_homology_group("URS0000000003_10116")
+        self.assertEqual(self.fetch.call_count, 2)
+
+    def test_no_group(self):
+        self.fetch.return_value = []
+        self.assertEqual(ensembl_compara.get_homology_group("URS0000000004_9606"), [])
+        self.assertEqual(ensembl_compara.get_homology_group("URS0000000004_9606"), [])
+        self.fetch.assert_called_once_with("URS0000000004_9606")
@@ -0,0 +1,52 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.test import SimpleTestCase
+from portal.config.expert_databases import expert_dbs
+from portal.utils import expert_databases
+
+
+class ExpertDatabasesTest(SimpleTestCase):
+    def test_lookups(self):
+        mirbase = expert_databases.get_expert_db("MIRBASE")
+        self.assertEqual(mirbase["name"], "miRBase")
+        self.assertIs(expert_databases.get_expert_db_by_label("mirbase"), mirbase)
+        self.assertIs(expert_databases.get_expert_db_by_descr("MIRBASE"), mirbase)
+        self.assertIsNone(expert_databases.get_expert_db("foo"))
+
+    def test_tmrna_website_descr(self):
+        expert_db = expert_databases.get_expert_db_by_descr("TMRNA_WEB")
+        self.assertEqual(expert_db["label"], "tmrna-website")
+
+    def test_pubmed_ids(self):
+        for pubmed_id in expert_databases.PUBMED_IDS:
+            for expert_db in expert_databases.get_expert_dbs_by_pubmed_id(pubmed_id):
+                self.assertIn(
+                    pubmed_id, [ref["pubmed_id"] for ref in expert_db["references"]]
+                )
+        self.assertEqual(expert_databases.get_expert_dbs_by_pubmed_id(""), ())
+
+    def test_read_only(self):
+        mirbase = expert_databases.get_expert_db("miRBase")
+        with self.assertRaises(TypeError):
+            mirbase["name"] = "foo"
+        with self.assertRaises(AttributeError):
+            mirbase["references"].append({})
+
+    def test_sorted_views(self):
+        self.assertEqual(len(expert_databases.SORTED_BY_IMPORTED), len(expert_dbs))
+        imported = [db["imported"] for db in expert_databases.SORTED_BY_IMPORTED]
+        self.assertEqual(imported, sorted(imported, reverse=True))
+        names = [db["name"].lower() for db in expert_databases.IMPORTED]
+        self.assertEqual(names, sorted(names))
+        self.assertNotIn("crs", names)
@@ -0,0 +1,194 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from unittest import mock
+
+from apiv1.serializers import InteractionsSerializer
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from portal.models import Interactions
+from portal.utils import external_ids
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "external_ids": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "external_ids",
+    },
+}
+
+ENSEMBL = {
+    "ENST00000000001": {
+        "species": "homo_sapiens",
+        "display_name": "GENE1-201",
+        "parent": "ENSG00000000001",
+    },
+    "ENSG00000000001": {
+        "species": "homo_sapiens",
+        "display_name": "GENE1",
+        "parent": "",
+    },
+}
+
+
+def fake_ensembl(ids):
+    return {
+        i: ENSEMBL.get(i, {"species": "", "display_name": "", "parent": ""})
+        for i in ids
+    }
+
+
+def fake_uniprot(ids):
+    return {i: "GENE2" for i in ids}
+
+
+def fake_hgnc(symbols):
+    return {symbol: "HGNC:%i" % len(symbol) for symbol in symbols}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class InteractionsResolverTest(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        caches["external_ids"].clear()
+        self.fetchers = {
+            external_ids.ENSEMBL: mock.Mock(side_effect=fake_ensembl),
+            external_ids.UNIPROT: mock.Mock(side_effect=fake_uniprot),
+            external_ids.HGNC: mock.Mock(side_effect=fake_hgnc),
+        }
+        patcher = mock.patch.dict(external_ids.FETCHERS, self.fetchers)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(
+            external_ids, "fetch_lookup_table_kinds", return_value=[]
+        )
+        self.fetch_lookup_table_kinds = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.interactions = [
+            Interactions(interacting_id="intact:EBI-1", names=["ENST00000000001.2"]),
+            Interactions(interacting_id="uniprotkb:P12345", names=[]),
+            Interactions(interacting_id="uniprotkb:Q12345", names=[]),
+        ]
+
+    def test_resolve(self):
+        resolver = external_ids.InteractionsResolver(self.interactions)
+        transcript, protein, _ = self.interactions
+        self.assertEqual(
+            resolver.get_ensembl_species("ENST00000000001.2"), "homo_sapiens"
+        )
+        self.assertEqual(resolver.get_gene_name(transcript), "GENE1")
+        self.assertEqual(resolver.get_gene_name(protein), "GENE2")
+        self.assertEqual(resolver.get_hgnc_id("GENE1"), "HGNC:5")
+
+    def test_ids_are_fetched_in_batches(self):
+        external_ids.InteractionsResolver(self.interactions)
+        # the transcript, then its parent gene
+        self.assertEqual(self.fetchers[external_ids.ENSEMBL].call_count, 2)
+        self.fetchers[external_ids.UNIPROT].assert_called_once_with(
+            ["P12345", "Q12345"]
+        )
+        self.fetchers[external_ids.HGNC].assert_called_once_with(["GENE1", "GENE2"])
+
+    def test_cached_ids_are_not_fetched_again(self):
+        external_ids.InteractionsResolver(self.interactions)
+        caches["default"].clear()  # still in the persistent cache
+        for fetcher in self.fetchers.values():
+            fetcher.reset_mock()
+        external_ids.InteractionsResolver(self.interactions)
+        for fetcher in self.fetchers.values():
+            fetcher.assert_not_called()
+
+    def test_failed_requests_are_not_cached(self):
+        self.fetchers[external_ids.UNIPROT].side_effect = external_ids.requests.Timeout
+        resolver = external_ids.InteractionsResolver(self.interactions)
+        self.assertEqual(resolver.get_gene_name(self.interactions[1]), "")
+        self.fetchers[external_ids.UNIPROT].side_effect = fake_uniprot
+        resolver = external_ids.InteractionsResolver(self.interactions)
+        self.assertEqual(resolver.get_gene_name(self.interactions[1]), "GENE2")
+
+    def test_lookup_table_is_used_without_network_requests(self):
+        self.fetch_lookup_table_kinds.return_value = list(external_ids.FETCHERS)
+        offline = {
+            external_ids.ENSEMBL: fake_ensembl,
+            external_ids.UNIPROT: fake_uniprot,
+            external_ids.HGNC: fake_hgnc,
+        }
+        with mock.patch.object(
+            external_ids,
+            "get_from_lookup_table",
+            side_effect=lambda kind, identifiers: offline[kind](identifiers),
+        ):
+            resolver = external_ids.InteractionsResolver(self.interactions)
+        self.assertEqual(resolver.get_gene_name(self.interactions[0]), "GENE1")
+        for fetcher in self.fetchers.values():
+            fetcher.assert_not_called()
+
+    def test_kinds_missing_from_lookup_table_are_fetched(self):
+        self.fetch_lookup_table_kinds.return_value = [external_ids.HGNC]
+        with mock.patch.object(
+            external_ids,
+            "get_from_lookup_table",
+            side_effect=lambda kind, identifiers: fake_hgnc(identifiers),
+        ) as get_from_lookup_table:
+            resolver = external_ids.InteractionsResolver(self.interactions)
+        self.assertEqual(resolver.get_gene_name(self.interactions[0]), "GENE1")
+        self.assertEqual(resolver.get_hgnc_id("GENE1"), "HGNC:5")
+        get_from_lookup_table.assert_called_once_with(
+            external_ids.HGNC, ["GENE1", "GENE2"]
+        )
+        self.fetchers[external_ids.HGNC].assert_not_called()
+        self.fetchers[external_ids.UNIPROT].assert_called_once_with(
+            ["P12345", "Q12345"]
+        )
+
+    def test_lookup_table_check_is_cached(self):
+        external_ids.InteractionsResolver(self.interactions)
+        external_ids.InteractionsResolver(self.interactions)
+        self.fetch_lookup_table_kinds.assert_called_once_with()
+
+
+class FetchUniprotTest(SimpleTestCase):
+    @mock.patch.object(external_ids, "get_session")
+    def test_secondary_accessions(self, get_session):
+        response = get_session.return_value.get.return_value
+        response.json.return_value = {
+            "results": [
+                {
+                    "primaryAccession": "P12345",
+                    "secondaryAccessions": ["Q99999"],
+                    "genes": [{"geneName": {"value": "GENE2"}}],
+                },
+                {"primaryAccession": "O00001", "genes": []},
+            ]
+        }
+        self.assertEqual(
+            external_ids.fetch_uniprot(["Q99999", "O00001", "O00002"]),
+            {"Q99999": "GENE2", "O00001": "", "O00002": ""},
+        )
+
+
+class InteractionsSerializerTest(SimpleTestCase):
+    @mock.patch("apiv1.serializers.InteractionsResolver")
+    def test_context_is_not_modified(self, resolver):
+        resolver.return_value.get_gene_name.return_value = "GENE2"
+        resolver.return_value.get_hgnc_id.return_value = ""
+        context = {}
+        interactions = [
+            Interactions(interacting_id="uniprotkb:P12345", names=[]),
+            Interactions(interacting_id="uniprotkb:Q12345", names=[]),
+        ]
+        data = InteractionsSerializer(interactions, many=True, context=context).data
+        self.assertEqual(len(data), 2)
+        resolver.assert_called_once_with(interactions)
+        self.assertEqual(context, {})
@@ -0,0 +1,114 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import base64
+import json
+import operator
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+from django.db.models import Q
+from django.test import RequestFactory, SimpleTestCase
+from portal.models import Xref
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from rnacentral.utils.pagination import LargeTablePagination
+
+LOOKUPS = {"lt": operator.lt, "gt": operator.gt, "exact": operator.eq}
+
+
+def matches(entry, q):
+    """Evaluate a Q object built from field__lookup conditions in Python."""
+    results = []
+    for child in q.children:
+        if isinstance(child, Q):
+            results.append(matches(entry, child))
+        else:
+            name, _, lookup = child[0].partition("__")
+            results.append(LOOKUPS[lookup or "exact"](getattr(entry, name), child[1]))
+    if not results:
+        return True
+    combine = any if q.connector == Q.OR else all
+    return combine(results) != q.negated
+
+
+class FakeQuerySet(object):
+    """List of entries with the queryset methods used by keyset pagination."""
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def filter(self, q):
+        return FakeQuerySet([entry for entry in self.entries if matches(entry, q)])
+
+    def order_by(self, *ordering):
+        (field,) = ordering
+        return FakeQuerySet(
+            sorted(
+                self.entries,
+                key=operator.attrgetter(field.lstrip("-")),
+                reverse=field.startswith("-"),
+            )
+        )
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+
+def get_request(url):
+    return Request(RequestFactory().get(url))
+
+
+def encode(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode("ascii")).decode()
+
+
+class KeysetPaginationTest(SimpleTestCase):
+    view = SimpleNamespace(keyset_ordering=("-upi",))
+    queryset = FakeQuerySet([SimpleNamespace(upi="URS%010i" % i) for i in range(1, 6)])
+
+    def paginate(self, url):
+        paginator = LargeTablePagination()
+        page = paginator.paginate_queryset(self.queryset, get_request(url), self.view)
+        data = [entry.upi for entry in page]
+        return paginator.get_paginated_response(data).data
+
+    def test_follow_cursor_links(self):
+        first = self.paginate("/api/v1/rna?cursor=&page_size=2")
+        self.assertEqual(first["results"], ["URS0000000005", "URS0000000004"])
+        self.assertIsNone(first["previous"])
+
+        url = urlparse(first["next"])
+        self.assertEqual(parse_qs(url.query)["page_size"], ["2"])
+        second = self.paginate("%s?%s" % (url.path, url.query))
+        self.assertEqual(second["results"], ["URS0000000003", "URS0000000002"])
+
+        url = urlparse(second["next"])
+        last = self.paginate("%s?%s" % (url.path, url.query))
+        self.assertEqual(last["results"], ["URS0000000001"])
+        self.assertIsNone(last["next"])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(NotFound):
+            self.paginate("/api/v1/rna?cursor=invalid")
+        with self.assertRaises(NotFound):
+            self.paginate("/api/v1/rna?cursor=%s" % encode(["a", "b"]))
+
+    def test_cursor_of_the_wrong_type(self):
+        paginator = LargeTablePagination()
+        view = SimpleNamespace(keyset_ordering=("-db_id", "-id"))
+        for position in [["a", 1], [1, [2]]]:
+            request = get_request("/api/v1/rna/x/xrefs?cursor=%s" % encode(position))
+            with self.assertRaises(NotFound):
+                paginator.paginate_queryset(Xref.objects.all(), request, view)
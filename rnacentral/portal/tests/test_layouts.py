@@ -0,0 +1,70 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from portal.utils.layouts import LayoutCache, get_s3_key
+
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "layouts",
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LayoutCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.cache = LayoutCache(self.root.name, max_size=130)
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def test_s3_key(self):
+        self.assertEqual(
+            get_s3_key("URS0000704D22"), "prod/URS/00/00/70/4D/URS0000704D22.svg.gz"
+        )
+
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get("URS0000704D22_1.svg.gz"))
+        self.cache.set("URS0000704D22_1.svg.gz", b"layout")
+        self.assertEqual(self.cache.get("URS0000704D22_1.svg.gz"), b"layout")
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for i in range(3):
+            self.cache.set("entry%i" % i, b"x" * 40)
+            path = os.path.join(self.root.name, "entry%i" % i)
+            os.utime(path, (i, i))
+        # entry0 is the oldest, but it has just been used
+        self.cache.get("entry0")
+        self.cache.set("entry3", b"x" * 40)
+        self.assertIsNotNone(self.cache.get("entry0"))
+        self.assertIsNone(self.cache.get("entry1"))
+        self.assertIsNotNone(self.cache.get("entry3"))
+        self.assertLessEqual(self.cache.size(), 130)
+
+    def test_directory_is_scanned_only_when_full(self):
+        self.cache.set("entry0", b"x" * 40)  # no size estimate yet
+        with mock.patch.object(self.cache, "entries", wraps=self.cache.entries) as m:
+            self.cache.set("entry1", b"x" * 40)
+            self.cache.set("entry2", b"x" * 40)
+            m.assert_not_called()
+            self.cache.set("entry3", b"x" * 40)
+            m.assert_called_once_with()
+        self.assertLessEqual(self.cache.size(), 130)
@@ -0,0 +1,82 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import gzip
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+from portal.management.commands.load_external_ids import (
+    parse_gtf,
+    parse_hgnc,
+    parse_uniprot,
+)
+
+GTF = (
+    "#!genome-build GRCh38.p14\n"
+    '1\tensembl\tgene\t1\t100\t.\t+\t.\tgene_id "ENSG00000000001"; '
+    'gene_version "1"; gene_name "GENE1"; gene_biotype "lncRNA";\n'
+    '1\tensembl\ttranscript\t1\t100\t.\t+\t.\tgene_id "ENSG00000000001"; '
+    'transcript_id "ENST00000000001"; transcript_name "GENE1-201";\n'
+    '1\tensembl\texon\t1\t100\t.\t+\t.\tgene_id "ENSG00000000001"; '
+    'transcript_id "ENST00000000001"; exon_number "1";\n'
+)
+
+
+class ParsersTest(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, filename, text):
+        path = os.path.join(self.tmpdir.name, filename)
+        opener = gzip.open if filename.endswith(".gz") else open
+        with opener(path, "wt") as f:
+            f.write(text)
+        return path
+
+    def test_parse_hgnc(self):
+        path = self.write(
+            "hgnc_complete_set.txt",
+            "hgnc_id\tsymbol\tname\nHGNC:5\tA1BG\talpha-1-B glycoprotein\n",
+        )
+        self.assertEqual(list(parse_hgnc(path)), [("A1BG", "HGNC:5")])
+
+    def test_parse_uniprot_keeps_first_gene_name(self):
+        path = self.write(
+            "HUMAN_9606_idmapping.dat.gz",
+            "P12345\tUniProtKB-ID\tAATM_RABIT\n"
+            "P12345\tGene_Name\tGOT2\n"
+            "P12345\tGene_Name\tGOT2B\n",
+        )
+        self.assertEqual(list(parse_uniprot(path)), [("P12345", "GOT2")])
+
+    def test_parse_gtf(self):
+        path = self.write("Homo_sapiens.GRCh38.110.gtf.gz", GTF)
+        self.assertEqual(
+            list(parse_gtf(path)),
+            [
+                (
+                    "ENSG00000000001",
+                    {"species": "homo_sapiens", "display_name": "GENE1", "parent": ""},
+                ),
+                (
+                    "ENST00000000001",
+                    {
+                        "species": "homo_sapiens",
+                        "display_name": "GENE1-201",
+                        "parent": "ENSG00000000001",
+                    },
+                ),
+            ],
+        )
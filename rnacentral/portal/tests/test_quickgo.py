@@ -0,0 +1,76 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import io
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from portal.utils import quickgo
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+def fake_fetch_hits(urs_taxid):
+    return {"URS0000000001_9606": 12, "URS0000000002_9606": quickgo.NO_HITS}.get(
+        urs_taxid
+    )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QuickGoHitsTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(quickgo, "get_release_version", return_value=20)
+        self.release = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(quickgo, "fetch_hits", side_effect=fake_fetch_hits)
+        self.fetch_hits = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.urs_taxids = [
+            "URS0000000001_9606",
+            "URS0000000002_9606",
+            "URS0000000003_9606",  # request fails
+            "URS0000000001_9606",
+        ]
+
+    def test_get_hits(self):
+        self.assertEqual(
+            quickgo.get_hits(self.urs_taxids),
+            {"URS0000000001_9606": 12, "URS0000000002_9606": None},
+        )
+        self.assertEqual(self.fetch_hits.call_count, 3)
+
+    def test_only_failed_requests_are_repeated(self):
+        quickgo.get_hits(self.urs_taxids)
+        self.fetch_hits.reset_mock()
+        quickgo.get_hits(self.urs_taxids)
+        self.fetch_hits.assert_called_once_with("URS0000000003_9606")
+
+    def test_cache_is_release_specific(self):
+        quickgo.get_hits(self.urs_taxids)
+        self.fetch_hits.reset_mock()
+        self.release.return_value = 21
+        quickgo.get_hits(self.urs_taxids)
+        self.assertEqual(self.fetch_hits.call_count, 3)
+
+    def test_loaded_hits_are_not_requested(self):
+        f = io.StringIO("URS0000000003_9606\t5\nURS0000000004_9606\t\n")
+        quickgo.set_hits(dict(quickgo.parse_hits_file(f)), timeout=None)
+        self.assertEqual(
+            quickgo.get_hits(["URS0000000003_9606", "URS0000000004_9606"]),
+            {"URS0000000003_9606": 5, "URS0000000004_9606": None},
+        )
+        self.fetch_hits.assert_not_called()
@@ -0,0 +1,101 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from unittest.mock import MagicMock, patch
+
+from django.core.paginator import Paginator
+from django.test import SimpleTestCase
+
+from rnacentral.utils.pagination import PaginatedRawQuerySet
+
+
+def make_queryset(params=None):
+    model = MagicMock()
+    model.objects.db = "default"
+    model.objects.raw.return_value = iter(["row"])
+    return PaginatedRawQuerySet("SELECT * FROM t ORDER BY id", model, params)
+
+
+class PaginatedRawQuerySetTest(SimpleTestCase):
+    def setUp(self):
+        self.release = patch(
+            "portal.models.release.get_release_version", return_value=1
+        ).start()
+        self.addCleanup(patch.stopall)
+
+    def test_slice_with_list_params(self):
+        queryset = make_queryset(["URS0000000001_9606"])
+        self.assertEqual(queryset[20:30], ["row"])
+        queryset.model.objects.raw.assert_called_once_with(
+            "SELECT * FROM t ORDER BY id LIMIT %s OFFSET %s",
+            ["URS0000000001_9606", 10, 20],
+            using="default",
+        )
+
+    def test_slice_with_dict_params(self):
+        queryset = make_queryset({"upi": "URS0000000001"})
+        queryset[5:]
+        queryset.model.objects.raw.assert_called_once_with(
+            "SELECT * FROM t ORDER BY id LIMIT %(_limit)s OFFSET %(_offset)s",
+            {"upi": "URS0000000001", "_limit": None, "_offset": 5},
+            using="default",
+        )
+
+    def test_index(self):
+        queryset = make_queryset()
+        self.assertEqual(queryset[3], "row")
+        with self.assertRaises(IndexError):
+            queryset[-1]
+
+    @patch("rnacentral.utils.pagination.connections")
+    @patch("rnacentral.utils.pagination.cache")
+    def test_cached_count(self, cache, connections):
+        cache.get.return_value = 42
+        queryset = make_queryset([])
+        self.assertEqual(queryset.count(), 42)
+        self.assertEqual(len(queryset), 42)
+        cache.get.assert_called_once_with(queryset.get_count_cache_key())
+        connections.__getitem__.assert_not_called()
+
+    @patch("rnacentral.utils.pagination.connections")
+    @patch("rnacentral.utils.pagination.cache")
+    def test_count(self, cache, connections):
+        cache.get.return_value = None
+        cursor = connections[
+            "default"
+        ].cursor.return_value.__enter__.return_value = MagicMock()
+        cursor.fetchone.return_value = (7,)
+        queryset = make_queryset(["URS0000000001_9606"])
+        self.assertEqual(queryset.count(), 7)
+        cursor.execute.assert_called_once_with(
+            "SELECT COUNT(*) FROM (SELECT * FROM t ORDER BY id) AS paginated",
+            ["URS0000000001_9606"],
+        )
+        cache.set.assert_called_once()
+
+    def test_paginator(self):
+        queryset = make_queryset([])
+        queryset._count = 25
+        page = Paginator(queryset, 10).page(3)
+        self.assertEqual(list(page), ["row"])
+        self.assertEqual(page.paginator.num_pages, 3)
+        queryset.model.objects.raw.assert_called_once_with(
+            "SELECT * FROM t ORDER BY id LIMIT %s OFFSET %s", [5, 20], using="default"
+        )
+
+    def test_count_cache_key_includes_release(self):
+        queryset = make_queryset(["URS0000000001_9606"])
+        key = queryset.get_count_cache_key()
+        self.assertTrue(key.startswith("raw-count:1:"))
+        self.release.return_value = 2
+        self.assertNotEqual(queryset.get_count_cache_key(), key)
@@ -0,0 +1,54 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase
+from django.urls import reverse
+from portal.utils.sequence_urls import get_base_url, get_sequence_path
+
+
+class SequenceUrlsTest(SimpleTestCase):
+    def test_generic_sequence(self):
+        self.assertEqual(
+            get_sequence_path("URS0000759B7E"),
+            reverse("generic-rna-sequence", kwargs={"upi": "URS0000759B7E"}),
+        )
+
+    def test_species_specific_sequence(self):
+        expected = reverse(
+            "unique-rna-sequence", kwargs={"upi": "URS0000759B7E", "taxid": 9606}
+        )
+        self.assertEqual(get_sequence_path("URS0000759B7E", 9606), expected)
+        self.assertEqual(get_sequence_path("URS0000759B7E_9606"), expected)
+
+    def test_base_url(self):
+        request = RequestFactory().get("/", secure=True, HTTP_HOST="rnacentral.org")
+        self.assertEqual(get_base_url(request), "https://rnacentral.org")
+
+    def test_template_tag(self):
+        template = Template(
+            "{% load portal_extras %}"
+            "{% sequence_url upi taxid %} {% sequence_url urs_taxid %}"
+        )
+        self.assertEqual(
+            template.render(
+                Context(
+                    {
+                        "upi": "URS0000759B7E",
+                        "taxid": "",
+                        "urs_taxid": "URS0000759B7E_9606",
+                    }
+                )
+            ),
+            "/rna/URS0000759B7E /rna/URS0000759B7E/9606",
+        )
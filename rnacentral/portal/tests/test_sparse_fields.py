@@ -0,0 +1,88 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from apiv1.serializers import RnaNestedSerializer, XrefSerializer
+from apiv1.views import normalize_fields_params
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from rest_framework.request import Request
+
+
+class FakeView(object):
+    serializer_class = RnaNestedSerializer
+
+    def get_serializer_class(self):
+        return self.serializer_class
+
+
+def get_context(url):
+    return {"request": Request(RequestFactory().get(url)), "view": FakeView()}
+
+
+class SparseFieldsTest(SimpleTestCase):
+    def test_all_fields_by_default(self):
+        serializer = RnaNestedSerializer(context=get_context("/"))
+        self.assertEqual(list(serializer.fields), list(RnaNestedSerializer.Meta.fields))
+
+    def test_fields(self):
+        serializer = RnaNestedSerializer(
+            context=get_context("/?fields=rnacentral_id,md5,sequence,unknown")
+        )
+        self.assertEqual(list(serializer.fields), ["rnacentral_id", "md5", "sequence"])
+
+    def test_exclude(self):
+        serializer = RnaNestedSerializer(context=get_context("/?exclude=xrefs,url"))
+        self.assertNotIn("xrefs", serializer.fields)
+        self.assertNotIn("url", serializer.fields)
+        self.assertIn("description", serializer.fields)
+
+    def test_nested_serializers_are_not_filtered(self):
+        serializer = XrefSerializer(context=get_context("/?fields=rnacentral_id"))
+        self.assertEqual(
+            list(serializer.fields),
+            [
+                name
+                for name in XrefSerializer.Meta.fields
+                if name not in XrefSerializer.Meta.optional_fields
+            ],
+        )
+
+    def test_optional_fields(self):
+        serializer = XrefSerializer(context=get_context("/"))
+        self.assertNotIn("genomic_coordinates", serializer.fields)
+        serializer = XrefSerializer(
+            context=get_context("/?fields=rnacentral_id,genomic_coordinates")
+        )
+        self.assertIn("genomic_coordinates", serializer.fields)
+
+    def test_list_serializer(self):
+        serializer = RnaNestedSerializer(
+            [], many=True, context=get_context("/?fields=md5")
+        )
+        self.assertEqual(list(serializer.child.fields), ["md5"])
+
+
+class NormalizeFieldsParamsTest(SimpleTestCase):
+    def test_field_order_does_not_change_the_url(self):
+        def view(request):
+            return HttpResponse(request.get_full_path())
+
+        view = normalize_fields_params(view)
+        factory = RequestFactory()
+        first = view(factory.get("/rna/?fields=md5,rnacentral_id&page=2"))
+        second = view(factory.get("/rna/?page=2&fields=rnacentral_id,md5,"))
+        self.assertEqual(
+            sorted(first.content.decode().split("?")[1].split("&")),
+            sorted(second.content.decode().split("?")[1].split("&")),
+        )
+        self.assertIn("fields=md5,rnacentral_id", first.content.decode())
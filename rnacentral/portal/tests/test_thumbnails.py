@@ -0,0 +1,126 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import gzip
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from portal.utils.thumbnails import ThumbnailStore, generate_thumbnail
+
+LAYOUT = """<svg width="100" height="50">
+<text x="10" y="20" class="green">A</text>
+<text x="15.5" y="25" class="green">C</text>
+<text x="12" y="30" class="numbering-label">10</text>
+</svg>"""
+
+LOCMEM_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "thumbnails",
+    }
+}
+
+
+class ThumbnailsTest(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def test_generate_thumbnail(self):
+        thumbnail = generate_thumbnail(LAYOUT, "URS0000704D22")
+        self.assertIn('width="100" height="50"', thumbnail)
+        self.assertIn('d="M10 20 L10 20 L15 25"', thumbnail)
+
+    def test_store(self):
+        store = ThumbnailStore(self.root.name, 1)
+        self.assertIsNone(store.get("URS0000704D22"))
+        store.put("URS0000704D22", "<svg/>")
+        self.assertIn("URS0000704D22", store)
+        self.assertEqual(gzip.decompress(store.get("URS0000704D22")), b"<svg/>")
+
+    def test_identical_thumbnails_are_stored_once(self):
+        ThumbnailStore(self.root.name, 1).put("URS0000704D22", "<svg/>")
+        ThumbnailStore(self.root.name, 2).put("URS0000704D22", "<svg/>")
+        objects = [
+            name
+            for _, _, names in os.walk(os.path.join(self.root.name, "objects"))
+            for name in names
+        ]
+        self.assertEqual(len(objects), 1)
+        self.assertIsNotNone(ThumbnailStore(self.root.name, 2).get("URS0000704D22"))
+
+    def test_concurrent_writers(self):
+        store = ThumbnailStore(self.root.name, 1)
+        # temporary file left by a crashed process
+        index_path = store.get_index_path("URS0000704D22")
+        os.makedirs(os.path.dirname(index_path))
+        os.symlink("missing", "%s.%i.tmp" % (index_path, os.getpid()))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [
+                executor.submit(store.put, "URS0000704D22", "<svg/>") for _ in range(8)
+            ]
+        for future in futures:
+            future.result()  # raises the exceptions of the threads
+        self.assertEqual(gzip.decompress(store.get("URS0000704D22")), b"<svg/>")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SecondaryStructureSVGImageTest(SimpleTestCase):
+    upi = "URS0000704D22"
+
+    def setUp(self):
+        cache.clear()  # responses are cached per view
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.store = ThumbnailStore(self.root.name, 1)
+        mock.patch("apiv1.views.get_thumbnail_store", return_value=self.store).start()
+        self.get_layout_svg = mock.patch(
+            "apiv1.views.get_layout_svg", return_value=LAYOUT.encode("utf-8")
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+        self.url = reverse("rna-2d-svg", kwargs={"pk": self.upi})
+
+    def test_stored_gzip_is_sent_unchanged(self):
+        stored = self.store.put(self.upi, "<svg/>")
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(response.content, stored)
+        self.get_layout_svg.assert_not_called()
+
+    def test_decompressed_without_accept_encoding(self):
+        self.store.put(self.upi, "<svg/>")
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response.content, b"<svg/>")
+
+    def test_missing_thumbnail_is_generated_and_stored(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b"<svg"))
+        self.assertIsNotNone(self.store.get(self.upi))
+
+    def test_no_layout(self):
+        self.get_layout_svg.return_value = None
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,117 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+UCSC-style hierarchical binning of genome coordinates.
+
+Every feature is assigned to the smallest bin that fully contains it.
+The smallest bins are 128 kb, every next level is 8 times larger, and the
+last level is a single bin covering 4 Gb. This is the "extended" UCSC scheme
+(http://genome.ucsc.edu/goldenPath/help/hgTracksHelp.html#BINRANGE), used
+for all features so that chromosomes longer than 512 Mb (e.g. wheat) work.
+
+A window overlaps a feature only if the feature bin is one of a handful of
+bin ranges (one per level), so overlap queries become bounded index lookups
+on (assembly_id, chromosome, bin).
+
+Coordinates in rnc_sequence_regions are 1-based and inclusive.
+"""
+
+from functools import lru_cache
+
+from django.db import connection
+
+BIN_FIRST_SHIFT = 17  # 128 kb
+BIN_NEXT_SHIFT = 3  # every level is 8 times larger than the previous one
+BIN_OFFSETS = [4096 + 512 + 64 + 8 + 1, 512 + 64 + 8 + 1, 64 + 8 + 1, 8 + 1, 1, 0]
+BIN_COLUMN = "bin"
+
+
+def _shifts():
+    """Bit shifts for all levels, from the smallest bins to the largest."""
+    return [BIN_FIRST_SHIFT + BIN_NEXT_SHIFT * i for i in range(len(BIN_OFFSETS))]
+
+
+def get_bin(start, stop):
+    """Get the bin of a feature with 1-based inclusive coordinates."""
+    start = max(start - 1, 0)
+    stop = max(stop - 1, start)
+    for offset, shift in zip(BIN_OFFSETS, _shifts()):
+        if start >> shift == stop >> shift:
+            return offset + (start >> shift)
+    raise ValueError("Coordinates out of range: %s-%s" % (start, stop))
+
+
+def get_overlapping_bins(start, stop):
+    """
+    Get the bins of all features that may overlap a window
+    with 1-based inclusive coordinates.
+
+    :return: list of (first bin, last bin) tuples, one per level
+    """
+    start = max(start - 1, 0)
+    stop = max(stop - 1, start)
+    return [
+        (offset + (start >> shift), offset + (stop >> shift))
+        for offset, shift in zip(BIN_OFFSETS, _shifts())
+    ]
+
+
+def bin_sql(start_column, stop_column):
+    """
+    SQL expression computing get_bin() for the given columns.
+    Coordinates are cast to bigint because shifting an integer
+    by 32 bits does not give 0 in Postgres.
+    """
+    start = "(CAST({column} AS bigint) - 1)".format(column=start_column)
+    stop = "(CAST({column} AS bigint) - 1)".format(column=stop_column)
+    cases = []
+    for offset, shift in zip(BIN_OFFSETS, _shifts()):
+        cases.append(
+            "WHEN ({start} >> {shift}) = ({stop} >> {shift}) "
+            "THEN {offset} + ({start} >> {shift})".format(
+                start=start, stop=stop, shift=shift, offset=offset
+            )
+        )
+    return "CASE %s ELSE 0 END" % " ".join(cases)
+
+
+def overlapping_bins_sql(table, start, stop):
+    """
+    SQL condition restricting `table` to the bins that may overlap a window,
+    to be used with QuerySet.extra(). Rows without a bin are always included,
+    so that features loaded before the bins were computed are not missed.
+
+    :return: tuple (where clause, params)
+    """
+    where = ["{table}.{column} IS NULL".format(table=table, column=BIN_COLUMN)]
+    params = []
+    for first, last in get_overlapping_bins(start, stop):
+        where.append(
+            "{table}.{column} BETWEEN %s AND %s".format(table=table, column=BIN_COLUMN)
+        )
+        params.extend([first, last])
+    return "(%s)" % " OR ".join(where), params
+
+
+@lru_cache(maxsize=None)
+def has_bin_column(table):
+    """
+    Check if the bin column has been created by the `create_region_bins`
+    management command. Checked once per process.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = %s AND column_name = %s",
+            [table, BIN_COLUMN],
+        )
+        return cursor.fetchone() is not None
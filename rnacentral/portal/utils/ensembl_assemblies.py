@@ -0,0 +1,107 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Process-wide registry of Ensembl assemblies.
+
+The ensembl_assembly table is small and only changes when new data are
+imported, so it is loaded once per worker and reloaded when the release
+version changes. The assemblies are shared between requests and must not
+be modified.
+"""
+
+import threading
+import time
+
+from portal.models.ensembl_assembly import EnsemblAssembly
+from portal.models.release import get_release_version
+from portal.models.taxonomy import Taxonomy
+
+RELEASE_CHECK_INTERVAL = 60  # seconds
+
+ASSEMBLIES_QUERY = """
+    SELECT {ensembl_assembly}.*, {taxonomy}.name AS taxonomy_name
+    FROM {ensembl_assembly}
+    LEFT JOIN {taxonomy}
+    ON {taxonomy}.id = {ensembl_assembly}.taxid
+    ORDER BY {taxonomy}.name, {ensembl_assembly}.assembly_id
+""".format(
+    ensembl_assembly=EnsemblAssembly._meta.db_table,
+    taxonomy=Taxonomy._meta.db_table,
+)
+
+
+class AssemblyRegistry(object):
+    """Ensembl assemblies indexed by assembly_id, ensembl_url and taxid."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.release = None
+        self.checked = None
+        self.assemblies = ()
+        self.by_assembly_id = {}
+        self.by_ensembl_url = {}
+        self.by_taxid = {}
+
+    def fetch(self):
+        """:return: assemblies ordered by species name"""
+        return list(EnsemblAssembly.objects.raw(ASSEMBLIES_QUERY))
+
+    def load(self, release):
+        assemblies = tuple(self.fetch())
+        by_ensembl_url = {}
+        # same as filter(ensembl_url=...).first() with the default ordering
+        for assembly in sorted(assemblies, key=lambda a: a.assembly_full_name):
+            if assembly.ensembl_url:
+                by_ensembl_url.setdefault(assembly.ensembl_url, assembly)
+
+        self.by_assembly_id = {a.assembly_id: a for a in assemblies}
+        self.by_ensembl_url = by_ensembl_url
+        self.by_taxid = {a.taxid: a for a in assemblies}
+        self.assemblies = assemblies
+        self.release = release
+
+    def refresh(self):
+        """Reload the assemblies if there was a new release."""
+        now = time.monotonic()
+        if self.checked is not None and now - self.checked < RELEASE_CHECK_INTERVAL:
+            return self
+        with self.lock:
+            release = get_release_version()
+            if self.checked is None or release != self.release:
+                self.load(release)
+            self.checked = now
+        return self
+
+
+registry = AssemblyRegistry()
+
+
+def get_assemblies():
+    return registry.refresh().assemblies
+
+
+def get_assembly(assembly_id):
+    return registry.refresh().by_assembly_id.get(assembly_id)
+
+
+def get_assembly_by_ensembl_url(ensembl_url):
+    return registry.refresh().by_ensembl_url.get(ensembl_url)
+
+
+def get_assembly_by_taxid(taxid):
+    try:
+        return registry.refresh().by_taxid.get(int(taxid))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,99 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Ensembl Compara homology groups.
+
+Every member of a homology group shows the same list of sequences, so groups
+are cached per release and homology_id, together with the homology_id of
+each member, and the first request for any member fills the cache for all.
+"""
+
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from portal.models.ensembl_compara import EnsemblCompara
+from portal.models.release import get_release_version
+
+CACHE_TIMEOUT = 60 * 60 * 24 * 7  # seconds, keys are versioned by release
+NO_GROUP = ""  # None cannot be told apart from a cache miss
+
+
+def make_group_key(homology_id, release):
+    return "ensembl-compara-group:%s:%s" % (release, homology_id)
+
+
+def make_member_key(urs_taxid, release):
+    return "ensembl-compara-homology:%s:%s" % (release, urs_taxid)
+
+
+def first_homology_id(urs_taxid):
+    return (
+        EnsemblCompara.objects.filter(urs_taxid=urs_taxid)
+        .order_by("ensembl_transcript_id")
+        .values("homology_id")[:1]
+    )
+
+
+def fetch_homology_group(urs_taxid):
+    """
+    Get the homology group of the first Ensembl transcript of urs_taxid,
+    including urs_taxid itself, with a single query.
+    """
+    queryset = (
+        EnsemblCompara.objects.filter(
+            homology_id=Subquery(first_homology_id(urs_taxid))
+        )
+        # a sequence can have transcripts in several groups,
+        # only the group of its first transcript is shown on its page
+        .annotate(own_homology_id=Subquery(first_homology_id(OuterRef("urs_taxid"))))
+        .select_related("urs_taxid")
+        .only(
+            "id",
+            "ensembl_transcript_id",
+            "homology_id",
+            "urs_taxid__id",
+            "urs_taxid__rna_type",
+            "urs_taxid__description",
+            "urs_taxid__databases",
+        )
+        .order_by("urs_taxid__description", "id")
+    )
+    return list(queryset)
+
+
+def get_homology_group(urs_taxid):
+    """
+    :return: EnsemblCompara entries of the homology group of urs_taxid
+    ordered by description, an empty list if it is not in Ensembl Compara
+    """
+    release = get_release_version()
+    homology_id = cache.get(make_member_key(urs_taxid, release))
+    if homology_id == NO_GROUP:
+        return []
+    if homology_id is not None:
+        group = cache.get(make_group_key(homology_id, release))
+        if group is not None:
+            return group
+
+    group = fetch_homology_group(urs_taxid)
+    if not group:
+        cache.set(make_member_key(urs_taxid, release), NO_GROUP, CACHE_TIMEOUT)
+        return []
+
+    homology_id = group[0].homology_id
+    keys = {
+        make_member_key(member.urs_taxid_id, release): homology_id
+        for member in group
+        if member.own_homology_id == homology_id
+    }
+    keys[make_group_key(homology_id, release)] = group
+    cache.set_many(keys, CACHE_TIMEOUT)
+    return group
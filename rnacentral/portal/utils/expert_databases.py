@@ -0,0 +1,93 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Read-only registry of the expert databases in portal.config.expert_databases.
+
+It is built once at import. Entries are read-only mappings with tuples
+instead of lists, so they are safe to share between requests, and views
+never sort or update the configuration in place.
+"""
+
+from types import MappingProxyType
+
+from portal.config.expert_databases import expert_dbs
+
+
+def freeze(value):
+    """Recursively replace dicts with read-only mappings and lists with tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def get_descr(expert_db):
+    """Database.descr of an expert database, e.g. tmrna-website -> TMRNA_WEB"""
+    if expert_db["label"].lower() == "tmrna-website":
+        return "TMRNA_WEB"
+    return expert_db["label"].upper()
+
+
+def name_key(expert_db):
+    return expert_db["name"].lower()
+
+
+def index_by_pubmed_id(entries):
+    index = {}
+    for expert_db in entries:
+        for reference in expert_db["references"]:
+            if reference["pubmed_id"]:
+                index.setdefault(reference["pubmed_id"], []).append(expert_db)
+    return MappingProxyType({key: tuple(value) for key, value in index.items()})
+
+
+EXPERT_DBS = tuple(freeze(expert_db) for expert_db in expert_dbs)
+
+BY_NAME = MappingProxyType({name_key(db): db for db in EXPERT_DBS})
+BY_LABEL = MappingProxyType({db["label"].lower(): db for db in EXPERT_DBS})
+BY_DESCR = MappingProxyType({get_descr(db): db for db in EXPERT_DBS})
+
+BY_PUBMED_ID = index_by_pubmed_id(EXPERT_DBS)
+PUBMED_IDS = tuple(sorted(BY_PUBMED_ID))
+
+# imported databases first, then alphabetically
+SORTED_BY_IMPORTED = tuple(
+    sorted(EXPERT_DBS, key=lambda db: (not db["imported"], name_key(db)))
+)
+# alphabetical list of imported databases, used in the header and footer
+IMPORTED = tuple(
+    sorted(
+        (db for db in EXPERT_DBS if db["imported"] and db["name"] != "CRS"),
+        key=name_key,
+    )
+)
+
+
+def get_expert_db(name):
+    """Case-insensitive lookup by name, e.g. miRBase."""
+    return BY_NAME.get(name.lower())
+
+
+def get_expert_db_by_label(label):
+    """Case-insensitive lookup by label, e.g. mirbase or tmrna-website."""
+    return BY_LABEL.get(label.lower())
+
+
+def get_expert_db_by_descr(descr):
+    """Lookup by Database.descr, e.g. MIRBASE or TMRNA_WEB."""
+    return BY_DESCR.get(descr)
+
+
+def get_expert_dbs_by_pubmed_id(pubmed_id):
+    """Expert databases that have a reference with the pubmed id."""
+    return BY_PUBMED_ID.get(str(pubmed_id), ())
@@ -0,0 +1,346 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Resolve the external identifiers shown with RNA interactions
+(Ensembl species and gene names, UniProt gene names, HGNC ids).
+
+Kinds that have been loaded from flat files into the lookup table by the
+`load_external_ids` management command are resolved with one indexed query
+per kind and no network requests are made.
+
+Other kinds are looked up in the default cache, then in the
+persistent `external_ids` cache, and only the remaining ones are requested
+from the Ensembl, UniProt and HGNC REST APIs, in batches and concurrently.
+Failed requests are not cached, so they are retried next time.
+"""
+
+import hashlib
+import json
+import logging
+from urllib.parse import quote
+
+import requests
+from django.core.cache import caches
+from django.db import DatabaseError, connection
+
+from rnacentral.utils.http import DEFAULT_TIMEOUT, get_session, run_concurrently
+
+logger = logging.getLogger(__name__)
+
+ENSEMBL = "ensembl"
+UNIPROT = "uniprot"
+HGNC = "hgnc"
+
+ENSEMBL_LOOKUP_URL = "https://rest.ensembl.org/lookup/id"
+UNIPROT_ACCESSIONS_URL = "https://rest.uniprot.org/uniprotkb/accessions"
+HGNC_SEARCH_URL = "https://rest.genenames.org/search/"
+
+BATCH_SIZES = {ENSEMBL: 500, UNIPROT: 100, HGNC: 50}
+LOOKUP_TABLE = "rnc_external_id_lookup"
+NOT_FOUND = {
+    ENSEMBL: {"species": "", "display_name": "", "parent": ""},
+    UNIPROT: "",
+    HGNC: "",
+}
+MEMORY_CACHE_TIMEOUT = 60 * 60 * 24  # seconds
+LOOKUP_KINDS_KEY = "external-id-lookup-kinds"
+LOOKUP_KINDS_TIMEOUT = 60 * 5  # seconds
+PERSISTENT_CACHE_TIMEOUT = 60 * 60 * 24 * 30  # seconds
+
+
+def fetch_ensembl(ids):
+    """
+    :return: {stable id: {"species": ..., "display_name": ..., "parent": ...}},
+    with an empty dict for unknown ids
+    """
+    response = get_session().post(
+        ENSEMBL_LOOKUP_URL,
+        json={"ids": ids},
+        headers={"Content-Type": "application/json", "Accept": "application/json"},
+        timeout=DEFAULT_TIMEOUT,
+    )
+    response.raise_for_status()
+    data = response.json()
+    results = {}
+    for ensembl_id in ids:
+        entry = data.get(ensembl_id) or {}
+        results[ensembl_id] = {
+            "species": entry.get("species", ""),
+            "display_name": entry.get("display_name", ""),
+            "parent": entry.get("Parent", ""),
+        }
+    return results
+
+
+def fetch_uniprot(ids):
+    """
+    :return: {accession: gene name or ""}, secondary accessions are
+    resolved to the gene name of the entry they were merged into
+    """
+    response = get_session().get(
+        UNIPROT_ACCESSIONS_URL,
+        params={
+            "accessions": ",".join(ids),
+            "fields": "accession,sec_acc,gene_names",
+            "format": "json",
+        },
+        timeout=DEFAULT_TIMEOUT,
+    )
+    response.raise_for_status()
+    results = dict.fromkeys(ids, "")
+    for entry in response.json()["results"]:
+        try:
+            gene_name = entry["genes"][0]["geneName"]["value"]
+        except (IndexError, KeyError):
+            continue
+        accessions = [entry["primaryAccession"]] + entry.get("secondaryAccessions", [])
+        for accession in accessions:
+            if accession in results:
+                results[accession] = gene_name
+    return results
+
+
+def fetch_hgnc(symbols):
+    """:return: {gene symbol: HGNC id or ""}"""
+    query = " OR ".join('symbol:"%s"' % symbol for symbol in symbols)
+    response = get_session().get(
+        HGNC_SEARCH_URL + quote(query),
+        headers={"Accept": "application/json"},
+        timeout=DEFAULT_TIMEOUT,
+    )
+    response.raise_for_status()
+    results = dict.fromkeys(symbols, "")
+    requested = {symbol.upper(): symbol for symbol in symbols}
+    for doc in response.json()["response"]["docs"]:
+        if doc["symbol"].upper() in requested:
+            results[requested[doc["symbol"].upper()]] = doc["hgnc_id"]
+    return results
+
+
+FETCHERS = {ENSEMBL: fetch_ensembl, UNIPROT: fetch_uniprot, HGNC: fetch_hgnc}
+
+
+def make_key(kind, identifier):
+    """Identifiers are hashed to get valid memcached keys."""
+    digest = hashlib.md5(identifier.encode("utf-8")).hexdigest()
+    return "external-id:%s:%s" % (kind, digest)
+
+
+def get_persistent_cache():
+    return caches["external_ids"]
+
+
+def get_cached(kind, identifiers):
+    """Look up identifiers in the default cache, then in the persistent one."""
+    keys = {make_key(kind, identifier): identifier for identifier in identifiers}
+    found = caches["default"].get_many(keys.keys())
+
+    missing = [key for key in keys if key not in found]
+    if missing:
+        try:
+            persistent = get_persistent_cache().get_many(missing)
+        except DatabaseError:
+            logger.exception("External id cache is not available")
+            persistent = {}
+        if persistent:
+            caches["default"].set_many(persistent, MEMORY_CACHE_TIMEOUT)
+            found.update(persistent)
+
+    return {keys[key]: value for key, value in found.items()}
+
+
+def set_cached(kind, results):
+    values = {
+        make_key(kind, identifier): value for identifier, value in results.items()
+    }
+    caches["default"].set_many(values, MEMORY_CACHE_TIMEOUT)
+    try:
+        get_persistent_cache().set_many(values, PERSISTENT_CACHE_TIMEOUT)
+    except DatabaseError:
+        logger.exception("External id cache is not available")
+
+
+def normalize(kind, identifier):
+    """HGNC symbols are matched case-insensitively."""
+    return identifier.upper() if kind == HGNC else identifier
+
+
+def fetch_lookup_table_kinds():
+    """Kinds that have rows in the lookup table, if it exists."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM information_schema.tables WHERE table_name = %s",
+            [LOOKUP_TABLE],
+        )
+        if cursor.fetchone() is None:
+            return []
+        cursor.execute(
+            "SELECT kind FROM unnest(%s::text[]) AS kinds(kind) WHERE EXISTS "
+            "(SELECT 1 FROM {table} WHERE {table}.kind = kinds.kind)".format(
+                table=LOOKUP_TABLE
+            ),
+            [sorted(FETCHERS)],
+        )
+        return [kind for (kind,) in cursor.fetchall()]
+
+
+def get_lookup_table_kinds():
+    """
+    Kinds loaded by the `load_external_ids` management command.
+    The check is cached for a few minutes, so new data are picked up
+    without restarting the workers.
+    """
+    kinds = caches["default"].get(LOOKUP_KINDS_KEY)
+    if kinds is None:
+        kinds = fetch_lookup_table_kinds()
+        caches["default"].set(LOOKUP_KINDS_KEY, kinds, LOOKUP_KINDS_TIMEOUT)
+    return kinds
+
+
+def get_from_lookup_table(kind, identifiers):
+    """Resolve identifiers offline, identifiers missing from the table are not found."""
+    normalized = {normalize(kind, identifier): identifier for identifier in identifiers}
+    resolved = dict.fromkeys(identifiers, NOT_FOUND[kind])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT identifier, value FROM {table} "
+            "WHERE kind = %s AND identifier = ANY(%s)".format(table=LOOKUP_TABLE),
+            [kind, list(normalized)],
+        )
+        for identifier, value in cursor.fetchall():
+            resolved[normalized[identifier]] = json.loads(value)
+    return resolved
+
+
+def fetch(kind, identifiers):
+    """Fetch one batch, return an empty dict if the request failed."""
+    try:
+        return FETCHERS[kind](identifiers)
+    except (requests.RequestException, ValueError, KeyError, TypeError):
+        logger.warning("Could not fetch %i %s ids", len(identifiers), kind)
+        return {}
+
+
+def resolve_many(requested):
+    """
+    Resolve identifiers of several kinds at once.
+
+    :param requested: {kind: set of identifiers}
+    :return: {kind: {identifier: value}}, without the identifiers that
+    could not be fetched
+    """
+    resolved = {}
+    calls = []
+    lookup_table_kinds = get_lookup_table_kinds()
+    for kind, identifiers in requested.items():
+        identifiers = sorted(identifier for identifier in identifiers if identifier)
+        if kind in lookup_table_kinds:
+            resolved[kind] = get_from_lookup_table(kind, identifiers)
+            continue
+        resolved[kind] = get_cached(kind, identifiers)
+        missing = [
+            identifier for identifier in identifiers if identifier not in resolved[kind]
+        ]
+        size = BATCH_SIZES[kind]
+        for i in range(0, len(missing), size):
+            calls.append((kind, missing[i : i + size]))
+
+    results = run_concurrently(*[(fetch, kind, batch) for kind, batch in calls])
+    for (kind, _), result in zip(calls, results):
+        if result:
+            set_cached(kind, result)
+            resolved[kind].update(result)
+    return resolved
+
+
+def get_ensembl_id(interaction):
+    """Ensembl id of the interacting molecule, if there is one."""
+    if "intact:" in interaction.interacting_id:
+        for name in interaction.names:
+            if name.lower().startswith("ens"):
+                return name
+    elif "ensembl" in interaction.interacting_id:
+        return interaction.interacting_id.replace("ensembl:", "")
+    return None
+
+
+def get_uniprot_id(interaction):
+    for prefix in ["uniprotkb:", "protein ontology:"]:
+        if prefix in interaction.interacting_id:
+            return interaction.interacting_id.replace(prefix, "")
+    return None
+
+
+def get_ensembl_transcript(interaction):
+    """Ensembl id used to find the gene name of non-protein interactors."""
+    for name in interaction.names:
+        if name.lower().startswith("ens"):
+            return name.split(".")[0]
+    return None
+
+
+class InteractionsResolver(object):
+    """
+    Resolve the external ids of a list of interactions with a few batched
+    requests, instead of several requests for every interaction.
+    """
+
+    def __init__(self, interactions):
+        interactions = list(interactions)
+        ensembl_ids = set()
+        uniprot_ids = set()
+        for interaction in interactions:
+            ensembl_id = get_ensembl_id(interaction)
+            if ensembl_id:
+                ensembl_ids.add(ensembl_id.split(".")[0])
+            uniprot_id = get_uniprot_id(interaction)
+            if uniprot_id:
+                uniprot_ids.add(uniprot_id)
+            else:
+                ensembl_ids.add(get_ensembl_transcript(interaction))
+
+        resolved = resolve_many({ENSEMBL: ensembl_ids, UNIPROT: uniprot_ids})
+        self.ensembl = resolved[ENSEMBL]
+        self.uniprot = resolved[UNIPROT]
+
+        # gene names of transcripts come from their parent genes
+        parents = {
+            entry["parent"] for entry in self.ensembl.values() if entry["parent"]
+        } - set(self.ensembl)
+        if parents:
+            self.ensembl.update(resolve_many({ENSEMBL: parents})[ENSEMBL])
+
+        symbols = {self.get_gene_name(interaction) for interaction in interactions}
+        self.hgnc = resolve_many({HGNC: symbols})[HGNC]
+
+    def get_ensembl_species(self, ensembl_id):
+        """Species of an Ensembl gene or transcript, "" if unknown."""
+        entry = self.ensembl.get(ensembl_id.split(".")[0])
+        return entry["species"] if entry else ""
+
+    def get_gene_name(self, interaction):
+        """Gene name of an interactor from UniProt or Ensembl, "" if unknown."""
+        uniprot_id = get_uniprot_id(interaction)
+        if uniprot_id:
+            return self.uniprot.get(uniprot_id, "")
+
+        transcript = get_ensembl_transcript(interaction)
+        entry = self.ensembl.get(transcript) if transcript else None
+        if not entry:
+            return ""
+        if entry["parent"]:
+            parent = self.ensembl.get(entry["parent"])
+            return parent["display_name"] if parent else ""
+        return entry["display_name"]
+
+    def get_hgnc_id(self, symbol):
+        return self.hgnc.get(symbol, "") if symbol else ""
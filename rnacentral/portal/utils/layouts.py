@@ -0,0 +1,215 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Secondary structure layouts, stored in S3 as gzipped SVG files.
+
+Layouts are downloaded with a single S3 client per process and kept in
+a size-bounded on-disk LRU cache shared by all workers on the same host,
+so that repeat views of popular structures do not touch S3.
+Cache keys include the release, so a new release starts with a cold cache
+and the old entries are evicted as the cache fills up.
+"""
+
+import os
+import tempfile
+import zlib
+from functools import lru_cache
+
+import boto3
+from botocore.config import Config
+from django.conf import settings
+from django.core.cache import cache
+from portal.models.release import get_release_version
+
+S3_MAX_POOL_CONNECTIONS = 32
+CACHE_HITS_KEY = "secondary-structure-cache-hits"
+CACHE_MISSES_KEY = "secondary-structure-cache-misses"
+
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    """
+    Get the process-wide S3 client. Unlike boto3 resources, clients are
+    thread-safe, and they keep a pool of open connections.
+    """
+    return boto3.client(
+        "s3",
+        aws_access_key_id=settings.S3_SERVER["KEY"],
+        aws_secret_access_key=settings.S3_SERVER["SECRET"],
+        endpoint_url=settings.S3_SERVER["HOST"],
+        config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS),
+    )
+
+
+def get_upi_path(upi):
+    """URS0000704D22 -> URS/00/00/70/4D"""
+    return "/".join([upi[0:3], upi[3:5], upi[5:7], upi[7:9], upi[9:11]])
+
+
+def get_s3_key(upi):
+    """URS0000704D22 -> prod/URS/00/00/70/4D/URS0000704D22.svg.gz"""
+    return "prod/%s/%s.svg.gz" % (get_upi_path(upi), upi)
+
+
+class LayoutCache(object):
+    """
+    Directory of files evicted in least recently used order once their
+    total size exceeds `max_size`. File modification times are used to
+    track the last access, so the cache can be shared between processes.
+
+    Writes add to an estimate of the total size kept in the Django cache,
+    and the directory is only scanned once the estimate exceeds `max_size`
+    or is missing. The `secondary_structure_cache --cull` management command
+    can also be run periodically to keep culling out of requests.
+    """
+
+    temp_suffix = ".tmp"
+
+    def __init__(self, root, max_size):
+        self.root = root
+        self.max_size = max_size
+        self.size_key = "secondary-structure-cache-size:%s" % root
+
+    def get(self, key):
+        path = os.path.join(self.root, key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None  # missing or evicted by another process
+        return data
+
+    def set(self, key, data):
+        os.makedirs(self.root, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=self.temp_suffix)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, os.path.join(self.root, key))
+        try:
+            size = cache.incr(self.size_key, len(data))
+        except ValueError:
+            size = None  # unknown after a restart or eviction
+        if size is None or size > self.max_size:
+            self.cull()
+
+    def entries(self):
+        """Get (last access, size, path) for all entries, oldest first."""
+        try:
+            files = [
+                entry
+                for entry in os.scandir(self.root)
+                if entry.is_file() and not entry.name.endswith(self.temp_suffix)
+            ]
+        except FileNotFoundError:
+            return []
+        entries = []
+        for entry in files:
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def cull(self):
+        """Remove the least recently used entries down to 90% of the max size."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_size:
+            for _, size, path in entries:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= 0.9 * self.max_size:
+                    break
+        cache.set(self.size_key, total, None)
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        cache.delete(self.size_key)
+
+
+def get_layout_cache():
+    return LayoutCache(
+        settings.SECONDARY_STRUCTURE_CACHE_ROOT,
+        settings.SECONDARY_STRUCTURE_CACHE_MAX_SIZE,
+    )
+
+
+def increment(key):
+    """Increment a counter shared by all processes."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get_cache_stats():
+    hits = cache.get(CACHE_HITS_KEY, 0)
+    misses = cache.get(CACHE_MISSES_KEY, 0)
+    entries = get_layout_cache().entries()
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / (hits + misses) if hits + misses else None,
+        "entries": len(entries),
+        "size": sum(size for _, size, _ in entries),
+    }
+
+
+def reset_cache_stats():
+    cache.delete_many([CACHE_HITS_KEY, CACHE_MISSES_KEY])
+
+
+def get_layout(upi):
+    """Get the gzipped SVG layout of a sequence, or None if there is none."""
+    layout_cache = get_layout_cache()
+    key = "%s_%s.svg.gz" % (upi, get_release_version())
+
+    data = layout_cache.get(key)
+    if data is not None:
+        increment(CACHE_HITS_KEY)
+        return data
+    increment(CACHE_MISSES_KEY)
+
+    data = download_layout(upi)
+    if data is not None:
+        layout_cache.set(key, data)
+    return data
+
+
+def download_layout(upi):
+    """Download a gzipped SVG layout from S3, bypassing the cache."""
+    s3 = get_s3_client()
+    try:
+        s3_obj = s3.get_object(Bucket=settings.S3_SERVER["BUCKET"], Key=get_s3_key(upi))
+    except s3.exceptions.NoSuchKey:
+        return None
+    return s3_obj["Body"].read()
+
+
+def get_layout_svg(upi):
+    """Get the decompressed SVG layout of a sequence, or None if there is none."""
+    data = get_layout(upi)
+    if data is None:
+        return None
+    return zlib.decompress(data, zlib.MAX_WBITS | 32)
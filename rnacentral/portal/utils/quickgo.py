@@ -0,0 +1,108 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Number of QuickGO annotations of PSICQUIC cross-references.
+
+Counts are cached per release, so they are requested from QuickGO at most
+once per release. They can also be precomputed and loaded into the cache
+from a file with the `load_quickgo_hits` management command.
+"""
+
+import logging
+
+import requests
+from django.core.cache import cache
+from portal.models.release import get_release_version
+
+from rnacentral.utils.http import DEFAULT_TIMEOUT, get_session, run_concurrently
+
+logger = logging.getLogger(__name__)
+
+QUICKGO_STATS_URL = "https://www.ebi.ac.uk/QuickGO/services/annotation/stats"
+CACHE_TIMEOUT = 60 * 60 * 24 * 7  # seconds
+NO_HITS = ""  # None cannot be told apart from a cache miss
+
+
+def make_key(urs_taxid, release=None):
+    if release is None:
+        release = get_release_version()
+    return "quickgo-hits:%s:%s" % (release, urs_taxid)
+
+
+def fetch_hits(urs_taxid):
+    """
+    Get the number of annotations from QuickGO, NO_HITS if there are none,
+    or None if the request failed.
+    """
+    try:
+        response = get_session().get(
+            QUICKGO_STATS_URL,
+            params={"geneProductId": urs_taxid},
+            timeout=DEFAULT_TIMEOUT,
+        )
+        response.raise_for_status()
+        data = response.json()
+    except (requests.RequestException, ValueError):
+        logger.warning("Could not fetch QuickGO hits of %s", urs_taxid)
+        return None
+    try:
+        return data["results"][0]["totalHits"]
+    except (IndexError, KeyError, TypeError):
+        return NO_HITS
+
+
+def set_hits(hits, release=None, timeout=CACHE_TIMEOUT):
+    """Cache {urs_taxid: number of hits or NO_HITS}."""
+    cache.set_many(
+        {make_key(urs_taxid, release): value for urs_taxid, value in hits.items()},
+        timeout,
+    )
+
+
+def get_hits(urs_taxids):
+    """
+    Get the number of QuickGO annotations of several sequences, requesting
+    the ones that are not cached concurrently.
+
+    :return: {urs_taxid: number of hits}, None if there are no hits or
+    the request failed
+    """
+    release = get_release_version()
+    keys = {make_key(urs_taxid, release): urs_taxid for urs_taxid in set(urs_taxids)}
+    found = {keys[key]: value for key, value in cache.get_many(keys.keys()).items()}
+
+    missing = sorted(set(keys.values()) - set(found))
+    results = run_concurrently(*[(fetch_hits, urs_taxid) for urs_taxid in missing])
+    fetched = {
+        urs_taxid: value
+        for urs_taxid, value in zip(missing, results)
+        if value is not None
+    }
+    if fetched:
+        set_hits(fetched, release)
+        found.update(fetched)
+
+    return {
+        urs_taxid: None if value == NO_HITS else value
+        for urs_taxid, value in found.items()
+    }
+
+
+def parse_hits_file(f):
+    """
+    Parse tab-separated urs_taxid and number of hits lines,
+    the number is left empty if there are no hits.
+    """
+    for line in f:
+        urs_taxid, _, value = line.rstrip("\n").partition("\t")
+        if urs_taxid:
+            yield urs_taxid, int(value) if value else NO_HITS
@@ -0,0 +1,59 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Links to sequence pages.
+
+The `generic-rna-sequence` and `unique-rna-sequence` url patterns are reversed
+once per process into format strings, so that pages linking to thousands of
+sequences do not call reverse() for each of them.
+"""
+
+from functools import lru_cache
+
+from django.urls import reverse
+
+PLACEHOLDER_UPI = "URS0000000000"
+PLACEHOLDER_TAXID = 999999999
+
+
+@lru_cache(maxsize=None)
+def get_templates():
+    """:return: (generic path template, species-specific path template)"""
+    generic = reverse("generic-rna-sequence", kwargs={"upi": PLACEHOLDER_UPI})
+    unique = reverse(
+        "unique-rna-sequence",
+        kwargs={"upi": PLACEHOLDER_UPI, "taxid": PLACEHOLDER_TAXID},
+    )
+    return (
+        generic.replace(PLACEHOLDER_UPI, "{upi}"),
+        unique.replace(PLACEHOLDER_UPI, "{upi}").replace(
+            str(PLACEHOLDER_TAXID), "{taxid}"
+        ),
+    )
+
+
+def get_sequence_path(upi, taxid=None):
+    """
+    URS0000759B7E -> /rna/URS0000759B7E
+    URS0000759B7E_9606 or URS0000759B7E, 9606 -> /rna/URS0000759B7E/9606
+    """
+    if not taxid and "_" in upi:
+        upi, taxid = upi.split("_", 1)
+    generic, unique = get_templates()
+    if not taxid:
+        return generic.format(upi=upi)
+    return unique.format(upi=upi, taxid=taxid)
+
+
+def get_base_url(request):
+    """Scheme and host of a request, e.g. https://rnacentral.org"""
+    return "%s://%s" % ("https" if request.is_secure() else "http", request.get_host())
@@ -0,0 +1,130 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Secondary structure thumbnails, precomputed by the `generate_thumbnails`
+management command or generated on the fly and backfilled by the API.
+
+Thumbnails are stored gzipped in a content-addressed store:
+
+    objects/ab/abcdef....svg.gz               thumbnail named by its sha256
+    <release>/URS/00/00/70/4D/URS0000704D22   symlink to the object
+
+Every release gets a new index of symlinks, but thumbnails that did not
+change between releases are stored only once.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import uuid
+
+from colorhash import ColorHash
+from django.conf import settings
+from portal.models.release import get_release_version
+from portal.utils.layouts import get_upi_path
+
+
+def generate_thumbnail(image, upi):
+    """Draw the backbone of an R2DT layout as a single path coloured by URS."""
+    move_to_start_position = None
+    color = ColorHash(upi).hex
+    points = []
+    width = []
+    height = []
+    for i, line in enumerate(image.split("\n")):
+        if not width:
+            width = re.findall(r'width="(\d+(\.\d+)?)"', line)
+        if not height:
+            height = re.findall(r'height="(\d+(\.\d+)?)"', line)
+        for nt in re.finditer(
+            r'<text x="(\d+)(\.\d+)?" y="(\d+)(\.\d+)?".*?</text>', line
+        ):
+            if "numbering-label" in nt.group(0):
+                continue
+            if not move_to_start_position:
+                move_to_start_position = "M{} {} ".format(nt.group(1), nt.group(3))
+            points.append("L{} {}".format(nt.group(1), nt.group(3)))
+    if len(points) < 200:
+        stroke_width = "3"
+    elif len(points) < 500:
+        stroke_width = "4"
+    elif len(points) < 3000:
+        stroke_width = "4"
+    else:
+        stroke_width = "2"
+    thumbnail = '<svg xmlns="http://www.w3.org/2000/svg" width="{}" height="{}"><path style="stroke:{};stroke-width:{}px;fill:none;" d="'.format(
+        width[0][0], height[0][0], color, stroke_width
+    )
+    thumbnail += move_to_start_position
+    thumbnail += " ".join(points)
+    thumbnail += '"/></svg>'
+    return thumbnail
+
+
+class ThumbnailStore(object):
+    def __init__(self, root, release):
+        self.root = root
+        self.release = str(release)
+
+    def get_index_path(self, upi):
+        return os.path.join(self.root, self.release, get_upi_path(upi), upi)
+
+    def get_object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest + ".svg.gz")
+
+    def get(self, upi):
+        """Get a gzipped thumbnail, or None if it has not been generated."""
+        try:
+            with open(self.get_index_path(upi), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def __contains__(self, upi):
+        return os.path.exists(self.get_index_path(upi))
+
+    def put(self, upi, thumbnail):
+        """
+        Store a thumbnail. All writes are atomic renames, so several processes
+        can fill the store at the same time.
+        """
+        data = gzip.compress(thumbnail.encode("utf-8"), mtime=0)
+        object_path = self.get_object_path(hashlib.sha256(data).hexdigest())
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(object_path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, object_path)
+
+        index_path = self.get_index_path(upi)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        target = os.path.relpath(object_path, os.path.dirname(index_path))
+        while True:
+            # unique per call, threads of the same process can write the same upi
+            temp_path = "%s.%s.tmp" % (index_path, uuid.uuid4().hex)
+            try:
+                os.symlink(target, temp_path)
+                break
+            except FileExistsError:
+                continue
+        os.replace(temp_path, index_path)
+        return data
+
+
+def get_thumbnail_store(release=None):
+    return ThumbnailStore(
+        settings.SECONDARY_STRUCTURE_THUMBNAILS_ROOT,
+        get_release_version() if release is None else release,
+    )
@@ -33,13 +33,11 @@ from django.template import TemplateDoesNotExist
 from django.template.loader import render_to_string
 from django.views.decorators.cache import cache_page, never_cache
 from django.views.generic.base import TemplateView
-from portal.config.expert_databases import expert_dbs
 from portal.config.go_dataset import go_set
 from portal.config.summaries import litsumm_examples
 from portal.config.svg_images import examples
 from portal.models import (
     Database,
-    EnsemblAssembly,
     GoAnnotation,
     LitScanStatistics,
     LitSumm,
@@ -49,6 +47,8 @@ from portal.models import (
 )
 from portal.models.rna_precomputed import RnaPrecomputed
 from portal.rna_summary import RnaSummary
+from portal.utils import expert_databases
+from portal.utils.ensembl_assemblies import get_assembly_by_ensembl_url
 
 CACHE_TIMEOUT = 60 * 60 * 24 * 1  # per-view cache timeout in seconds
 XREF_PAGE_SIZE = 1000
@@ -114,8 +114,7 @@ def homepage(request):
 @cache_page(CACHE_TIMEOUT)
 def expert_databases_view(request):
     """List of RNAcentral expert databases."""
-    expert_dbs.sort(key=lambda x: x["name"].lower())
-    expert_dbs.sort(key=lambda x: x["imported"], reverse=True)
+    expert_dbs = expert_databases.SORTED_BY_IMPORTED
     context = {
         "expert_dbs": expert_dbs,
         "num_dbs": len(expert_dbs) - 1,  # Vega is archived
@@ -353,19 +352,13 @@ def rna_view(request, upi, taxid=None):
 @cache_page(CACHE_TIMEOUT)
 def expert_database_view(request, expert_db_name):
     """Expert database view."""
-    expert_db_name = expert_db_name.upper()
-    expert_db = None
-    for db in expert_dbs:
-        if db["name"].upper() == expert_db_name and db["imported"]:
-            expert_db = db
-        elif db["label"].upper() == expert_db_name.upper() and db["imported"]:
-            expert_db = db
-        elif (
-            expert_db_name == "TMRNA-WEBSITE" and db["label"].upper() == expert_db_name
-        ):
-            expert_db = db
-
-    if not expert_db:
+    expert_db = expert_databases.get_expert_db_by_label(expert_db_name)
+    if expert_db is None:
+        expert_db = expert_databases.get_expert_db(expert_db_name)
+    # the tmRNA Website page is shown even if it is not imported
+    if not expert_db or not (
+        expert_db["imported"] or expert_db["label"] == "tmrna-website"
+    ):
         raise Http404()
 
     return render_to_response(
@@ -517,17 +510,10 @@ class GenomeBrowserView(TemplateView):
         self.template_name = "portal/genome-browser.html"
 
         # if species is not defined - use homo_sapiens as default, if specified and wrong - 404
-        if "species" in request.GET:
-            kwargs["genome"] = request.GET["species"]
-            try:
-                ensembl_assembly = EnsemblAssembly.objects.filter(
-                    ensembl_url=kwargs["genome"]
-                ).all()[0]
-            except IndexError:
-                raise Http404
-        else:
-            kwargs["genome"] = "homo_sapiens"
-            ensembl_assembly = EnsemblAssembly.objects.get(ensembl_url="homo_sapiens")
+        kwargs["genome"] = request.GET.get("species", "homo_sapiens")
+        ensembl_assembly = get_assembly_by_ensembl_url(kwargs["genome"])
+        if ensembl_assembly is None:
+            raise Http404
 
         # require chromosome, start and end in kwargs or use default location for this species
         if (
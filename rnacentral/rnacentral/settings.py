@@ -12,6 +12,7 @@ limitations under the License.
 """
 
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -303,8 +304,26 @@ CACHES = {
         "BACKEND": "rnacentral.utils.cache.SitemapsCache",
         "LOCATION": SITEMAPS_ROOT,
     },
+    # resolved Ensembl, UniProt and HGNC ids, create with `manage.py createcachetable`
+    "external_ids": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "rnc_external_ids_cache",
+        "OPTIONS": {"MAX_ENTRIES": 1000000},
+    },
 }
 
+# on-disk LRU cache of secondary structure layouts downloaded from S3,
+# kept outside the source tree
+SECONDARY_STRUCTURE_CACHE_ROOT = os.getenv(
+    "SECONDARY_STRUCTURE_CACHE_ROOT",
+    os.path.join(tempfile.gettempdir(), "rnacentral-secondary-structure-cache"),
+)
+SECONDARY_STRUCTURE_CACHE_MAX_SIZE = 2 * 1024**3  # bytes
+# precomputed secondary structure thumbnails
+SECONDARY_STRUCTURE_THUMBNAILS_ROOT = os.path.join(
+    PROJECT_PATH, "rnacentral", "secondary_structure_thumbnails"
+)
+
 # cache queries like Rna.objects.count()
 CACHE_COUNT_TIMEOUT = 60 * 60 * 24  # seconds
 # by default cache machine doesn't cache empty querysets
@@ -0,0 +1,72 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Queries to EBI Search made while serving API responses.
+"""
+
+import requests
+from django.conf import settings
+
+from rnacentral.utils.http import DEFAULT_TIMEOUT, get_session
+
+
+def search(path, params):
+    """Query EBI Search, raise requests.RequestException or ValueError on failure."""
+    response = get_session().get(
+        settings.EBI_SEARCH_ENDPOINT + path, params=params, timeout=DEFAULT_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def get_gene(urs_taxid):
+    """Get the gene name of a species-specific entry, or None if the request failed."""
+    try:
+        data = search("/entry/%s" % urs_taxid, {"format": "json", "fields": "gene"})
+    except (requests.RequestException, ValueError):
+        return None
+    try:
+        return data["entries"][0]["fields"]["gene"]
+    except (IndexError, KeyError, TypeError):
+        return ""
+
+
+def get_litscan_pub_count(urs_taxid):
+    """
+    Get the number of articles identified by LitScan for a species-specific
+    entry and its related ids, or None if the request failed.
+    """
+    job_ids = [urs_taxid]
+    try:
+        data = search(
+            "-litscan",
+            {
+                "query": 'entry_type:metadata AND primary_id:"%s" AND database:rnacentral'
+                % urs_taxid,
+                "fields": "job_id",
+                "format": "json",
+            },
+        )
+        for entry in data["entries"]:
+            job_ids.append(entry["fields"]["job_id"][0])
+    except (requests.RequestException, ValueError, IndexError, KeyError):
+        pass
+
+    query_ids = " OR ".join('job_id:"%s"' % job_id for job_id in job_ids)
+    try:
+        data = search(
+            "-litscan",
+            {"query": "entry_type:Publication AND (%s)" % query_ids, "format": "json"},
+        )
+        return data["hitCount"]
+    except (requests.RequestException, ValueError, KeyError):
+        return None
@@ -0,0 +1,55 @@
+"""
+Copyright [2009-present] EMBL-European Bioinformatics Institute
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+     http://www.apache.org/licenses/LICENSE-2.0
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+
+Outbound HTTP requests made while serving responses.
+
+All requests share one keep-alive connection pool per host and should use
+DEFAULT_TIMEOUT, so that a slow external service cannot block the web
+workers indefinitely. Independent requests can be run concurrently with
+`run_concurrently`.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_TIMEOUT = (3.05, 5)  # connect and read timeouts in seconds
+DEFAULT_DEADLINE = 12  # seconds to wait for all concurrent requests
+MAX_WORKERS = 16
+
+_session = None
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+
+def get_session():
+    """Get the process-wide requests session, created on first use."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=MAX_WORKERS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
+
+
+def run_concurrently(*calls, deadline=DEFAULT_DEADLINE):
+    """
+    Run (function, argument, ...) calls in the shared thread pool.
+
+    :return: list of results in the same order, None for calls that did not
+    finish before the deadline
+    """
+    futures = [_executor.submit(function, *args) for function, *args in calls]
+    done, _ = wait(futures, timeout=deadline)
+    return [future.result() if future in done else None for future in futures]
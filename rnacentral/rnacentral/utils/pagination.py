@@ -1,11 +1,20 @@
+import base64
+import binascii
+import hashlib
+import json
 import sys
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
-from django.db.models import sql
-from django.db.models.query import RawQuerySet
+from django.db import connections
+from django.db.models import Q
 from django.utils.functional import cached_property
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPaginatorClass(Paginator):
@@ -16,13 +25,119 @@ class CustomPaginatorClass(Paginator):
         return sys.maxsize
 
 
-class LargeTablePagination(PageNumberPagination):
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination on a unique ordering, e.g. ("-upi",)
+    or ("-db_id", "-id"). The cursor encodes the ordering values of the last
+    entry on the page, so that every page is a bounded index scan:
+
+        WHERE (db_id < 42) OR (db_id = 42 AND id < 1000) ORDER BY ... LIMIT n
+
+    instead of an OFFSET query walking all the previous pages.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering, page_size):
+        self.ordering = ordering
+        self.page_size = page_size
+
+    def decode_cursor(self, request):
+        """Return the ordering values of the last seen entry, or None."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None  # first page
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, entry):
+        position = [getattr(entry, field.lstrip("-")) for field in self.ordering]
+        encoded = base64.urlsafe_b64encode(json.dumps(position).encode("ascii"))
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode("ascii")
+        )
+
+    def get_keyset_filter(self, position):
+        """Build (a < x) OR (a = x AND b < y) OR ... for the ordering."""
+        keyset = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            keyset |= Q(**equal, **{"%s__%s" % (name, lookup): value})
+            equal[name] = value
+        return keyset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_keyset_filter(position))
+            except (TypeError, ValueError, ValidationError):
+                # values of the wrong type for the ordering fields
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset.order_by(*self.ordering)[: self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": None,
+                "results": data,
+            }
+        )
+
+
+class KeysetPaginationMixin(object):
+    """
+    Opt-in cursor pagination for views with a `keyset_ordering` attribute.
+    Requests with a `cursor` parameter (empty for the first page) get
+    cursor-based `next` links, all other requests keep using page numbers.
+    """
+
+    keyset = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = getattr(view, "keyset_ordering", None)
+        if ordering and KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination(ordering, self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super(KeysetPaginationMixin, self).paginate_queryset(
+            queryset, request, view
+        )
+
+    def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
+        return super(KeysetPaginationMixin, self).get_paginated_response(data)
+
+
+class LargeTablePagination(KeysetPaginationMixin, PageNumberPagination):
     """Use this paginator class to avoid large table count query"""
 
     django_paginator_class = CustomPaginatorClass
     page_size_query_param = "page_size"
 
     def get_paginated_response(self, data):
+        if self.keyset:
+            return self.keyset.get_paginated_response(data)
         return Response(
             {
                 "next": self.get_next_link(),
@@ -32,7 +147,7 @@ class LargeTablePagination(PageNumberPagination):
         )
 
 
-class Pagination(PageNumberPagination):
+class Pagination(KeysetPaginationMixin, PageNumberPagination):
     """
     DRF pagination_class, you use it by saying:
 
@@ -43,107 +158,85 @@ class Pagination(PageNumberPagination):
     page_size_query_param = "page_size"
 
 
-class PaginatedRawQuerySet(RawQuerySet):
+class PaginatedRawQuerySet(object):
     """
-    Replacement for a RawQuerySet that handles pagination, stolen from:
+    Raw SQL query that DRF pagination can use without fetching all rows.
 
-    https://stackoverflow.com/questions/32191853/best-way-to-paginate-a-raw-sql-query-in-a-django-rest-listapi-view/43921793#43921793
-    https://gist.github.com/eltongo/d3e6bdef17b0b14384ba38edc76f25f6
+    Slicing adds LIMIT/OFFSET to the query, and the number of rows comes from
+    a COUNT(*) query that is cached for CACHE_COUNT_TIMEOUT seconds, so only
+    the first request for a given query and parameters runs it.
 
-    Stopped working after Django migration, but will keep it just in case.
+    The query should have a deterministic ORDER BY and bound parameters,
+    a list for %s placeholders or a dict for %(name)s ones:
+
+        PaginatedRawQuerySet(
+            "SELECT ... WHERE urs_taxid = %s ORDER BY id", Model, [urs_taxid]
+        )
     """
 
-    def __init__(self, raw_query, **kwargs):
-        super(PaginatedRawQuerySet, self).__init__(raw_query, **kwargs)
-        self.original_raw_query = raw_query
-        self._result_cache = None
+    def __init__(self, raw_query, model, params=None, count_query=None):
+        self.raw_query = raw_query
+        self.model = model
+        self.params = params if params is not None else []
+        self.count_query = (
+            count_query or "SELECT COUNT(*) FROM (%s) AS paginated" % raw_query
+        )
+        self._count = None
 
-    def __getitem__(self, k):
-        """
-        Retrieves an item or slice from the set of results.
-        """
-        if not isinstance(
-            k,
-            (
-                slice,
-                int,
-            ),
-        ):
-            raise TypeError
-        assert (not isinstance(k, slice) and (k >= 0)) or (
-            isinstance(k, slice)
-            and (k.start is None or k.start >= 0)
-            and (k.stop is None or k.stop >= 0)
-        ), "Negative indexing is not supported."
+    @property
+    def db(self):
+        return self.model.objects.db
 
-        if self._result_cache is not None:
-            return self._result_cache[k]
+    def get_count_cache_key(self):
+        """Counts change with the data, so the key includes the release."""
+        # imported here because portal.models imports this module
+        from portal.models.release import get_release_version
 
+        key = "%s:%r" % (self.count_query, self.params)
+        digest = hashlib.md5(key.encode("utf-8")).hexdigest()
+        return "raw-count:%s:%s" % (get_release_version(), digest)
+
+    def count(self):
+        if self._count is None:
+            key = self.get_count_cache_key()
+            self._count = cache.get(key)
+            if self._count is None:
+                with connections[self.db].cursor() as cursor:
+                    cursor.execute(self.count_query, self.params)
+                    self._count = cursor.fetchone()[0]
+                cache.set(key, self._count, settings.CACHE_COUNT_TIMEOUT)
+        return self._count
+
+    def fetch(self, offset=0, limit=None):
+        """Run the query with LIMIT/OFFSET, limit None means no limit."""
+        if isinstance(self.params, dict):
+            query = self.raw_query + " LIMIT %(_limit)s OFFSET %(_offset)s"
+            params = dict(self.params, _limit=limit, _offset=offset)
+        else:
+            query = self.raw_query + " LIMIT %s OFFSET %s"
+            params = list(self.params) + [limit, offset]
+        return list(self.model.objects.raw(query, params, using=self.db))
+
+    def __getitem__(self, k):
         if isinstance(k, slice):
-            qs = self._clone()
-            if k.start is not None:
-                start = int(k.start)
-            else:
-                start = None
-            if k.stop is not None:
-                stop = int(k.stop)
-            else:
-                stop = None
-            qs.set_limits(start, stop)
-            return qs
-
-        qs = self._clone()
-        qs.set_limits(k, k + 1)
-        return list(qs)[0]
+            start, stop = k.start or 0, k.stop
+            if k.step is not None or start < 0 or (stop is not None and stop < 0):
+                raise ValueError("Only positive slices without step are supported")
+            return self.fetch(start, None if stop is None else max(stop - start, 0))
+        if not isinstance(k, int):
+            raise TypeError
+        if k < 0:
+            raise IndexError("Negative indexing is not supported")
+        results = self.fetch(k, 1)
+        if not results:
+            raise IndexError(k)
+        return results[0]
 
     def __iter__(self):
-        self._fetch_all()
-        return iter(self._result_cache)
+        return iter(self.fetch())
 
-    def count(self):
-        if self._result_cache is not None:
-            return len(self._result_cache)
-
-        return self.query.get_count(
-            using=self.db
-        )  # Originally was: return self.model.objects.count()
-
-    def set_limits(self, start, stop):
-        limit_offset = ""
-
-        new_params = tuple()
-        if start is None:
-            start = 0
-        elif start > 0:
-            new_params += (start,)
-            limit_offset = " OFFSET %s"
-        if stop is not None:
-            new_params = (stop - start,) + new_params
-            limit_offset = "LIMIT %s" + limit_offset
-
-        self.params = self.params + new_params
-        self.raw_query = self.original_raw_query + limit_offset
-        self.query = sql.RawQuery(sql=self.raw_query, using=self.db, params=self.params)
-
-    def _fetch_all(self):
-        if self._result_cache is None:
-            self._result_cache = list(super(PaginatedRawQuerySet, self).__iter__())
+    def __len__(self):
+        return self.count()
 
     def __repr__(self):
         return "<%s: %s>" % (self.__class__.__name__, self.model.__name__)
-
-    def __len__(self):
-        self._fetch_all()
-        return len(self._result_cache)
-
-    def _clone(self):
-        clone = self.__class__(
-            raw_query=self.raw_query,
-            model=self.model,
-            using=self._db,
-            hints=self._hints,
-            query=self.query,
-            params=self.params,
-            translations=self.translations,
-        )
-        return clone